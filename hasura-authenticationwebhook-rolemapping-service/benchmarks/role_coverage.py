@@ -0,0 +1,75 @@
+"""Microbenchmark of the role coverage check
+
+Compares RoleCoverage with the former per role scan of
+has_access_to_all_root_field_names, for a growing number of roles and root
+fields. Run from the service directory:
+
+    python -m benchmarks.role_coverage
+"""
+import timeit
+
+from src.handlers.role_coverage import RoleCoverage
+from src.models import RoleGraphqlRootFieldName
+
+
+def has_access_to_all_root_field_names(
+    role_id: str,
+    roles: list[RoleGraphqlRootFieldName],
+    root_field_names: list[str],
+) -> bool:
+    for root_field_name in root_field_names:
+        found = False
+        for role in roles:
+            if (
+                role.graphql_root_field_name == root_field_name
+                and role.role_id == role_id
+            ):
+                found = True
+                break
+        if found is False:
+            return False
+    return True
+
+
+def scan(roles, root_field_names, role_set) -> str | None:
+    valid_roles = [
+        r.role_id
+        for r in roles
+        if has_access_to_all_root_field_names(r.role_id, roles, root_field_names)
+    ]
+    return next((r for r in valid_roles if r in role_set), None)
+
+
+def coverage(roles, root_field_names, role_set) -> str | None:
+    return RoleCoverage(roles, root_field_names).preferred_role(role_set)
+
+
+def main() -> None:
+    print(f"{'roles':>6} {'fields':>6} {'scan (ms)':>12} {'coverage (ms)':>14}")
+    for n_roles, n_fields in [(10, 2), (50, 5), (100, 10), (300, 30), (500, 50)]:
+        root_field_names = [f"field_{f}" for f in range(n_fields)]
+        # every role covers all the root fields, the worst case of the scan
+        roles = [
+            RoleGraphqlRootFieldName.construct(
+                role_id=f"role_{r}", graphql_root_field_name=field
+            )
+            for r in range(n_roles)
+            for field in root_field_names
+        ]
+        role_set = [f"role_{n_roles - 1}"]
+        row = f"{n_roles:>6} {n_fields:>6}"
+        for check, number, width in ((scan, 1, 12), (coverage, 100, 14)):
+            # the scan is cubic, it would take hours on the largest inputs
+            if check is scan and len(roles) ** 2 * n_fields > 10**8:
+                row += f" {'-':>{width}}"
+                continue
+            assert check(roles, root_field_names, role_set) == role_set[0]
+            elapsed = timeit.timeit(
+                lambda: check(roles, root_field_names, role_set), number=number
+            )
+            row += f" {elapsed / number * 1000:>{width}.3f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """Bounded LRU cache whose entries expire after a time to live
+
+    Not thread safe, meant to be used from the event loop thread only.
+
+    Args:
+        max_entries: Max number of entries; the least recently used entry is
+            evicted when full. 0 disables the cache
+        ttl: Default time to live of the entries, in seconds. None means
+            the entries never expire
+    """
+
+    def __init__(self, max_entries: int, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        """Returns the value cached for key, None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """Caches value for key
+
+        Args:
+            key: The cache key
+            value: The value to cache
+            ttl: Time to live of the entry, in seconds, capped by the default
+                one; the entry is not cached if not positive
+        """
+        if self.max_entries <= 0:
+            return
+        if ttl is None:
+            ttl = self.ttl
+        elif self.ttl is not None:
+            ttl = min(ttl, self.ttl)
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: K) -> None:
+        """Removes the entry for key, if present"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes all the entries"""
+        self._entries.clear()
+
+    def hit_rate(self) -> float:
+        """Returns the ratio of lookups served by the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> dict[str, float]:
+        """Returns the cache counters"""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate(),
+        }
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, AsyncIterable, AsyncIterator, cast
+
+from pydantic import BaseSettings, parse_obj_as
+from pydantic import ValidationError as PydanticValidationError
+
+from src.models import RoleMappingRecord, RoleMappingRecordResult
+from src.repositories.roles_repository import RoleRepository
+
+
+class BulkImportConfig(BaseSettings):
+    bulk_import_chunk_size: int = 100
+    bulk_import_concurrency: int = 4
+    bulk_import_max_line_bytes: int = 1048576
+
+
+# a line of the body, with its number, and either its record or its result
+# if the record is not valid
+_Entry = tuple[int, RoleMappingRecord | RoleMappingRecordResult]
+
+
+class BulkImportHandler:
+    """Applies the role mapping records of a NDJSON body, streaming back the
+    result of each record
+
+    The body is read line by line and the records are applied in chunks of
+    bulk_import_chunk_size records, each with one repository call; up to
+    bulk_import_concurrency chunks are applied concurrently, except chunks
+    sharing a role, which are applied in order. The results are returned in
+    the order of the records, as soon as their chunk is applied, so that at
+    most bulk_import_concurrency chunks are held in memory.
+    """
+
+    def __init__(self, config: BulkImportConfig, role_repository: RoleRepository):
+        self.config = config
+        self.role_repository = role_repository
+        self.logger = logging.getLogger(__name__)
+
+    async def import_records(
+        self, body: AsyncIterable[bytes]
+    ) -> AsyncIterator[RoleMappingRecordResult]:
+        """Applies the records of a NDJSON body
+
+        Args:
+            body: The chunks of the body
+
+        Returns:
+            The result of each record, in order, with its line number
+        """
+        chunk_size = max(1, self.config.bulk_import_chunk_size)
+        concurrency = max(1, self.config.bulk_import_concurrency)
+        pending: deque[asyncio.Task] = deque()
+        # the last chunk applying each role, for the chunks to wait for it
+        in_flight: dict[str, asyncio.Task] = {}
+        chunk: list[_Entry] = []
+        try:
+            async for line_number, line in self._read_lines(body):
+                if line is not None and not line.strip():
+                    continue
+                chunk.append((line_number, self._parse_record(line_number, line)))
+                if len(chunk) < chunk_size:
+                    continue
+                pending.append(self._apply_chunk(chunk, in_flight))
+                chunk = []
+                if len(pending) >= concurrency:
+                    for result in await pending.popleft():
+                        yield result
+            if chunk:
+                pending.append(self._apply_chunk(chunk, in_flight))
+            while pending:
+                for result in await pending.popleft():
+                    yield result
+        finally:
+            # the client went away, or the body could not be read
+            for task in pending:
+                task.cancel()
+
+    async def _read_lines(
+        self, body: AsyncIterable[bytes]
+    ) -> AsyncIterator[tuple[int, bytes | None]]:
+        """Splits the body into lines, None for the lines too long to be read"""
+        max_line_bytes = self.config.bulk_import_max_line_bytes
+        buffer = bytearray()
+        line_number = 0
+        too_long = False
+        async for data in body:
+            start = len(buffer)
+            buffer += data
+            end = buffer.find(b"\n", start)
+            while end >= 0:
+                line_number += 1
+                too_long = too_long or end > max_line_bytes
+                yield line_number, None if too_long else bytes(buffer[:end])
+                del buffer[: end + 1]
+                too_long = False
+                end = buffer.find(b"\n")
+            if len(buffer) > max_line_bytes:
+                # the rest of the line is dropped as it comes
+                too_long = True
+                buffer.clear()
+        if buffer or too_long:
+            yield line_number + 1, None if too_long else bytes(buffer)
+
+    def _parse_record(
+        self, line_number: int, line: bytes | None
+    ) -> RoleMappingRecord | RoleMappingRecordResult:
+        if line is None:
+            return RoleMappingRecordResult(
+                line=line_number,
+                status=400,
+                errors=[
+                    f"Line longer than {self.config.bulk_import_max_line_bytes} bytes"
+                ],
+            )
+        try:
+            # the annotated union is not a class, as mypy expects
+            return parse_obj_as(cast(Any, RoleMappingRecord), json.loads(line))
+        except json.JSONDecodeError as e:
+            errors = [f"Invalid JSON: {e}"]
+        except PydanticValidationError as e:
+            errors = [
+                ": ".join([".".join(map(str, error["loc"][2:])), error["msg"]])
+                if len(error["loc"]) > 2
+                else error["msg"]
+                for error in e.errors()
+            ]
+        return RoleMappingRecordResult(line=line_number, status=400, errors=errors)
+
+    def _apply_chunk(
+        self, chunk: list[_Entry], in_flight: dict[str, asyncio.Task]
+    ) -> asyncio.Task:
+        role_ids = {
+            entry.role_id
+            for _, entry in chunk
+            if not isinstance(entry, RoleMappingRecordResult)
+        }
+        previous = {in_flight[role_id] for role_id in role_ids if role_id in in_flight}
+        task = asyncio.create_task(self._apply(chunk, previous))
+        for role_id in role_ids:
+            in_flight[role_id] = task
+
+        def release(task: asyncio.Task) -> None:
+            for role_id in role_ids:
+                if in_flight.get(role_id) is task:
+                    del in_flight[role_id]
+
+        task.add_done_callback(release)
+        return task
+
+    async def _apply(
+        self, chunk: list[_Entry], previous: set[asyncio.Task]
+    ) -> list[RoleMappingRecordResult]:
+        if previous:
+            await asyncio.wait(previous)
+        records = [
+            entry
+            for _, entry in chunk
+            if not isinstance(entry, RoleMappingRecordResult)
+        ]
+        applied: list[RoleMappingRecordResult] = []
+        try:
+            if records:
+                applied = await self.role_repository.upsert_role_mappings(records)
+        except Exception:
+            first_line = chunk[0][0]
+            self.logger.exception(
+                f"Bulk import failed for the chunk at line {first_line}"
+            )
+            applied = [
+                RoleMappingRecordResult(
+                    type=record.type,
+                    role_id=record.role_id,
+                    status=500,
+                    errors=["System error"],
+                )
+                for record in records
+            ]
+        applied_results = iter(applied)
+        results = []
+        for line_number, entry in chunk:
+            if isinstance(entry, RoleMappingRecordResult):
+                results.append(entry)
+            else:
+                result = next(applied_results)
+                result.line = line_number
+                results.append(result)
+        return results
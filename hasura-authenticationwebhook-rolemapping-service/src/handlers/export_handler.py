@@ -0,0 +1,60 @@
+from typing import AsyncIterator
+
+from pydantic import BaseSettings
+
+from src.models import (
+    GroupRolesRecord,
+    RoleMappingRecord,
+    RoleRecord,
+    UserRolesRecord,
+)
+from src.repositories.roles_repository import RoleRepository
+
+
+class ExportConfig(BaseSettings):
+    export_page_size: int = 500
+
+
+class ExportHandler:
+    """Exports the role mappings as the records taken by the bulk import, so
+    that an export can be imported back as is
+
+    The roles are read in pages of export_page_size roles, ordered by role_id,
+    each page starting after the last role of the previous one, and the
+    mappings of each page are read with one query: the memory held doesn't
+    depend on the number of roles. The pages are not read in a single
+    transaction, so the export is not a point-in-time copy of the tables.
+    """
+
+    def __init__(self, config: ExportConfig, role_repository: RoleRepository):
+        self.config = config
+        self.role_repository = role_repository
+
+    async def export_records(self) -> AsyncIterator[RoleMappingRecord]:
+        """Returns, for each role in role_id order, its role record followed
+        by its user roles and group roles records"""
+        page_size = max(1, self.config.export_page_size)
+        after: str | None = None
+        while True:
+            roles = await self.role_repository.list_roles(after, page_size)
+            if not roles:
+                return
+            role_mappings = await self.role_repository.get_role_mappings(
+                [role.role_id for role in roles]
+            )
+            for mappings in role_mappings:
+                yield RoleRecord(
+                    type="role",
+                    role_id=mappings.role_id,
+                    component_id=mappings.component_id,
+                    graphql_root_field_names=mappings.graphql_root_field_names,
+                )
+                yield UserRolesRecord(
+                    type="user_roles", role_id=mappings.role_id, users=mappings.users
+                )
+                yield GroupRolesRecord(
+                    type="group_roles", role_id=mappings.role_id, groups=mappings.groups
+                )
+            if len(roles) < page_size:
+                return
+            after = roles[-1].role_id
@@ -0,0 +1,266 @@
+import re
+from typing import NamedTuple, cast
+
+from graphql import GraphQLError, GraphQLSyntaxError, OperationType
+from graphql.language import Lexer, Source, Token, TokenKind
+
+_OPERATION_TYPES = {
+    "query": OperationType.QUERY,
+    "mutation": OperationType.MUTATION,
+    "subscription": OperationType.SUBSCRIPTION,
+}
+# root selections are either a field name or a fragment spread
+_Selections = list[tuple[bool, str]]
+# name, type and root selections of an operation
+_Operation = tuple[str | None, OperationType, _Selections]
+# what matters when skipping a bracketed group: its brackets, and the strings
+# and comments, whose content is ignored
+_SKIP_PATTERNS = {
+    TokenKind.BRACE_L: ("{", re.compile(r'[{}"#]')),
+    TokenKind.PAREN_L: ("(", re.compile(r'[()"#]')),
+}
+_STRING_END = re.compile(r'(?:[^"\\\n\r]|\\.)*"')
+_LINE_END = re.compile(r"[\n\r]")
+
+
+class QuerySignature(NamedTuple):
+    """What the authorization needs to know about a graphql query"""
+
+    operation_types: tuple[OperationType, ...]
+    root_field_names: tuple[str, ...]
+
+
+def _skip_block_string(body: str, position: int) -> int:
+    """Returns the position right after the block string whose content starts
+    at position, -1 if it's not terminated"""
+    while True:
+        position = body.find('"""', position)
+        if position < 0:
+            return -1
+        if body[position - 1] != "\\":
+            return position + 3
+        # escaped triple quote
+        position += 3
+
+
+def _skip_group(
+    body: str, position: int, open_char: str, pattern: re.Pattern[str]
+) -> int:
+    """Returns the position right after the bracket closing the group opened
+    just before position, -1 if the group is not closed"""
+    depth = 1
+    while depth:
+        match = pattern.search(body, position)
+        if match is None:
+            return -1
+        char = match.group()
+        position = match.end()
+        if char == open_char:
+            depth += 1
+        elif char == "#":
+            match = _LINE_END.search(body, position)
+            position = match.end() if match is not None else len(body)
+        elif char == '"' and body.startswith('""', position):
+            position = _skip_block_string(body, position + 2)
+            if position < 0:
+                return -1
+        elif char == '"':
+            match = _STRING_END.match(body, position)
+            if match is None:
+                return -1
+            position = match.end()
+        else:
+            depth -= 1
+    return position
+
+
+class _RootSelectionsReader:
+    """Reads the root selections of the definitions of a graphql document
+    from its tokens, without building its AST
+
+    The nested selection sets, arguments and variable definitions are skipped
+    by counting their brackets, without tokenizing their content.
+    """
+
+    def __init__(self, query: str):
+        self.source = Source(query)
+        self.lexer = Lexer(self.source)
+        self.token: Token = self.lexer.token
+
+    def advance(self) -> Token:
+        self.token = self.lexer.advance()
+        return self.token
+
+    def error(self, description: str) -> GraphQLSyntaxError:
+        return GraphQLSyntaxError(self.source, self.token.start, description)
+
+    def expect(self, kind: TokenKind) -> Token:
+        token = self.token
+        if token.kind != kind:
+            raise self.error(f"Expected {kind.value}, found {token.desc}.")
+        self.advance()
+        return token
+
+    def expect_name(self, value: str | None = None) -> str:
+        token = self.expect(TokenKind.NAME)
+        if value is not None and token.value != value:
+            raise self.error(f"Expected '{value}', found '{token.value}'.")
+        # a NAME token always has a value
+        assert token.value is not None
+        return token.value
+
+    def skip_brackets(self, open_kind: TokenKind, close_kind: TokenKind) -> None:
+        """Skips a bracketed group, if the current token opens one
+
+        The group is scanned on the raw text rather than tokenized, only
+        strings and comments are recognized so that the brackets they hold
+        are not counted.
+        """
+        if self.token.kind != open_kind:
+            return
+        body = self.source.body
+        end = _skip_group(body, self.token.end, *_SKIP_PATTERNS[open_kind])
+        if end < 0:
+            self.token = Token(TokenKind.EOF, len(body), len(body), 0, 0)
+            raise self.error(f"Expected {close_kind.value}, found <EOF>.")
+        # the lexer resumes right after the closing bracket
+        self.token = self.lexer.token = Token(close_kind, end - 1, end, 0, 0)
+        self.advance()
+
+    def skip_directives(self) -> None:
+        while self.token.kind == TokenKind.AT:
+            self.advance()
+            self.expect(TokenKind.NAME)
+            self.skip_brackets(TokenKind.PAREN_L, TokenKind.PAREN_R)
+
+    def read_document(self) -> tuple[list[_Operation], dict[str, _Selections]]:
+        """Returns the operations, with their name, type and root selections,
+        and the fragment definitions, with their root selections"""
+        operations: list[_Operation] = []
+        fragments: dict[str, _Selections] = {}
+        self.expect(TokenKind.SOF)
+        while True:
+            token = self.token
+            if token.kind == TokenKind.BRACE_L:
+                operations.append(
+                    (None, OperationType.QUERY, self.read_selection_set())
+                )
+            elif token.kind == TokenKind.NAME and token.value in _OPERATION_TYPES:
+                self.advance()
+                name = None
+                if self.token.kind == TokenKind.NAME:
+                    name = self.expect_name()
+                self.skip_brackets(TokenKind.PAREN_L, TokenKind.PAREN_R)
+                self.skip_directives()
+                operations.append(
+                    (name, _OPERATION_TYPES[token.value], self.read_selection_set())
+                )
+            elif token.kind == TokenKind.NAME and token.value == "fragment":
+                self.advance()
+                name = self.expect_name()
+                if name == "on":
+                    raise self.error("Unexpected Name 'on'.")
+                self.expect_name("on")
+                self.expect(TokenKind.NAME)
+                self.skip_directives()
+                fragments[name] = self.read_selection_set()
+            elif token.kind == TokenKind.EOF and (operations or fragments):
+                return operations, fragments
+            else:
+                raise self.error(f"Unexpected {token.desc}.")
+
+    def read_selection_set(self) -> _Selections:
+        selections: _Selections = []
+        self.expect(TokenKind.BRACE_L)
+        while True:
+            token = self.token
+            if token.kind == TokenKind.NAME:
+                name = cast(str, token.value)
+                if self.advance().kind == TokenKind.COLON:
+                    # aliased field
+                    self.advance()
+                    name = self.expect_name()
+                selections.append((False, name))
+                self.skip_brackets(TokenKind.PAREN_L, TokenKind.PAREN_R)
+                self.skip_directives()
+                self.skip_brackets(TokenKind.BRACE_L, TokenKind.BRACE_R)
+            elif token.kind == TokenKind.SPREAD:
+                self.advance()
+                if self.token.kind == TokenKind.NAME and self.token.value != "on":
+                    selections.append((True, self.expect_name()))
+                    self.skip_directives()
+                else:
+                    # inline fragment, its selections are at the same level
+                    if self.token.kind == TokenKind.NAME:
+                        self.advance()
+                        self.expect(TokenKind.NAME)
+                    self.skip_directives()
+                    selections.extend(self.read_selection_set())
+            elif token.kind == TokenKind.BRACE_R and selections:
+                self.advance()
+                return selections
+            else:
+                raise self.error(f"Expected Name, found {token.desc}.")
+
+
+def _expand(
+    selections: _Selections,
+    fragments: dict[str, _Selections],
+    root_field_names: dict[str, None],
+    visiting: set[str],
+) -> None:
+    for is_spread, name in selections:
+        if not is_spread:
+            root_field_names[name] = None
+            continue
+        if name not in fragments:
+            raise GraphQLError(f"Unknown fragment '{name}'.")
+        if name in visiting:
+            raise GraphQLError(f"Cannot spread fragment '{name}' within itself.")
+        visiting.add(name)
+        _expand(fragments[name], fragments, root_field_names, visiting)
+        visiting.remove(name)
+
+
+def _select_operation(
+    operations: list[_Operation], operation_name: str | None
+) -> _Operation:
+    if operation_name is not None:
+        for operation in operations:
+            if operation[0] == operation_name:
+                return operation
+        raise GraphQLError(f"Unknown operation named '{operation_name}'.")
+    if len(operations) != 1:
+        raise GraphQLError(
+            "Must provide operation name if query contains multiple operations."
+        )
+    return operations[0]
+
+
+def parse_query_signature(
+    query: str, operation_name: str | None = None
+) -> QuerySignature:
+    """Computes the signature of the operation of a graphql query that will
+    be executed, from the query tokens
+
+    Only the root selections of the operation are read; the fragments spread
+    at the root level, inline or not, are expanded and the root field names
+    are deduplicated.
+
+    Args:
+        query: The graphql query
+        operation_name: The name of the operation to execute, needed only if
+            the query contains several operations
+
+    Returns:
+        The operation type and the root field names of the operation
+
+    Raises:
+        GraphQLError: if the graphql query has syntax errors, if the operation
+            to execute can't be determined or if it spreads an unknown fragment
+    """
+    operations, fragments = _RootSelectionsReader(query).read_document()
+    _, operation_type, selections = _select_operation(operations, operation_name)
+    root_field_names: dict[str, None] = {}
+    _expand(selections, fragments, root_field_names, set())
+    return QuerySignature((operation_type,), tuple(root_field_names))
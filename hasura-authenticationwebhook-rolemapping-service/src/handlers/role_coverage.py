@@ -0,0 +1,42 @@
+from typing import Iterable, Sequence
+
+from src.models import RoleGraphqlRootFieldName
+
+
+class RoleCoverage:
+    """Root fields covered by each role, as bitsets
+
+    Built once per request from the roles of the root fields, in a single pass;
+    every check is then a lookup and an integer comparison.
+
+    Args:
+        roles: The roles of the root fields
+        root_field_names: The root fields to cover
+    """
+
+    def __init__(
+        self,
+        roles: Iterable[RoleGraphqlRootFieldName],
+        root_field_names: Sequence[str],
+    ):
+        bits: dict[str, int] = {}
+        for root_field_name in root_field_names:
+            bits.setdefault(root_field_name, 1 << len(bits))
+        self.full_mask = (1 << len(bits)) - 1
+        self.masks: dict[str, int] = {}
+        for role in roles:
+            bit = bits.get(role.graphql_root_field_name)
+            if bit is not None:
+                self.masks[role.role_id] = self.masks.get(role.role_id, 0) | bit
+        self.covering_roles = frozenset(
+            role_id for role_id, mask in self.masks.items() if mask == self.full_mask
+        )
+
+    def covers_all(self, role_id: str) -> bool:
+        """Returns whether the role has access to all the root fields"""
+        return self.masks.get(role_id, 0) == self.full_mask
+
+    def preferred_role(self, role_set: Iterable[str]) -> str | None:
+        """Returns the role of the role set that has access to all the root
+        fields, the first in alphabetical order if many, None if none"""
+        return min(self.covering_roles.intersection(role_set), default=None)
@@ -1,26 +1,32 @@
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List
-
-from gql import gql
-from graphql import (
-    ExecutableDefinitionNode,
-    FieldNode,
-    GraphQLError,
-    OperationDefinitionNode,
-    OperationType,
-)
+from typing import Any, Dict, List
+
+from graphql import GraphQLError, OperationType
 from pydantic import BaseSettings
 
+from src.cache import TTLCache
+from src.handlers.query_signature import QuerySignature, parse_query_signature
+from src.handlers.role_coverage import RoleCoverage
 from src.jwt.claims_service import ClaimsService
 from src.jwt.jwt_service import JWTService
 from src.models import (
     AuthenticationRequest,
     AuthenticationResponse,
-    RoleGraphqlRootFieldName,
 )
 from src.repositories.roles_repository import RoleRepository
 
 
+def _drop_task(task: asyncio.Task) -> None:
+    """Cancels a task whose result is no longer needed, or retrieves the
+    exception of a finished one so that it isn't reported as unhandled"""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
 class WebhookHandlerUnauthorizedException(Exception):
     pass
 
@@ -35,6 +41,10 @@ class WebhookHandlerInvalidQueryException(Exception):
 
 class WebhookConfig(BaseSettings):
     authorization_header_field_names: List[str]
+    query_signature_cache_max_entries: int = 1000
+    requested_role_header_field_names: List[str] = []
+    requested_role_cache_ttl: float = 30.0
+    requested_role_cache_max_entries: int = 10000
 
 
 class WebhookHandler:
@@ -51,6 +61,23 @@ class WebhookHandler:
         self.webhook_config = webhook_config
         self.PREFIX = "Bearer"
         self.logger = logging.getLogger(__name__)
+        # the same few queries are sent over and over, their signature is
+        # cached by digest so that they are parsed once
+        self.query_signature_cache: TTLCache[
+            tuple[bytes, str | None], QuerySignature
+        ] = TTLCache(self.webhook_config.query_signature_cache_max_entries)
+        # point lookups of the requested roles: root field names by role and
+        # role membership by role, user and groups
+        self.role_root_field_names_cache: TTLCache[str, frozenset[str]] = TTLCache(
+            self.webhook_config.requested_role_cache_max_entries,
+            self.webhook_config.requested_role_cache_ttl,
+        )
+        self.role_membership_cache: TTLCache[
+            tuple[str, str, tuple[str, ...]], bool
+        ] = TTLCache(
+            self.webhook_config.requested_role_cache_max_entries,
+            self.webhook_config.requested_role_cache_ttl,
+        )
 
     def get_token(self, headers: Dict[str, str]) -> str:
         """Extracts the JWT token from headers
@@ -89,6 +116,13 @@ class WebhookHandler:
     ) -> AuthenticationResponse:
         """Authenticates a request
 
+        The checks run from the cheapest to the most expensive, and the first
+        decisive one wins: the operation type, the token, the roles of the
+        root fields and of the user, and only then the roles of the groups of
+        the user. The groups may require a call to the membership service, so
+        they are resolved while the roles are looked up. A role requested by
+        the client, if any, is checked before the roles of the user.
+
         Args:
             authentication_request: Authentication request sent by Hasura about a client
 
@@ -101,106 +135,248 @@ class WebhookHandler:
         """
         try:
             token = self.get_token(authentication_request.headers)
-            self.jwt_service.validate(token)
-            payload = self.jwt_service.get_payload(token)
+        except Exception:
+            self.logger.exception("Exception in authenticate_request")
+            raise WebhookHandlerUnauthorizedException()
+
+        # a syntax error is only reported to authenticated clients
+        query_error: WebhookHandlerInvalidQueryException | None = None
+        root_field_names: list[str] = []
+        try:
+            root_field_names = self.get_root_field_names(
+                authentication_request.request.query,
+                authentication_request.request.operationName,
+            )
+        except WebhookHandlerInvalidQueryException as iqe:
+            query_error = iqe
+
+        try:
+            payload = await self.jwt_service.validate_and_decode(token)
             jwt_user = await self.claims_service.get_user(payload)
-            jwt_groups = await self.claims_service.get_groups(payload)
         except Exception:
             self.logger.exception("Exception in authenticate_request")
             raise WebhookHandlerUnauthorizedException()
-        else:
-            try:
-                parsed_query = gql(authentication_request.request.query)
-            except GraphQLError as ge:
-                # query parse error
-                self.logger.exception("Query parse error:")
-                raise WebhookHandlerInvalidQueryException(
-                    f"Graphql query has one or more errors. {ge.message}"
+        if query_error is not None:
+            raise query_error
+
+        acl_user = self.map_jwt_user_to_witboost_format(jwt_user)
+
+        # the groups may require a call to the membership service: it runs
+        # while the roles are looked up, and is dropped if they decide alone
+        groups_task = asyncio.create_task(self.get_acl_groups(payload))
+        try:
+            requested_role = self.get_requested_role(authentication_request.headers)
+            if requested_role is not None:
+                response = await self.authenticate_requested_role(
+                    requested_role, groups_task, jwt_user, acl_user, root_field_names
                 )
-            else:
-                # if there's an operation type different from query -> 401
-                for d in parsed_query.definitions:
-                    if isinstance(d, OperationDefinitionNode):
-                        if d.operation != OperationType.QUERY:
-                            self.logger.error(
-                                f"Attempted an operation different from QUERY: {d.operation}"  # noqa: E501
-                            )
-                            raise WebhookHandlerUnauthorizedException()
-
-                # mapping user and groups to witboost format
-                acl_user = self.map_jwt_user_to_witboost_format(jwt_user)
-                acl_groups = [
-                    self.map_jwt_group_to_witboost_format(jwt_group)
-                    for jwt_group in jwt_groups
-                ]
-
-                role_set = await self.role_repository.get_roles_by_user_and_groups(
-                    acl_user, acl_groups
+                if response is not None:
+                    return response
+
+            # the roles of the root_field_names and the roles of the user at once
+            authorization_data = await self.role_repository.get_authorization_data(
+                acl_user, [], root_field_names
+            )
+
+            # roles with access to all the root_field_names
+            coverage = RoleCoverage(
+                authorization_data.role_graphql_root_field_names, root_field_names
+            )
+            if len(coverage.covering_roles) == 0:
+                self.logger.error(
+                    f"No roles were found that satisfied the search queries for the user {jwt_user}"  # noqa: E501
                 )
-                if len(role_set) == 0:
-                    self.logger.error(f"The role set for the user {jwt_user} is empty")
-                    raise WebhookHandlerUnauthorizedException()
-
-                # extract all root_field_names from query
-                root_field_names: list[str] = []
-                for d in parsed_query.definitions:
-                    if isinstance(d, ExecutableDefinitionNode):
-                        for s in d.selection_set.selections:
-                            if isinstance(s, FieldNode):
-                                root_field_names.append(s.name.value)
-                # get the corresponding roles
-                roles = await self.role_repository.get_role_graphql_root_field_names(
-                    root_field_names
+                raise WebhookHandlerUnauthorizedException()
+
+            # the roles of the user alone may be enough
+            role = coverage.preferred_role(authorization_data.roles)
+            if role is not None:
+                return AuthenticationResponse(
+                    X_Hasura_User_Id=acl_user, X_Hasura_Role=role
                 )
 
-                # roles with access to all the root_field_names
-                valid_roles = [
-                    r.role_id
-                    for r in roles
-                    if self.has_access_to_all_root_field_names(
-                        r.role_id, roles, root_field_names
-                    )
-                ]
-
-                if len(valid_roles) == 0:
-                    self.logger.error(
-                        f"No roles were found that satisfied the search queries for the user {jwt_user}"  # noqa: E501
-                    )
-                    raise WebhookHandlerUnauthorizedException()
-
-                # if there's one or more roles in the user role set, the user has access
-                for valid_role in valid_roles:
-                    if valid_role in role_set:
-                        return AuthenticationResponse(
-                            X_Hasura_User_Id=acl_user, X_Hasura_Role=valid_role
-                        )
+            acl_groups = await groups_task
+        finally:
+            _drop_task(groups_task)
+
+        # only the roles of the groups are missing from the role set
+        group_roles = (
+            await self.role_repository.get_roles_by_groups(acl_groups)
+            if acl_groups
+            else []
+        )
+        role_set = list(dict.fromkeys(authorization_data.roles + group_roles))
+        if len(role_set) == 0:
+            self.logger.error(f"The role set for the user {jwt_user} is empty")
+            raise WebhookHandlerUnauthorizedException()
+
+        # if there's one or more roles in the user role set, the user has access
+        role = coverage.preferred_role(role_set)
+        if role is not None:
+            return AuthenticationResponse(X_Hasura_User_Id=acl_user, X_Hasura_Role=role)
+
+        self.logger.error(
+            f"The intersection between the valid roles and the role set for the user {jwt_user} is empty"  # noqa: E501
+        )
+        raise WebhookHandlerUnauthorizedException()
+
+    def get_requested_role(self, headers: Dict[str, str]) -> str | None:
+        """Extracts the role requested by the client from headers, if any"""
+        for n in self.webhook_config.requested_role_header_field_names:
+            requested_role = headers.get(n)
+            if requested_role:
+                return requested_role
+        return None
+
+    async def authenticate_requested_role(
+        self,
+        requested_role: str,
+        groups_task: asyncio.Task[list[str]],
+        jwt_user: str,
+        acl_user: str,
+        root_field_names: list[str],
+    ) -> AuthenticationResponse | None:
+        """Authenticates a request for the role requested by the client
+
+        Only the requested role is checked, with point lookups: its access to
+        the root fields, then its membership for the user alone and only then
+        for the user's groups, awaited from groups_task, which the caller
+        keeps for the full role set if the requested role is not granted.
+
+        Returns:
+            The authentication response, None if the requested role doesn't
+            have access to all the root fields or is not in the role set of
+            the user
+        """
+        role_root_field_names = await self.get_role_root_field_names(requested_role)
+        if not role_root_field_names.issuperset(root_field_names):
+            self.logger.info(
+                f"The requested role {requested_role} has no access to all the root fields {root_field_names}"  # noqa: E501
+            )
+            return None
+
+        if await self.has_role(requested_role, acl_user, []):
+            return AuthenticationResponse(
+                X_Hasura_User_Id=acl_user, X_Hasura_Role=requested_role
+            )
+
+        acl_groups = await groups_task
+        if acl_groups and await self.has_role(requested_role, acl_user, acl_groups):
+            return AuthenticationResponse(
+                X_Hasura_User_Id=acl_user, X_Hasura_Role=requested_role
+            )
+
+        self.logger.info(
+            f"The requested role {requested_role} is not in the role set for the user {jwt_user}"  # noqa: E501
+        )
+        return None
 
+    async def get_acl_groups(self, payload: dict[str, Any]) -> list[str]:
+        """Returns the groups of the user in the witboost format
+
+        Raises:
+            WebhookHandlerUnauthorizedException: if the groups can't be resolved
+        """
+        try:
+            jwt_groups = await self.claims_service.get_groups(payload)
+        except Exception:
+            self.logger.exception("Exception in authenticate_request")
+            raise WebhookHandlerUnauthorizedException()
+        return [
+            self.map_jwt_group_to_witboost_format(jwt_group) for jwt_group in jwt_groups
+        ]
+
+    async def get_role_root_field_names(self, role_id: str) -> frozenset[str]:
+        """Returns the root field names of a role, from cache if possible"""
+        root_field_names = self.role_root_field_names_cache.get(role_id)
+        if root_field_names is None:
+            root_field_names = frozenset(
+                await self.role_repository.get_graphql_root_field_names_by_role_id(
+                    role_id
+                )
+            )
+            self.role_root_field_names_cache.set(role_id, root_field_names)
+        return root_field_names
+
+    async def has_role(
+        self, role_id: str, acl_user: str, acl_groups: list[str]
+    ) -> bool:
+        """Returns whether the role is in the role set of the user, from cache
+        if possible"""
+        key = (role_id, acl_user, tuple(sorted(acl_groups)))
+        granted = self.role_membership_cache.get(key)
+        if granted is None:
+            granted = await self.role_repository.has_role(role_id, acl_user, acl_groups)
+            self.role_membership_cache.set(key, granted)
+        return granted
+
+    def get_root_field_names(
+        self, query: str, operation_name: str | None = None
+    ) -> list[str]:
+        """Extracts the root field names of a graphql query
+
+        Args:
+            query: The graphql query
+            operation_name: The name of the operation to execute
+
+        Returns:
+            The root field names of the query
+
+        Raises:
+            WebhookHandlerUnauthorizedException: if the query is not a QUERY operation
+            WebhookHandlerInvalidQueryException: if the graphql query has syntax errors
+        """
+        signature = self.get_query_signature(query, operation_name)
+
+        # if there's an operation type different from query -> 401
+        for operation_type in signature.operation_types:
+            if operation_type != OperationType.QUERY:
                 self.logger.error(
-                    f"The intersection between the valid roles and the role set for the user {jwt_user} is empty"  # noqa: E501
+                    f"Attempted an operation different from QUERY: {operation_type}"
                 )
                 raise WebhookHandlerUnauthorizedException()
+        return list(signature.root_field_names)
+
+    def get_query_signature(
+        self, query: str, operation_name: str | None = None
+    ) -> QuerySignature:
+        """Returns the signature of a graphql query, parsing it only if it's
+        not cached
+
+        Raises:
+            WebhookHandlerInvalidQueryException: if the graphql query has syntax errors
+        """
+        key = (hashlib.sha256(query.encode()).digest(), operation_name)
+        signature = self.query_signature_cache.get(key)
+        if signature is None:
+            signature = self.parse_query_signature(query, operation_name)
+            self.query_signature_cache.set(key, signature)
+        return signature
+
+    def parse_query_signature(
+        self, query: str, operation_name: str | None = None
+    ) -> QuerySignature:
+        """Parses a graphql query and computes the signature of the operation
+        to execute
+
+        Raises:
+            WebhookHandlerInvalidQueryException: if the graphql query has syntax errors
+        """
+        try:
+            return parse_query_signature(query, operation_name)
+        except GraphQLError as ge:
+            # query parse error
+            self.logger.exception("Query parse error:")
+            raise WebhookHandlerInvalidQueryException(
+                f"Graphql query has one or more errors. {ge.message}"
+            )
+
+    def query_signature_cache_stats(self) -> dict[str, float]:
+        """Returns the counters of the query signature cache"""
+        return self.query_signature_cache.stats()
 
     def map_jwt_user_to_witboost_format(self, jwt_user: str) -> str:
         return f"user:{jwt_user.replace('@', '_', 1)}"
 
     def map_jwt_group_to_witboost_format(self, jwt_group: str) -> str:
         return f"group:{jwt_group}"
-
-    def has_access_to_all_root_field_names(
-        self,
-        role_id: str,
-        roles: list[RoleGraphqlRootFieldName],
-        root_field_names: list[str],
-    ) -> bool:
-        for root_field_name in root_field_names:
-            found = False
-            for role in roles:
-                if (
-                    role.graphql_root_field_name == root_field_name
-                    and role.role_id == role_id
-                ):
-                    found = True
-                    break
-            if found is False:
-                return False
-        return True
@@ -1,5 +1,5 @@
 import logging
-from typing import Any
+from typing import Any, Sequence
 
 from src.jwt.membership_service import MembershipService
 
@@ -7,13 +7,51 @@ from .claims_service import ClaimsService
 
 
 class AzureClaimsService(ClaimsService):
-    def __init__(self, membership_service: MembershipService):
+    """Claims of Azure AD tokens
+
+    Args:
+        membership_service: Used to get the groups of the user
+        groups_claims: Token claims the groups are read from, before calling
+            the membership service; empty to always call it
+    """
+
+    def __init__(
+        self,
+        membership_service: MembershipService,
+        groups_claims: Sequence[str] = (),
+    ):
         self.membership_service = membership_service
+        self.groups_claims = groups_claims
         self.logger = logging.getLogger(__name__)
 
     async def get_user(self, payload: dict[str, Any]) -> str:
         return payload["unique_name"]
 
     async def get_groups(self, payload: dict[str, Any]) -> list[str]:
-        groups = await self.membership_service.get_memberships(payload["oid"])
+        groups = self._get_groups_from_claims(payload)
+        if groups is None:
+            groups = await self.membership_service.get_memberships(payload["oid"])
         return groups
+
+    def _get_groups_from_claims(self, payload: dict[str, Any]) -> list[str] | None:
+        """Returns the groups found in the token claims, None if the token
+        doesn't hold them all"""
+        if not self.groups_claims or self._has_groups_overage(payload):
+            return None
+        groups: dict[str, None] = {}
+        found = False
+        for claim in self.groups_claims:
+            values = payload.get(claim)
+            if isinstance(values, list):
+                found = True
+                groups.update(dict.fromkeys(values))
+        return list(groups) if found else None
+
+    @staticmethod
+    def _has_groups_overage(payload: dict[str, Any]) -> bool:
+        # when a user is a member of too many groups, Azure AD leaves them out
+        # of the token and signals it with hasgroups or _claim_names
+        claim_names = payload.get("_claim_names")
+        return bool(payload.get("hasgroups")) or (
+            isinstance(claim_names, dict) and "groups" in claim_names
+        )
@@ -1,18 +1,32 @@
+from typing import Any
+
 from azure.identity import ClientSecretCredential
 from kiota_authentication_azure.azure_identity_authentication_provider import (  # type: ignore # noqa: E501
     AzureIdentityAuthenticationProvider,
 )
 from msgraph import GraphRequestAdapter, GraphServiceClient  # type: ignore
+from msgraph.generated.users.item.transitive_member_of.graph_group.graph_group_request_builder import (  # type: ignore # noqa: E501
+    GraphGroupRequestBuilder,
+)
 from pydantic import BaseSettings
 
 from src.jwt.membership_service import MembershipService
 
+_GroupsRequestConfiguration = (
+    GraphGroupRequestBuilder.GraphGroupRequestBuilderGetRequestConfiguration
+)
+_GroupsQueryParameters = (
+    GraphGroupRequestBuilder.GraphGroupRequestBuilderGetQueryParameters
+)
+
 
 class AzureConfig(BaseSettings):
     azure_tenant_id: str
     azure_client_id: str
     azure_client_secret: str
     azure_scopes: list[str]
+    azure_memberships_page_size: int = 999
+    azure_groups_claims: list[str] = []
 
 
 class AzureMembershipService(MembershipService):
@@ -29,13 +43,46 @@ class AzureMembershipService(MembershipService):
         self.request_adapter = GraphRequestAdapter(self.auth_provider)
         self.client = GraphServiceClient(self.request_adapter)
 
+    def _get_groups_request_builder(self, user_id: str) -> GraphGroupRequestBuilder:
+        return self.client.users.by_user_id(user_id).transitive_member_of.graph_group
+
     async def get_memberships(self, user_id: str) -> list[str]:
-        memberships = await self.client.users.by_user_id(
-            user_id
-        ).transitive_member_of.get()
+        """Returns the display names of the groups the user is a transitive
+        member of
+
+        Only groups are requested, with their display name only, and every
+        page of the response is followed. The pages are fetched one after
+        the other, as the link to a page is only known from the previous one.
+        """
+        request_builder = self._get_groups_request_builder(user_id)
+        request_configuration = self._get_request_configuration(
+            _GroupsQueryParameters(
+                select=["displayName"],
+                top=self.config.azure_memberships_page_size,
+                count=True,
+            )
+        )
         groups: list[str] = []
-        if memberships and memberships.value:
-            for membership in memberships.value:
-                if membership.odata_type == "#microsoft.graph.group":
-                    groups.append(membership.display_name)
+        page = await request_builder.get(request_configuration)
+        while page:
+            for group in page.value or []:
+                if group.display_name:
+                    groups.append(group.display_name)
+            if not page.odata_next_link:
+                break
+            # the next link already holds the query parameters
+            page = await request_builder.with_url(page.odata_next_link).get(
+                self._get_request_configuration()
+            )
         return groups
+
+    def _get_request_configuration(self, query_parameters: Any = None) -> Any:
+        """Returns the configuration of a request for a page of groups, with
+        the given _GroupsQueryParameters"""
+        request_configuration = _GroupsRequestConfiguration(
+            query_parameters=query_parameters
+        )
+        # the OData cast to groups is an advanced query, which requires the
+        # eventual consistency level and $count
+        request_configuration.headers.add("ConsistencyLevel", "eventual")
+        return request_configuration
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+
+from pydantic import BaseSettings
+
+from src.cache import TTLCache
+from src.jwt.membership_service import MembershipService
+
+
+class MembershipCacheConfig(BaseSettings):
+    membership_cache_ttl: float = 300.0
+    membership_cache_stale_ttl: float = 60.0
+    membership_cache_max_entries: int = 10000
+
+
+class CachingMembershipService(MembershipService):
+    """Caches the memberships returned by another membership service
+
+    Entries older than the TTL are still served for up to the stale TTL while
+    they are refreshed in background. Concurrent misses for the same user
+    share a single call to the wrapped service.
+    """
+
+    def __init__(
+        self, config: MembershipCacheConfig, membership_service: MembershipService
+    ):
+        self.config = config
+        self.membership_service = membership_service
+        self.cache: TTLCache[str, tuple[float, list[str]]] = TTLCache(
+            self.config.membership_cache_max_entries,
+            self.config.membership_cache_ttl + self.config.membership_cache_stale_ttl,
+        )
+        self.logger = logging.getLogger(__name__)
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    async def get_memberships(self, user_id: str) -> list[str]:
+        entry = self.cache.get(user_id)
+        if entry is not None:
+            fetched_at, groups = entry
+            if time.monotonic() - fetched_at > self.config.membership_cache_ttl:
+                self._load(user_id)
+            return groups
+        # shielded, so that a cancelled request doesn't cancel the shared call
+        return await asyncio.shield(self._load(user_id))
+
+    def stats(self) -> dict[str, float]:
+        """Returns the hit, miss and eviction counters of the cache"""
+        return self.cache.stats()
+
+    def invalidate(self, user_id: str | None = None) -> None:
+        """Drops the cached memberships of a user, or of all users if None
+
+        The lookups in flight for the user are not cancelled, since other
+        requests may be waiting for them, but their results are not cached.
+        """
+        if user_id is None:
+            self.cache.clear()
+            self._in_flight.clear()
+        else:
+            self.cache.pop(user_id)
+            self._in_flight.pop(user_id, None)
+
+    def _load(self, user_id: str) -> asyncio.Task:
+        task = self._in_flight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(user_id))
+            self._in_flight[user_id] = task
+            task.add_done_callback(lambda t: self._on_loaded(user_id, t))
+        return task
+
+    async def _fetch(self, user_id: str) -> list[str]:
+        groups = await self.membership_service.get_memberships(user_id)
+        # an invalidation of the user drops its lookup from the ones in
+        # flight, and the result requested before it must not be cached
+        if self._in_flight.get(user_id) is asyncio.current_task():
+            self.cache.set(user_id, (time.monotonic(), groups))
+        return groups
+
+    def _on_loaded(self, user_id: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(user_id) is task:
+            del self._in_flight[user_id]
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error(
+                f"Membership lookup failed for user {user_id}",
+                exc_info=task.exception(),
+            )
@@ -1,10 +1,18 @@
+import asyncio
+import hashlib
 import logging
-from typing import Any
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Literal
 
 import jwt
-from jwt import PyJWKClient, PyJWTError
+from cryptography.hazmat.primitives import serialization
+from jwt import PyJWTError
 from pydantic import BaseSettings
 
+from src.cache import TTLCache
+from src.jwt.jwks_provider import JWKSProvider
 from src.jwt.jwt_service import JWTService
 
 
@@ -13,34 +21,192 @@ class JWTConfig(BaseSettings):
     jwt_audience: str | list[str] | None
     jwt_algorithms: list[str] | None
     jwt_options: dict[str, Any] | None
+    jwt_cache_max_entries: int = 10000
+    jwt_cache_ttl: float = 300.0
+    jwks_refresh_interval: float = 300.0
+    jwks_min_refetch_interval: float = 30.0
+    jwks_timeout: float = 10.0
+    jwt_verification_mode: Literal["inline", "thread", "process"] = "inline"
+    jwt_verification_workers: int | None = None
+    jwt_verification_max_pending: int = 1000
+    jwt_verification_max_wait: float = 1.0
+
+
+class JWTVerificationOverloadedException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def _decode(
+    token: str,
+    key: Any,
+    algorithms: list[str] | None,
+    audience: str | list[str] | None,
+    options: dict[str, Any] | None,
+    submitted_at: float,
+) -> tuple[dict[str, Any], float]:
+    """Verifies and decodes a token, returning the claims and the seconds the
+    verification waited in the executor queue"""
+    queue_wait = time.time() - submitted_at
+    payload = jwt.decode(
+        token, key, algorithms=algorithms, audience=audience, options=options
+    )
+    return payload, queue_wait
+
+
+@lru_cache(maxsize=64)
+def _load_public_key(pem: bytes) -> Any:
+    return serialization.load_pem_public_key(pem)
+
+
+def _decode_pem(
+    token: str,
+    pem: bytes,
+    algorithms: list[str] | None,
+    audience: str | list[str] | None,
+    options: dict[str, Any] | None,
+    submitted_at: float,
+) -> tuple[dict[str, Any], float]:
+    """Same as _decode, with a PEM public key; key objects can't be pickled
+    to worker processes"""
+    return _decode(
+        token, _load_public_key(pem), algorithms, audience, options, submitted_at
+    )
 
 
 class ConcreteJWTService(JWTService):
     def __init__(self, config: JWTConfig):
         self.config = config
-        self.jwks_client: PyJWKClient = PyJWKClient(self.config.jwks_url)
+        self.jwks_provider = JWKSProvider(
+            jwks_url=self.config.jwks_url,
+            refresh_interval=self.config.jwks_refresh_interval,
+            min_refetch_interval=self.config.jwks_min_refetch_interval,
+            timeout=self.config.jwks_timeout,
+        )
+        self.cache: TTLCache[bytes, dict[str, Any]] = TTLCache(
+            self.config.jwt_cache_max_entries, self.config.jwt_cache_ttl
+        )
         self.logger = logging.getLogger(__name__)
+        self.executor: Executor | None = None
+        match self.config.jwt_verification_mode:
+            case "thread":
+                # cryptography releases the GIL while verifying signatures
+                self.executor = ThreadPoolExecutor(
+                    self.config.jwt_verification_workers,
+                    thread_name_prefix="jwt-verification",
+                )
+            case "process":
+                self.executor = ProcessPoolExecutor(
+                    self.config.jwt_verification_workers
+                )
+        self._pending = asyncio.Semaphore(self.config.jwt_verification_max_pending)
+        self.verifications = 0
+        self.verifications_rejected = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    async def start(self) -> None:
+        await self.jwks_provider.start()
 
-    def validate(self, token: str) -> None:
+    async def close(self) -> None:
+        await self.jwks_provider.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def verification_stats(self) -> dict[str, float]:
+        """Returns the counters of the signature verifications run in the
+        executor, with their queue waits in seconds"""
+        return {
+            "verifications": self.verifications,
+            "verifications_rejected": self.verifications_rejected,
+            "queue_wait_total": self.queue_wait_total,
+            "queue_wait_max": self.queue_wait_max,
+            "queue_wait_avg": self.queue_wait_total / self.verifications
+            if self.verifications > 0
+            else 0.0,
+        }
+
+    async def _decode(self, token: str, key: Any) -> dict[str, Any]:
+        args = (
+            self.config.jwt_algorithms,
+            self.config.jwt_audience,
+            self.config.jwt_options,
+        )
+        if self.executor is None:
+            payload, _ = _decode(token, key, *args, time.time())
+            return payload
+        # waiting here bounds the number of verifications queued in the executor
+        submitted_at = time.time()
+        await self._acquire_pending()
+        try:
+            loop = asyncio.get_running_loop()
+            if isinstance(self.executor, ProcessPoolExecutor) and not isinstance(
+                key, (bytes, str)
+            ):
+                pem = key.public_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PublicFormat.SubjectPublicKeyInfo,
+                )
+                task = loop.run_in_executor(
+                    self.executor, _decode_pem, token, pem, *args, submitted_at
+                )
+            else:
+                task = loop.run_in_executor(
+                    self.executor, _decode, token, key, *args, submitted_at
+                )
+            payload, queue_wait = await task
+        finally:
+            self._pending.release()
+        self.verifications += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        return payload
+
+    async def _acquire_pending(self) -> None:
+        """Takes a slot of the executor queue, waiting for at most
+        jwt_verification_max_wait seconds
+
+        Raises:
+            JWTVerificationOverloadedException: if no slot frees up in time
+        """
+        max_wait = self.config.jwt_verification_max_wait
         try:
-            signing_key = self.jwks_client.get_signing_key_from_jwt(token)
-            jwt.decode(
-                token,
-                signing_key.key,
-                algorithms=self.config.jwt_algorithms,
-                audience=self.config.jwt_audience,
-                options=self.config.jwt_options,
+            if max_wait <= 0:
+                if self._pending.locked():
+                    raise asyncio.TimeoutError()
+                await self._pending.acquire()
+            else:
+                await asyncio.wait_for(self._pending.acquire(), max_wait)
+        except asyncio.TimeoutError:
+            self.verifications_rejected += 1
+            raise JWTVerificationOverloadedException(
+                f"Too many pending JWT verifications, rejected after {max_wait}s"
             )
+
+    async def validate(self, token: str) -> None:
+        await self.validate_and_decode(token)
+
+    async def get_payload(self, token: str) -> dict[str, Any]:
+        return await self.validate_and_decode(token)
+
+    async def validate_and_decode(self, token: str) -> dict[str, Any]:
+        digest = hashlib.sha256(token.encode()).digest()
+        payload = self.cache.get(digest)
+        if payload is not None:
+            return payload
+        try:
+            signing_key = await self.jwks_provider.get_signing_key_from_jwt(token)
+            payload = await self._decode(token, signing_key.key)
         except PyJWTError:
             self.logger.exception("Exception in validate:")
             raise
-
-    def get_payload(self, token: str) -> dict[str, Any]:
-        signing_key = self.jwks_client.get_signing_key_from_jwt(token)
-        return jwt.decode(
-            token,
-            signing_key.key,
-            algorithms=self.config.jwt_algorithms,
-            audience=self.config.jwt_audience,
-            options=self.config.jwt_options,
-        )
+        # the token must not outlive its expiration in the cache
+        ttl = self.config.jwt_cache_ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            ttl = min(ttl, exp - time.time())
+        self.cache.set(digest, payload, ttl)
+        return payload
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from typing import Any
+
+import aiohttp
+import jwt
+from jwt import PyJWK, PyJWKClientError, PyJWKSet
+
+
+class JWKSProvider:
+    """Asynchronous JWKS client
+
+    Keeps the signing keys of the JWKS indexed by kid, refreshes them in
+    background and refetches them, at most once every min_refetch_interval
+    seconds, when a token is signed with an unknown kid. Concurrent fetches
+    are coalesced into one.
+
+    Args:
+        jwks_url: The JWKS URL
+        refresh_interval: Seconds between two background refreshes
+        min_refetch_interval: Min seconds between two fetches triggered by
+            unknown kids
+        timeout: Timeout of the JWKS requests, in seconds
+    """
+
+    def __init__(
+        self,
+        jwks_url: str,
+        refresh_interval: float,
+        min_refetch_interval: float,
+        timeout: float,
+    ):
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+        self._keys: dict[str, PyJWK] = {}
+        self._last_fetch: float | None = None
+        self._fetch_task: asyncio.Task | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self._session: aiohttp.ClientSession | None = None
+
+    async def start(self) -> None:
+        """Prefetches the keys and starts the background refresh"""
+        try:
+            await self.refresh()
+        except Exception:
+            self.logger.exception("Initial JWKS fetch failed")
+        self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def refresh(self) -> None:
+        """Fetches the keys, joining the fetch already in flight if any"""
+        if self._fetch_task is None:
+            self._fetch_task = asyncio.create_task(self._fetch())
+        # shielded, so that a cancelled request doesn't cancel the shared fetch
+        await asyncio.shield(self._fetch_task)
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                self.logger.exception("JWKS refresh failed")
+
+    async def _fetch(self) -> None:
+        try:
+            self._last_fetch = time.monotonic()
+            jwk_set = PyJWKSet.from_dict(await self._fetch_jwks())
+            self._keys = {
+                key.key_id: key
+                for key in jwk_set.keys
+                if key.key_id and key.public_key_use in ("sig", None)
+            }
+            self.logger.info(f"JWKS fetched, {len(self._keys)} signing keys")
+        finally:
+            self._fetch_task = None
+
+    async def _fetch_jwks(self) -> dict[str, Any]:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        async with self._session.get(self.jwks_url) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def get_signing_key(self, kid: str) -> PyJWK:
+        """Returns the signing key identified by kid
+
+        Raises:
+            PyJWKClientError: if the key is not found
+        """
+        key = self._keys.get(kid)
+        if key is None and (
+            self._last_fetch is None
+            or time.monotonic() - self._last_fetch >= self.min_refetch_interval
+        ):
+            await self.refresh()
+            key = self._keys.get(kid)
+        if key is None:
+            raise PyJWKClientError(
+                f'Unable to find a signing key that matches: "{kid}"'
+            )
+        return key
+
+    async def get_signing_key_from_jwt(self, token: str) -> PyJWK:
+        """Returns the signing key of the token, from the kid in its header
+
+        Raises:
+            PyJWKClientError: if the key is not found
+        """
+        header = jwt.get_unverified_header(token)
+        return await self.get_signing_key(header.get("kid", ""))
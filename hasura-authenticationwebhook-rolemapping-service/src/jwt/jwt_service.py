@@ -3,8 +3,16 @@ from typing import Any
 
 
 class JWTService(ABC):
+    async def start(self) -> None:
+        """Acquires the resources held for the lifetime of the service"""
+        pass
+
+    async def close(self) -> None:
+        """Releases the resources acquired by start"""
+        pass
+
     @abstractmethod
-    def validate(self, token: str) -> None:
+    async def validate(self, token: str) -> None:
         """Validates a JWT Token
 
         Args:
@@ -16,7 +24,7 @@ class JWTService(ABC):
         pass
 
     @abstractmethod
-    def get_payload(self, token: str) -> dict[str, Any]:
+    async def get_payload(self, token: str) -> dict[str, Any]:
         """Return the claims defined in the JWT token
 
         Args:
@@ -29,3 +37,18 @@ class JWTService(ABC):
             PyJWTError: if the validation fails
         """
         pass
+
+    @abstractmethod
+    async def validate_and_decode(self, token: str) -> dict[str, Any]:
+        """Validates a JWT token and returns its claims, verifying it only once
+
+        Args:
+            token: JWT token to validate
+
+        Returns:
+            The claims defined in the JWT token
+
+        Raises:
+            PyJWTError: if the validation fails
+        """
+        pass
@@ -6,10 +6,14 @@ from __future__ import annotations
 
 import logging
 from functools import lru_cache
-from typing import Annotated, Union
+from typing import Annotated, Optional, Union
 
-from fastapi import Depends, FastAPI, Response, status
+from fastapi import Depends, FastAPI, Query, Request, Response, status
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 
+from src.handlers.bulk_import_handler import BulkImportConfig, BulkImportHandler
+from src.handlers.export_handler import ExportConfig, ExportHandler
 from src.handlers.webhook_handler import (
     WebhookConfig,
     WebhookHandler,
@@ -18,6 +22,10 @@ from src.handlers.webhook_handler import (
 )
 from src.jwt.azure_claims_service import AzureClaimsService
 from src.jwt.azure_membership_service import AzureConfig, AzureMembershipService
+from src.jwt.caching_membership_service import (
+    CachingMembershipService,
+    MembershipCacheConfig,
+)
 from src.jwt.claims_service import ClaimsService
 from src.jwt.concrete_jwt_service import ConcreteJWTService, JWTConfig
 from src.jwt.jwt_service import JWTService
@@ -29,16 +37,29 @@ from src.repositories.graphql_roles_repository import (
     RoleUpsertNotAllowedException,
 )
 from src.repositories.roles_repository import RoleRepository
-from src.utils import setup_logging
+from src.repositories.snapshot_roles_repository import (
+    SnapshotConfig,
+    SnapshotRoleRepository,
+)
+from src.utils import RequestBodyStreamingResponse, setup_logging
 
 from .models import (
     AuthenticationRequest,
     AuthenticationResponse,
+    ComponentAccess,
     GraphqlRootFieldNameRoleMappings,
     GroupRoleMappings,
+    GroupRoleMappingsResult,
     Role,
+    RoleBatchGetRequest,
+    RoleBatchGetResult,
+    RoleList,
+    RoleMappingRecordResult,
+    RoleMappings,
+    RoleSummary,
     SystemError,
     UserRoleMappings,
+    UserRoleMappingsResult,
     ValidationError,
 )
 
@@ -52,16 +73,40 @@ app = FastAPI(
     servers=[{"url": "/datamesh.specificprovisioner"}],
 )
 
+# the NDJSON streams are compressed for the clients accepting gzip
+app.add_middleware(GZipMiddleware)
+
 
 @lru_cache()
-def get_webhook_handler() -> WebhookHandler:
+def get_roles_repository() -> RoleRepository:
+    graphql_config = GraphqlConfig()
+    snapshot_config = SnapshotConfig()
+    graphql_role_repository = GraphqlRoleRepository(graphql_config)
+    if snapshot_config.rolemapping_snapshot_enabled:
+        return SnapshotRoleRepository(snapshot_config, graphql_role_repository)
+    return graphql_role_repository
+
+
+@lru_cache()
+def get_jwt_service() -> JWTService:
     jwt_config = JWTConfig()
+    return ConcreteJWTService(jwt_config)
+
+
+@lru_cache()
+def get_webhook_handler() -> WebhookHandler:
     azure_config = AzureConfig()
-    graphql_config = GraphqlConfig()
-    jwt_service: JWTService = ConcreteJWTService(jwt_config)
+    jwt_service: JWTService = get_jwt_service()
+    membership_cache_config = MembershipCacheConfig()
     membership_service: MembershipService = AzureMembershipService(azure_config)
-    claims_service: ClaimsService = AzureClaimsService(membership_service)
-    role_repository: RoleRepository = GraphqlRoleRepository(graphql_config)
+    if membership_cache_config.membership_cache_ttl > 0:
+        membership_service = CachingMembershipService(
+            membership_cache_config, membership_service
+        )
+    claims_service: ClaimsService = AzureClaimsService(
+        membership_service, azure_config.azure_groups_claims
+    )
+    role_repository: RoleRepository = get_roles_repository()
     webhook_config: WebhookConfig = WebhookConfig()
     return WebhookHandler(
         claims_service=claims_service,
@@ -72,9 +117,25 @@ def get_webhook_handler() -> WebhookHandler:
 
 
 @lru_cache()
-def get_roles_repository() -> RoleRepository:
-    graphql_config = GraphqlConfig()
-    return GraphqlRoleRepository(graphql_config)
+def get_bulk_import_handler() -> BulkImportHandler:
+    return BulkImportHandler(BulkImportConfig(), get_roles_repository())
+
+
+@lru_cache()
+def get_export_handler() -> ExportHandler:
+    return ExportHandler(ExportConfig(), get_roles_repository())
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    await get_roles_repository().start()
+    await get_jwt_service().start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await get_jwt_service().close()
+    await get_roles_repository().close()
 
 
 @app.post(
@@ -110,10 +171,42 @@ async def authenticate_request(
         return SystemError(error="System error")
 
 
+@app.put(
+    "/v1/components/{component_id}/access",
+    responses={
+        "200": {"model": RoleMappings},
+        "400": {"model": ValidationError},
+        "500": {"model": SystemError},
+    },
+    tags=["RoleMapper"],
+)
+async def upsert_component_access(
+    component_id: str,
+    body: ComponentAccess,
+    response: Response,
+    roles_repository: Annotated[RoleRepository, Depends(get_roles_repository)],
+) -> Union[RoleMappings, ValidationError, SystemError]:
+    """
+    Upsert the role of a component with its GraphQL root fields, users and groups, in a single transaction
+    """  # noqa: E501
+    try:
+        res = await roles_repository.upsert_role_access(
+            RoleMappings(component_id=component_id, **body.dict())
+        )
+        return res
+    except RoleUpsertNotAllowedException as e:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return ValidationError(errors=[e.message])
+    except Exception:
+        logger.exception("Exception in /v1/components/component_id/access")
+        response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return SystemError(error="System error")
+
+
 @app.put(
     "/v1/group_roles",
     responses={
-        "200": {"model": GroupRoleMappings},
+        "200": {"model": GroupRoleMappingsResult},
         "400": {"model": ValidationError},
         "500": {"model": SystemError},
     },
@@ -123,7 +216,7 @@ async def upsert_group_roles(
     body: GroupRoleMappings,
     response: Response,
     roles_repository: Annotated[RoleRepository, Depends(get_roles_repository)],
-) -> Union[GroupRoleMappings, ValidationError, SystemError]:
+) -> Union[GroupRoleMappingsResult, ValidationError, SystemError]:
     """
     Upsert role mappings for groups; adds mappings for all groups listed but not already present, removes already present mappings for all unlisted groups
     """  # noqa: E501
@@ -147,6 +240,67 @@ def get_v1_health() -> str:
     return "Alive"
 
 
+@app.get(
+    "/v1/roles",
+    response_model_exclude_none=True,
+    responses={
+        "200": {"model": RoleList},
+        "500": {"model": SystemError},
+    },
+    tags=["RoleMapper"],
+)
+async def list_roles(
+    response: Response,
+    roles_repository: Annotated[RoleRepository, Depends(get_roles_repository)],
+    cursor: Optional[str] = Query(
+        None, description="Cursor of the page, from the previous page"
+    ),
+    limit: int = Query(100, ge=1, le=1000, description="Max number of roles"),
+    component_id_prefix: Optional[str] = Query(
+        None, description="Only the roles whose component id starts with it"
+    ),
+    graphql_root_field_name: Optional[str] = Query(
+        None, description="Only the roles granting this root field name"
+    ),
+    include_counts: bool = Query(
+        False, description="Include the counts of root field names, users, groups"
+    ),
+) -> Union[RoleList, SystemError]:
+    """
+    List roles, ordered by role id
+    """
+    try:
+        roles = await roles_repository.list_roles(
+            cursor, limit, component_id_prefix, graphql_root_field_name
+        )
+        summaries = [
+            RoleSummary(role_id=r.role_id, component_id=r.component_id) for r in roles
+        ]
+        if include_counts and roles:
+            mappings = {
+                m.role_id: m
+                for m in await roles_repository.get_role_mappings(
+                    [r.role_id for r in roles]
+                )
+            }
+            for summary in summaries:
+                if summary.role_id in mappings:
+                    m = mappings[summary.role_id]
+                    summary.graphql_root_field_names_count = len(
+                        m.graphql_root_field_names
+                    )
+                    summary.users_count = len(m.users)
+                    summary.groups_count = len(m.groups)
+        return RoleList(
+            roles=summaries,
+            next_cursor=roles[-1].role_id if len(roles) == limit else None,
+        )
+    except Exception:
+        logger.exception("Exception in /v1/roles")
+        response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return SystemError(error="System error")
+
+
 @app.put(
     "/v1/roles",
     responses={
@@ -176,6 +330,41 @@ async def upsert_role(
         return SystemError(error="System error")
 
 
+@app.post(
+    "/v1/roles:batchGet",
+    responses={
+        "200": {"model": RoleBatchGetResult},
+        "500": {"model": SystemError},
+    },
+    tags=["RoleMapper"],
+)
+async def batch_get_roles(
+    body: RoleBatchGetRequest,
+    response: Response,
+    roles_repository: Annotated[RoleRepository, Depends(get_roles_repository)],
+) -> Union[RoleBatchGetResult, SystemError]:
+    """
+    Get the roles identified by a list of role ids or component ids, in a single lookup
+    """  # noqa: E501
+    try:
+        roles = await roles_repository.get_roles(body.role_ids, body.component_ids)
+        role_ids = {r.role_id for r in roles}
+        component_ids = {r.component_id for r in roles}
+        return RoleBatchGetResult(
+            roles=roles,
+            missing_role_ids=[
+                r for r in dict.fromkeys(body.role_ids) if r not in role_ids
+            ],
+            missing_component_ids=[
+                c for c in dict.fromkeys(body.component_ids) if c not in component_ids
+            ],
+        )
+    except Exception:
+        logger.exception("Exception in /v1/roles:batchGet")
+        response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return SystemError(error="System error")
+
+
 @app.get(
     "/v1/roles/component_id/{component_id}",
     responses={
@@ -239,7 +428,7 @@ async def get_role_by_id(
 @app.put(
     "/v1/user_roles",
     responses={
-        "200": {"model": UserRoleMappings},
+        "200": {"model": UserRoleMappingsResult},
         "400": {"model": ValidationError},
         "500": {"model": SystemError},
     },
@@ -249,7 +438,7 @@ async def upsert_user_roles(
     body: UserRoleMappings,
     response: Response,
     roles_repository: Annotated[RoleRepository, Depends(get_roles_repository)],
-) -> Union[UserRoleMappings, ValidationError, SystemError]:
+) -> Union[UserRoleMappingsResult, ValidationError, SystemError]:
     """
     Upsert role mappings for users; adds mappings for all users listed but not already present, removes already present mappings for all unlisted users
     """  # noqa: E501
@@ -263,3 +452,60 @@ async def upsert_user_roles(
         logger.exception("Exception in /v1/user_roles")
         response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return SystemError(error="System error")
+
+
+@app.post(
+    "/v1/bulk",
+    response_class=RequestBodyStreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "description": "Records to apply, one JSON record per line",
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+            "required": True,
+        }
+    },
+    responses={
+        "200": {
+            "model": RoleMappingRecordResult,
+            "content": {"application/x-ndjson": {}},
+            "description": "The result of each record, one per line",
+        },
+    },
+    tags=["RoleMapper"],
+)
+async def bulk_import(
+    request: Request,
+    bulk_import_handler: Annotated[BulkImportHandler, Depends(get_bulk_import_handler)],
+) -> RequestBodyStreamingResponse:
+    """
+    Upsert roles, user role mappings and group role mappings in bulk, from a NDJSON body with one record per line
+    """  # noqa: E501
+    results = bulk_import_handler.import_records(request.stream())
+    return RequestBodyStreamingResponse(
+        (result.json(exclude_none=True) + "\n" async for result in results),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get(
+    "/v1/export",
+    response_class=StreamingResponse,
+    responses={
+        "200": {
+            "content": {"application/x-ndjson": {}},
+            "description": "The records of the role mappings, one per line",
+        },
+    },
+    tags=["RoleMapper"],
+)
+async def export_role_mappings(
+    export_handler: Annotated[ExportHandler, Depends(get_export_handler)],
+) -> StreamingResponse:
+    """
+    Export all the role mappings as NDJSON, in the format taken by POST /v1/bulk
+    """
+    records = export_handler.export_records()
+    return StreamingResponse(
+        (record.json() + "\n" async for record in records),
+        media_type="application/x-ndjson",
+    )
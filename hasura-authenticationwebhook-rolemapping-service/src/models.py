@@ -4,7 +4,7 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Annotated, Any, Dict, List, Literal, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -63,6 +63,30 @@ class GroupRoleMappings(BaseModel):
     )
 
 
+class UserRoleMappingsResult(BaseModel):
+    role_id: str = Field(..., description="Role id", example="dom1.dp1.0.op.readrole")
+    users: List[str] = Field(
+        ..., description="User list", example=["user:user1", "user:user2"]
+    )
+    inserted: int = Field(..., description="Number of mappings added", example=1)
+    deleted: int = Field(..., description="Number of mappings removed", example=0)
+    unchanged: int = Field(
+        ..., description="Number of mappings already present", example=1
+    )
+
+
+class GroupRoleMappingsResult(BaseModel):
+    role_id: str = Field(..., description="Role id", example="dom1.dp1.0.op.readrole")
+    groups: List[str] = Field(
+        ..., description="Group list", example=["group:group1", "group:group2"]
+    )
+    inserted: int = Field(..., description="Number of mappings added", example=1)
+    deleted: int = Field(..., description="Number of mappings removed", example=0)
+    unchanged: int = Field(
+        ..., description="Number of mappings already present", example=1
+    )
+
+
 class GraphqlRootFieldNameRoleMappings(BaseModel):
     role_id: str = Field(..., description="Role id", example="dom1.dp1.0.op.readrole")
     component_id: str = Field(
@@ -75,6 +99,132 @@ class GraphqlRootFieldNameRoleMappings(BaseModel):
     )
 
 
+class RoleMappings(BaseModel):
+    role_id: str = Field(..., description="Role id", example="dom1.dp1.0.op.readrole")
+    component_id: str = Field(
+        ..., description="Component id in Witboost", example="urn:dmb:cmp:dom1:dp1:0:op"
+    )
+    graphql_root_field_names: List[str] = Field(
+        ...,
+        description="Root field name list",
+        example=["dom1_dp1_0_op1_select", "dom1_dp1_0_op1_aggregate"],
+    )
+    users: List[str] = Field(
+        ..., description="User list", example=["user:user1", "user:user2"]
+    )
+    groups: List[str] = Field(
+        ..., description="Group list", example=["group:group1", "group:group2"]
+    )
+
+
+class ComponentAccess(BaseModel):
+    role_id: str = Field(..., description="Role id", example="dom1.dp1.0.op.readrole")
+    graphql_root_field_names: List[str] = Field(
+        ...,
+        description="Root field name list",
+        example=["dom1_dp1_0_op1_select", "dom1_dp1_0_op1_aggregate"],
+    )
+    users: List[str] = Field(
+        ..., description="User list", example=["user:user1", "user:user2"]
+    )
+    groups: List[str] = Field(
+        ..., description="Group list", example=["group:group1", "group:group2"]
+    )
+
+
+class RoleSummary(BaseModel):
+    role_id: str = Field(..., description="Role id", example="dom1.dp1.0.op.readrole")
+    component_id: str = Field(
+        ..., description="Component id in Witboost", example="urn:dmb:cmp:dom1:dp1:0:op"
+    )
+    graphql_root_field_names_count: Optional[int] = Field(
+        None, description="Number of root field names of the role", example=2
+    )
+    users_count: Optional[int] = Field(
+        None, description="Number of users of the role", example=2
+    )
+    groups_count: Optional[int] = Field(
+        None, description="Number of groups of the role", example=2
+    )
+
+
+class RoleList(BaseModel):
+    roles: List[RoleSummary] = Field(..., description="Roles, ordered by role id")
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Cursor of the next page, missing on the last page",
+        example="dom1.dp1.0.op.readrole",
+    )
+
+
+class RoleBatchGetRequest(BaseModel):
+    role_ids: List[str] = Field(
+        [],
+        description="Ids of the roles to get",
+        example=["dom1.dp1.0.op.readrole"],
+        max_items=100,
+    )
+    component_ids: List[str] = Field(
+        [],
+        description="Component ids of the roles to get",
+        example=["urn:dmb:cmp:dom1:dp1:0:op"],
+        max_items=100,
+    )
+
+
+class RoleBatchGetResult(BaseModel):
+    roles: List[Role] = Field(..., description="Roles found, ordered by role id")
+    missing_role_ids: List[str] = Field(
+        ..., description="Requested role ids without a role", example=[]
+    )
+    missing_component_ids: List[str] = Field(
+        ..., description="Requested component ids without a role", example=[]
+    )
+
+
+class RoleRecord(GraphqlRootFieldNameRoleMappings):
+    type: Literal["role"] = Field(..., description="Record type", example="role")
+
+
+class UserRolesRecord(UserRoleMappings):
+    type: Literal["user_roles"] = Field(
+        ..., description="Record type", example="user_roles"
+    )
+
+
+class GroupRolesRecord(GroupRoleMappings):
+    type: Literal["group_roles"] = Field(
+        ..., description="Record type", example="group_roles"
+    )
+
+
+RoleMappingRecord = Annotated[
+    Union[RoleRecord, UserRolesRecord, GroupRolesRecord],
+    Field(discriminator="type"),
+]
+
+
+class RoleMappingRecordResult(BaseModel):
+    line: Optional[int] = Field(
+        None, description="Line of the record in the request body", example=1
+    )
+    type: Optional[str] = Field(None, description="Record type", example="role")
+    role_id: Optional[str] = Field(
+        None, description="Role id", example="dom1.dp1.0.op.readrole"
+    )
+    status: int = Field(..., description="HTTP status of the record", example=200)
+    inserted: Optional[int] = Field(
+        None, description="Number of mappings added", example=1
+    )
+    deleted: Optional[int] = Field(
+        None, description="Number of mappings removed", example=0
+    )
+    unchanged: Optional[int] = Field(
+        None, description="Number of mappings already present", example=1
+    )
+    errors: Optional[List[str]] = Field(None, description="Errors of the record")
+
+
 class RoleGraphqlRootFieldName(BaseModel):
     role_id: str = Field(..., description="Role id", example="dom1.dp1.0.op.readrole")
     graphql_root_field_name: str = Field(
@@ -82,6 +232,15 @@ class RoleGraphqlRootFieldName(BaseModel):
     )
 
 
+class AuthorizationData(BaseModel):
+    roles: List[str] = Field(
+        ..., description="Role set of the user", example=["dom1.dp1.0.op.readrole"]
+    )
+    role_graphql_root_field_names: List[RoleGraphqlRootFieldName] = Field(
+        ..., description="Roles mapped to the requested root field names"
+    )
+
+
 class ValidationError(BaseModel):
     errors: List[str]
 
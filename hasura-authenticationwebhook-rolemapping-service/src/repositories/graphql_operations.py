@@ -0,0 +1,147 @@
+from copy import deepcopy
+from typing import cast
+
+from gql import gql
+from graphql import (
+    DocumentNode,
+    FieldNode,
+    NameNode,
+    OperationDefinitionNode,
+    VariableNode,
+)
+
+from src.repositories.queries_mutations import (
+    mutation_replace_role_access,
+    mutation_replace_root_field_name_roles,
+    mutation_update_group_roles,
+    mutation_update_role_mappings,
+    mutation_update_user_roles,
+    mutation_upsert_role,
+    query_get_authorization_data,
+    query_get_graphql_root_field_names_by_role_id,
+    query_get_group_role_mappings,
+    query_get_role_by_component_id,
+    query_get_role_by_role_id,
+    query_get_role_graphql_root_field_names,
+    query_get_role_mapping_rows,
+    query_get_role_mappings,
+    query_get_role_mappings_by_role_ids,
+    query_get_roles_by_groups,
+    query_get_roles_by_ids,
+    query_get_roles_by_user_and_groups,
+    query_get_user_role_mappings,
+    query_has_role,
+    query_list_roles,
+)
+
+
+class GraphqlOperations:
+    """Role mapping operations and result keys, built once for a table schema
+
+    Args:
+        schema_name: The table schema prefix, as returned by
+            GraphqlRoleRepository.get_schema_name
+    """
+
+    def __init__(self, schema_name: str):
+        self.schema_name = schema_name
+        self._chunked: dict[tuple[int, int], DocumentNode] = {}
+
+        # result keys
+        self.roles = f"{schema_name}roles"
+        self.role_graphql_root_field_names = (
+            f"{schema_name}role_graphql_root_field_names"
+        )
+        self.user_roles = f"{schema_name}user_roles"
+        self.group_roles = f"{schema_name}group_roles"
+        self.insert_roles_one = f"insert_{schema_name}roles_one"
+        self.insert_role_graphql_root_field_names = (
+            f"insert_{schema_name}role_graphql_root_field_names"
+        )
+        self.insert_user_roles = f"insert_{schema_name}user_roles"
+        self.insert_group_roles = f"insert_{schema_name}group_roles"
+        self.delete_user_roles = f"delete_{schema_name}user_roles"
+        self.delete_group_roles = f"delete_{schema_name}group_roles"
+
+        # documents
+        self.query_get_role_by_role_id = self._build(query_get_role_by_role_id)
+        self.query_get_role_by_component_id = self._build(
+            query_get_role_by_component_id
+        )
+        self.mutation_upsert_role = self._build(mutation_upsert_role)
+        self.mutation_replace_root_field_name_roles = self._build(
+            mutation_replace_root_field_name_roles
+        )
+        self.query_get_user_role_mappings = self._build(query_get_user_role_mappings)
+        self.mutation_update_user_roles = self._build(mutation_update_user_roles)
+        self.query_get_group_role_mappings = self._build(query_get_group_role_mappings)
+        self.mutation_update_group_roles = self._build(mutation_update_group_roles)
+        self.query_get_roles_by_user_and_groups = self._build(
+            query_get_roles_by_user_and_groups
+        )
+        self.query_get_roles_by_groups = self._build(query_get_roles_by_groups)
+        self.query_get_role_graphql_root_field_names = self._build(
+            query_get_role_graphql_root_field_names
+        )
+        self.query_get_authorization_data = self._build(query_get_authorization_data)
+        self.query_get_role_mappings = self._build(query_get_role_mappings)
+        self.query_get_graphql_root_field_names_by_role_id = self._build(
+            query_get_graphql_root_field_names_by_role_id
+        )
+        self.query_has_role = self._build(query_has_role)
+        self.query_get_role_mapping_rows = self._build(query_get_role_mapping_rows)
+        self.mutation_update_role_mappings = self._build(mutation_update_role_mappings)
+        self.mutation_replace_role_access = self._build(mutation_replace_role_access)
+        self.query_list_roles = self._build(query_list_roles)
+        self.query_get_roles_by_ids = self._build(query_get_roles_by_ids)
+        self.query_get_role_mappings_by_role_ids = self._build(
+            query_get_role_mappings_by_role_ids
+        )
+
+    def _build(self, template: str) -> DocumentNode:
+        return gql(template.replace("{{schema_name}}", self.schema_name))
+
+    def documents(self) -> list[DocumentNode]:
+        """Returns all the documents in the registry"""
+        return [v for v in vars(self).values() if isinstance(v, DocumentNode)]
+
+    def with_insert_chunks(self, document: DocumentNode, chunks: int) -> DocumentNode:
+        """Returns a mutation inserting its $objects in several chunks
+
+        The insert field of the mutation is repeated for each chunk after the
+        first, aliased as <insert field>_<n> and reading $objects_<n>, so that
+        all the chunks are sent in one mutation and written in one transaction.
+        The documents are built once per mutation and number of chunks.
+        """
+        key = (id(document), chunks)
+        chunked = self._chunked.get(key)
+        if chunked is None:
+            chunked = deepcopy(document)
+            operation = cast(OperationDefinitionNode, chunked.definitions[0])
+            objects = next(
+                d
+                for d in operation.variable_definitions
+                if d.variable.name.value == "objects"
+            )
+            insert = next(
+                cast(FieldNode, f)
+                for f in operation.selection_set.selections
+                if cast(FieldNode, f).name.value.startswith("insert_")
+            )
+            variable_definitions = list(operation.variable_definitions)
+            selections = list(operation.selection_set.selections)
+            for n in range(1, chunks):
+                variable = VariableNode(name=NameNode(value=f"objects_{n}"))
+                definition = deepcopy(objects)
+                definition.variable = variable
+                variable_definitions.append(definition)
+                field = deepcopy(insert)
+                field.alias = NameNode(value=f"{insert.name.value}_{n}")
+                for argument in field.arguments:
+                    if argument.name.value == "objects":
+                        argument.value = variable
+                selections.append(field)
+            operation.variable_definitions = tuple(variable_definitions)
+            operation.selection_set.selections = tuple(selections)
+            self._chunked[key] = chunked
+        return chunked
@@ -1,29 +1,42 @@
+import asyncio
 import logging
+from datetime import datetime, timezone
+from typing import Any, cast
 
+import aiohttp
 from gql import Client, gql
+from gql.client import AsyncClientSession
 from gql.transport.aiohttp import AIOHTTPTransport
+from graphql import (
+    DocumentNode,
+    GraphQLSchema,
+    IntrospectionQuery,
+    build_ast_schema,
+    build_client_schema,
+    get_introspection_query,
+    parse,
+    validate,
+)
 from pydantic import BaseSettings
 
 from src.models import (
+    AuthorizationData,
     GraphqlRootFieldNameRoleMappings,
     GroupRoleMappings,
+    GroupRoleMappingsResult,
+    GroupRolesRecord,
     Role,
     RoleGraphqlRootFieldName,
+    RoleMappingRecord,
+    RoleMappingRecordResult,
+    RoleMappings,
+    RoleRecord,
     UserRoleMappings,
+    UserRoleMappingsResult,
+    UserRolesRecord,
 )
-from src.repositories.queries_mutations import (
-    mutation_delete_group_role,
-    mutation_delete_root_field_name_role,
-    mutation_delete_user_role,
-    mutation_upsert_group_role,
-    mutation_upsert_role,
-    mutation_upsert_root_field_name_role,
-    mutation_upsert_user_role,
-    query_get_role_by_component_id,
-    query_get_role_by_role_id,
-    query_get_role_graphql_root_field_names,
-    query_get_roles_by_user_and_groups,
-)
+from src.repositories.graphql_operations import GraphqlOperations
+from src.repositories.role_mapping_snapshot import RoleMappingSnapshot
 from src.repositories.roles_repository import RoleRepository
 
 
@@ -32,6 +45,12 @@ class GraphqlConfig(BaseSettings):
     graphql_role: str
     graphql_admin_secret: str
     rolemapping_table_schema: str
+    graphql_pool_size: int = 100
+    graphql_pool_size_per_host: int = 0
+    graphql_keepalive_timeout: float = 15.0
+    graphql_validate_operations: bool = True
+    graphql_schema_path: str | None = None
+    graphql_mutation_chunk_size: int = 1000
 
 
 class RoleNotFoundException(Exception):
@@ -50,10 +69,81 @@ class RoleUpsertNotAllowedException(Exception):
         return self.message
 
 
+class GraphqlOperationValidationException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def _escape_like(value: str) -> str:
+    """Escapes the wildcards of a LIKE pattern"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class _RoleRows:
+    """Rows of a mapping table for some roles, as read and as replaced by the
+    records of a bulk upsert
+
+    Args:
+        column: The value column of the table
+        rows: The rows read, with their role_id and value column
+    """
+
+    def __init__(self, column: str, rows: list[dict[str, str]]):
+        self.column = column
+        self.read: dict[str, set[str]] = {}
+        for row in rows:
+            self.read.setdefault(row["role_id"], set()).add(row[column])
+        self.replaced: dict[str, set[str]] = {}
+
+    def replace(self, role_id: str, values: list[str]) -> tuple[list[str], int, int]:
+        """Replaces the values of a role
+
+        Returns:
+            The deduplicated values, the number of values added and removed
+        """
+        current = self.replaced.get(role_id, self.read.get(role_id, set()))
+        values = list(dict.fromkeys(values))
+        self.replaced[role_id] = set(values)
+        inserted = len(self.replaced[role_id].difference(current))
+        return values, inserted, len(current.difference(values))
+
+    def changed(self) -> bool:
+        """Returns whether the values of any role were replaced with others"""
+        return any(
+            values != self.read.get(role_id, set())
+            for role_id, values in self.replaced.items()
+        )
+
+    def inserted_objects(self, **columns: str) -> list[dict[str, str]]:
+        """Returns the rows to insert, with the additional columns"""
+        return [
+            {self.column: value, "role_id": role_id, **columns}
+            for role_id, values in self.replaced.items()
+            for value in sorted(values.difference(self.read.get(role_id, ())))
+        ]
+
+    def deleted_condition(self) -> dict[str, Any]:
+        """Returns the condition matching the rows to delete"""
+        conditions = [
+            {"role_id": {"_eq": role_id}, self.column: {"_in": sorted(deleted)}}
+            for role_id, values in self.replaced.items()
+            if (deleted := self.read.get(role_id, set()).difference(values))
+        ]
+        # an empty _or would not be a safe way to match nothing
+        return {"_or": conditions} if conditions else {"role_id": {"_in": []}}
+
+
 class GraphqlRoleRepository(RoleRepository):
     def __init__(self, config: GraphqlConfig):
         self.config = config
         self.logger = logging.getLogger(__name__)
+        self.operations = GraphqlOperations(self.get_schema_name())
+        self._client: Client | None = None
+        self._session: AsyncClientSession | None = None
+        self._session_lock = asyncio.Lock()
 
     def _get_transport(self) -> AIOHTTPTransport:
         return AIOHTTPTransport(
@@ -62,8 +152,68 @@ class GraphqlRoleRepository(RoleRepository):
                 "X-Hasura-Role": self.config.graphql_role,
                 "X-Hasura-Admin-Secret": self.config.graphql_admin_secret,
             },
+            client_session_args={
+                "connector": aiohttp.TCPConnector(
+                    limit=self.config.graphql_pool_size,
+                    limit_per_host=self.config.graphql_pool_size_per_host,
+                    keepalive_timeout=self.config.graphql_keepalive_timeout,
+                )
+            },
         )
 
+    async def _get_session(self) -> AsyncClientSession:
+        """Returns the session shared by all the repository methods,
+        connecting it on first use"""
+        if self._session is None:
+            async with self._session_lock:
+                if self._session is None:
+                    # the schema is never attached to the client, otherwise gql
+                    # would validate every single operation against it
+                    client = Client(transport=self._get_transport())
+                    session = await client.connect_async()
+                    try:
+                        if self.config.graphql_validate_operations:
+                            schema = await self._load_schema(session)
+                            self._validate_operations(schema)
+                    except Exception:
+                        await client.close_async()
+                        raise
+                    self._session = session
+                    self._client = client
+        return self._session
+
+    async def _load_schema(self, session: AsyncClientSession) -> GraphQLSchema:
+        """Loads the Hasura schema from the configured SDL file if present,
+        otherwise fetches it once through introspection"""
+        if self.config.graphql_schema_path:
+            with open(self.config.graphql_schema_path, "rt") as f:
+                return build_ast_schema(parse(f.read()))
+        result = await session.execute(gql(get_introspection_query()))
+        return build_client_schema(cast(IntrospectionQuery, result))
+
+    def _validate_operations(self, schema: GraphQLSchema) -> None:
+        """Validates all the repository operations against the Hasura schema
+
+        Raises:
+            GraphqlOperationValidationException: if an operation is not valid
+        """
+        for document in self.operations.documents():
+            errors = validate(schema, document)
+            if len(errors) > 0:
+                raise GraphqlOperationValidationException(
+                    f"Operation not valid for the Hasura schema: {errors[0].message}"
+                )
+
+    async def start(self) -> None:
+        await self._get_session()
+
+    async def close(self) -> None:
+        async with self._session_lock:
+            if self._client is not None:
+                await self._client.close_async()
+            self._client = None
+            self._session = None
+
     def get_schema_name(self) -> str:
         match self.config.rolemapping_table_schema:
             case "public":
@@ -72,246 +222,597 @@ class GraphqlRoleRepository(RoleRepository):
                 return f"{other}_"
 
     async def get_role_by_role_id(self, role_id: str) -> Role:
-        async with Client(
-            transport=self._get_transport(),
-            fetch_schema_from_transport=True,
-        ) as session:
-            query = gql(
-                query_get_role_by_role_id.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
-            )
-            params = {"role_id": role_id}
-            result = await session.execute(query, variable_values=params)
-            if len(result[f"{self.get_schema_name()}roles"]) > 0:
-                return Role.parse_obj(result[f"{self.get_schema_name()}roles"][0])
-            raise RoleNotFoundException(f"Role not found for role_id {role_id}")
+        session = await self._get_session()
+        params = {"role_id": role_id}
+        result = await session.execute(
+            self.operations.query_get_role_by_role_id, variable_values=params
+        )
+        if len(result[self.operations.roles]) > 0:
+            return Role.parse_obj(result[self.operations.roles][0])
+        raise RoleNotFoundException(f"Role not found for role_id {role_id}")
 
     async def get_role_by_component_id(self, component_id: str) -> Role:
-        async with Client(
-            transport=self._get_transport(),
-            fetch_schema_from_transport=True,
-        ) as session:
-            query = gql(
-                query_get_role_by_component_id.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
-            )
-            params = {"component_id": component_id}
-            result = await session.execute(query, variable_values=params)
-            if len(result[f"{self.get_schema_name()}roles"]) > 0:
-                return Role.parse_obj(result[f"{self.get_schema_name()}roles"][0])
-            raise RoleNotFoundException(
-                f"Role not found for component_id {component_id}"
-            )
+        session = await self._get_session()
+        params = {"component_id": component_id}
+        result = await session.execute(
+            self.operations.query_get_role_by_component_id, variable_values=params
+        )
+        if len(result[self.operations.roles]) > 0:
+            return Role.parse_obj(result[self.operations.roles][0])
+        raise RoleNotFoundException(f"Role not found for component_id {component_id}")
 
     async def upsert_role(
         self, role: GraphqlRootFieldNameRoleMappings
     ) -> GraphqlRootFieldNameRoleMappings:
-        async with Client(
-            transport=self._get_transport(),
-            fetch_schema_from_transport=True,
-        ) as session:
-            # upsert on table roles
-            gql_mutation_upsert_role = gql(
-                mutation_upsert_role.replace("{{schema_name}}", self.get_schema_name())
-            )
-            params = {
-                "component_id": role.component_id,
-                "role_id": role.role_id,
-            }
-            result = await session.execute(
-                gql_mutation_upsert_role, variable_values=params
+        session = await self._get_session()
+        # upsert on table roles
+        params = {
+            "component_id": role.component_id,
+            "role_id": role.role_id,
+        }
+        result = await session.execute(
+            self.operations.mutation_upsert_role, variable_values=params
+        )
+        if result[self.operations.insert_roles_one] is None:
+            raise RoleUpsertNotAllowedException(
+                f"Cannot upsert role with role_id {role.role_id}"
             )
-            if result[f"insert_{self.get_schema_name()}roles_one"] is None:
-                raise RoleUpsertNotAllowedException(
-                    f"Cannot upsert role with role_id {role.role_id}"
-                )
 
-            # upsert on table role_graphql_root_field_names
-            root_field_names: list[str] = []
-            gql_mutation_upsert_root_field_name_role = gql(
-                mutation_upsert_root_field_name_role.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
-            )
-            for root_field_name in role.graphql_root_field_names:
-                upsert_params = {
-                    "graphql_root_field_name": root_field_name,
-                    "role_id": role.role_id,
-                }
-                upsert_result = await session.execute(
-                    gql_mutation_upsert_root_field_name_role,
-                    variable_values=upsert_params,
-                )
-                root_field_names.append(
-                    upsert_result[
-                        f"insert_{self.get_schema_name()}role_graphql_root_field_names"
-                    ]["returning"][0]["graphql_root_field_name"]
-                )
+        # replace the rows of table role_graphql_root_field_names
+        returning = await self._replace_role_rows(
+            session,
+            self.operations.mutation_replace_root_field_name_roles,
+            self.operations.insert_role_graphql_root_field_names,
+            "graphql_root_field_names",
+            "graphql_root_field_name",
+            role.role_id,
+            role.graphql_root_field_names,
+        )
 
-            # delete from table role_graphql_root_field_names
-            gql_mutation_delete_root_field_name_role = gql(
-                mutation_delete_root_field_name_role.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
-            )
-            delete_params = {
-                "graphql_root_field_names": role.graphql_root_field_names,
-                "role_id": role.role_id,
-            }
+        return GraphqlRootFieldNameRoleMappings(
+            role_id=result[self.operations.insert_roles_one]["role_id"],
+            component_id=result[self.operations.insert_roles_one]["component_id"],
+            graphql_root_field_names=returning,
+        )
+
+    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappingsResult:
+        session = await self._get_session()
+        users, inserted, deleted = await self._update_role_rows(
+            session,
+            self.operations.query_get_user_role_mappings,
+            self.operations.mutation_update_user_roles,
+            self.operations.user_roles,
+            self.operations.delete_user_roles,
+            self.operations.insert_user_roles,
+            "users",
+            "user",
+            role.role_id,
+            role.users,
+        )
+        return UserRoleMappingsResult(
+            role_id=role.role_id,
+            users=users,
+            inserted=inserted,
+            deleted=deleted,
+            unchanged=len(users) - inserted,
+        )
+
+    async def upsert_group_roles(
+        self, role: GroupRoleMappings
+    ) -> GroupRoleMappingsResult:
+        session = await self._get_session()
+        groups, inserted, deleted = await self._update_role_rows(
+            session,
+            self.operations.query_get_group_role_mappings,
+            self.operations.mutation_update_group_roles,
+            self.operations.group_roles,
+            self.operations.delete_group_roles,
+            self.operations.insert_group_roles,
+            "groups",
+            "group",
+            role.role_id,
+            role.groups,
+        )
+        return GroupRoleMappingsResult(
+            role_id=role.role_id,
+            groups=groups,
+            inserted=inserted,
+            deleted=deleted,
+            unchanged=len(groups) - inserted,
+        )
+
+    async def _update_role_rows(
+        self,
+        session: AsyncClientSession,
+        read_query: DocumentNode,
+        update_mutation: DocumentNode,
+        result_key: str,
+        delete_key: str,
+        insert_key: str,
+        values_variable: str,
+        column: str,
+        role_id: str,
+        values: list[str],
+    ) -> tuple[list[str], int, int]:
+        """Makes the rows of a role in a mapping table match the values,
+        writing only if some rows differ
+
+        The role and its current rows are read in one query. If they differ
+        from the values, the rows of the values not listed are deleted and
+        the rows of all the values are inserted, skipping the existing ones,
+        in bulk inserts of at most graphql_mutation_chunk_size objects. The
+        delete and all the chunks are sent in one mutation, so they run in a
+        single transaction. Since the mutation doesn't depend on the rows
+        read, the rows match the values after it even if another update of
+        the role ran in between: concurrent updates of a role leave the rows
+        of the last one to commit. Nothing is written if the rows already
+        match.
+
+        Returns:
+            The deduplicated values, the number of inserted and deleted rows
+
+        Raises:
+            RoleNotFoundException: if the role doesn't exist
+        """
+        result = await session.execute(read_query, variable_values={"role_id": role_id})
+        if len(result[self.operations.roles]) == 0:
+            raise RoleNotFoundException(f"Role not found for role_id {role_id}")
+        current = {r[column] for r in result[result_key]}
+        values = list(dict.fromkeys(values))
+        if current == set(values):
+            return values, 0, 0
+
+        last_update = datetime.now(timezone.utc).isoformat()
+        objects = [
+            {column: value, "role_id": role_id, "last_update": last_update}
+            for value in values
+        ]
+        document, params = self._chunk_objects(update_mutation, objects)
+        chunks = len(params)
+        params.update({values_variable: values, "role_id": role_id})
+        result = await session.execute(document, variable_values=params)
+        inserted = sum(
+            result[f"{insert_key}_{n}" if n else insert_key]["affected_rows"]
+            for n in range(chunks)
+        )
+        return values, inserted, result[delete_key]["affected_rows"]
+
+    async def _replace_role_rows(
+        self,
+        session: AsyncClientSession,
+        replace_mutation: DocumentNode,
+        insert_key: str,
+        values_variable: str,
+        column: str,
+        role_id: str,
+        values: list[str],
+    ) -> list[str]:
+        """Replaces the rows of a role in a mapping table with one row per value
+
+        The rows of the other values are deleted and the rows of the values
+        are upserted with bulk inserts of at most graphql_mutation_chunk_size
+        objects. The delete and all the chunks are sent in one mutation, so
+        they run in a single transaction.
+
+        Returns:
+            The values of the upserted rows
+        """
+        objects = [
+            {column: value, "role_id": role_id} for value in dict.fromkeys(values)
+        ]
+        document, params = self._chunk_objects(replace_mutation, objects)
+        chunks = len(params)
+        params.update({values_variable: values, "role_id": role_id})
+        result = await session.execute(document, variable_values=params)
+        return [
+            r[column]
+            for n in range(chunks)
+            for r in result[f"{insert_key}_{n}" if n else insert_key]["returning"]
+        ]
+
+    def _chunk_objects(
+        self, mutation: DocumentNode, objects: list[dict[str, str]]
+    ) -> tuple[DocumentNode, dict[str, Any]]:
+        """Splits the objects of a mutation in chunks of at most
+        graphql_mutation_chunk_size objects
+
+        Returns:
+            The mutation inserting all the chunks, and the variables holding
+            them, $objects for the first chunk and $objects_<n> for the others
+        """
+        chunk_size = max(1, self.config.graphql_mutation_chunk_size)
+        chunks = [
+            objects[start : start + chunk_size]
+            for start in range(0, max(1, len(objects)), chunk_size)
+        ]
+        params = {
+            f"objects_{n}" if n else "objects": chunk for n, chunk in enumerate(chunks)
+        }
+        if len(chunks) == 1:
+            return mutation, params
+        return self.operations.with_insert_chunks(mutation, len(chunks)), params
+
+    async def upsert_role_mappings(
+        self, records: list[RoleMappingRecord]
+    ) -> list[RoleMappingRecordResult]:
+        """Applies the records with one read and at most one mutation
+
+        The roles, and the current rows of the mapping tables the records
+        replace, are read in one query; the records are then validated and
+        diffed in order against them, and all the changes are written by a
+        single mutation, so in a single transaction. Nothing is written if
+        nothing changes.
+        """
+        session = await self._get_session()
+        results, params = await self._diff_role_mappings(session, records)
+        if params is not None:
             await session.execute(
-                gql_mutation_delete_root_field_name_role, variable_values=delete_params
+                self.operations.mutation_update_role_mappings, variable_values=params
             )
+        return results
 
-            return GraphqlRootFieldNameRoleMappings(
-                role_id=result[f"insert_{self.get_schema_name()}roles_one"]["role_id"],
-                component_id=result[f"insert_{self.get_schema_name()}roles_one"][
-                    "component_id"
-                ],
-                graphql_root_field_names=root_field_names,
-            )
+    async def upsert_role_access(self, mappings: RoleMappings) -> RoleMappings:
+        """Upserts a role and replaces its root field names, users and groups
 
-    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappings:
-        # ensuring role exists
-        await self.get_role_by_role_id(role.role_id)
-
-        async with Client(
-            transport=self._get_transport(),
-            fetch_schema_from_transport=True,
-        ) as session:
-            upsert_mutation = gql(
-                mutation_upsert_user_role.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
-            )
-            users: list[str] = []
-            for user in role.users:
-                upsert_params = {
-                    "user": user,
-                    "role_id": role.role_id,
-                }
-                result = await session.execute(
-                    upsert_mutation, variable_values=upsert_params
-                )
-                users.append(
-                    result[f"insert_{self.get_schema_name()}user_roles"]["returning"][
-                        0
-                    ]["user"]
-                )
+        The role and its rows are read and diffed as in upsert_role_mappings,
+        and nothing is written if the role cannot be upserted or if nothing
+        changes. Otherwise a single mutation deletes the rows not listed and
+        upserts the listed ones, returning the rows of the role after the
+        write, in the same transaction.
 
-            delete_mutation = gql(
-                mutation_delete_user_role.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
-            )
-            delete_params = {
-                "users": role.users,
-                "role_id": role.role_id,
+        Returns:
+            The role with its root field names, users and groups after the
+            write, sorted
+        """
+        session = await self._get_session()
+        records: list[RoleMappingRecord] = [
+            RoleRecord(
+                type="role",
+                role_id=mappings.role_id,
+                component_id=mappings.component_id,
+                graphql_root_field_names=mappings.graphql_root_field_names,
+            ),
+            UserRolesRecord(
+                type="user_roles", role_id=mappings.role_id, users=mappings.users
+            ),
+            GroupRolesRecord(
+                type="group_roles", role_id=mappings.role_id, groups=mappings.groups
+            ),
+        ]
+        results, diff = await self._diff_role_mappings(session, records)
+        if results[0].errors:
+            raise RoleUpsertNotAllowedException(results[0].errors[0])
+        graphql_root_field_names = list(
+            dict.fromkeys(mappings.graphql_root_field_names)
+        )
+        users = list(dict.fromkeys(mappings.users))
+        groups = list(dict.fromkeys(mappings.groups))
+        if diff is not None:
+            role_id = mappings.role_id
+            last_update = datetime.now(timezone.utc).isoformat()
+            params = {
+                "roles": diff["roles"],
+                "role_id": role_id,
+                "root_field_name_objects": [
+                    {"graphql_root_field_name": name, "role_id": role_id}
+                    for name in graphql_root_field_names
+                ],
+                "graphql_root_field_names": graphql_root_field_names,
+                "user_objects": [
+                    {"user": user, "role_id": role_id, "last_update": last_update}
+                    for user in users
+                ],
+                "users": users,
+                "group_objects": [
+                    {"group": group, "role_id": role_id, "last_update": last_update}
+                    for group in groups
+                ],
+                "groups": groups,
             }
-            await session.execute(delete_mutation, variable_values=delete_params)
+            result = await session.execute(
+                self.operations.mutation_replace_role_access, variable_values=params
+            )
+            graphql_root_field_names = [
+                r["graphql_root_field_name"]
+                for r in result[self.operations.insert_role_graphql_root_field_names][
+                    "returning"
+                ]
+            ]
+            users = [
+                r["user"]
+                for r in result[self.operations.insert_user_roles]["returning"]
+            ]
+            groups = [
+                r["group"]
+                for r in result[self.operations.insert_group_roles]["returning"]
+            ]
+        # otherwise the rows read already match the mappings
+        return RoleMappings(
+            role_id=mappings.role_id,
+            component_id=mappings.component_id,
+            graphql_root_field_names=sorted(graphql_root_field_names),
+            users=sorted(users),
+            groups=sorted(groups),
+        )
 
-            return UserRoleMappings(role_id=role.role_id, users=users)
+    async def _diff_role_mappings(
+        self, session: AsyncClientSession, records: list[RoleMappingRecord]
+    ) -> tuple[list[RoleMappingRecordResult], dict[str, Any] | None]:
+        """Reads the rows the records replace and diffs the records against
+        them
 
-    async def upsert_group_roles(self, role: GroupRoleMappings) -> GroupRoleMappings:
-        # ensuring role exists
-        await self.get_role_by_role_id(role.role_id)
+        Returns:
+            The result of each record, and the variables of the mutation
+            writing the changes, None if nothing changes
+        """
+        role_records = [r for r in records if isinstance(r, RoleRecord)]
+        params: dict[str, Any] = {
+            "role_ids": list(dict.fromkeys(r.role_id for r in records)),
+            "component_ids": [r.component_id for r in role_records],
+            "root_field_name_role_ids": [r.role_id for r in role_records],
+            "user_role_ids": [
+                r.role_id for r in records if isinstance(r, UserRolesRecord)
+            ],
+            "group_role_ids": [
+                r.role_id for r in records if isinstance(r, GroupRolesRecord)
+            ],
+        }
+        result = await session.execute(
+            self.operations.query_get_role_mapping_rows, variable_values=params
+        )
+        components = {
+            r["role_id"]: r["component_id"] for r in result[self.operations.roles]
+        }
+        owners = {component_id: role_id for role_id, component_id in components.items()}
+        root_field_names = _RoleRows(
+            "graphql_root_field_name",
+            result[self.operations.role_graphql_root_field_names],
+        )
+        users = _RoleRows("user", result[self.operations.user_roles])
+        groups = _RoleRows("group", result[self.operations.group_roles])
 
-        async with Client(
-            transport=self._get_transport(),
-            fetch_schema_from_transport=True,
-        ) as session:
-            upsert_mutation = gql(
-                mutation_upsert_group_role.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
-            )
-            groups: list[str] = []
-            for group in role.groups:
-                upsert_params = {
-                    "group": group,
-                    "role_id": role.role_id,
-                }
-                result = await session.execute(
-                    upsert_mutation, variable_values=upsert_params
-                )
-                groups.append(
-                    result[f"insert_{self.get_schema_name()}group_roles"]["returning"][
-                        0
-                    ]["group"]
+        new_roles: list[dict[str, str]] = []
+        results: list[RoleMappingRecordResult] = []
+        for record in records:
+            if isinstance(record, RoleRecord):
+                # neither the role_id nor the component_id may belong to
+                # another role
+                component_id = components.get(record.role_id, record.component_id)
+                role_id = owners.get(record.component_id, record.role_id)
+                if component_id != record.component_id or role_id != record.role_id:
+                    results.append(
+                        RoleMappingRecordResult(
+                            type=record.type,
+                            role_id=record.role_id,
+                            status=400,
+                            errors=[
+                                f"Cannot upsert role with role_id {record.role_id}"
+                            ],
+                        )
+                    )
+                    continue
+                if record.role_id not in components:
+                    components[record.role_id] = record.component_id
+                    owners[record.component_id] = record.role_id
+                    new_roles.append(
+                        {"role_id": record.role_id, "component_id": record.component_id}
+                    )
+                rows, values = root_field_names, record.graphql_root_field_names
+            elif record.role_id not in components:
+                results.append(
+                    RoleMappingRecordResult(
+                        type=record.type,
+                        role_id=record.role_id,
+                        status=400,
+                        errors=[f"Role not found for role_id {record.role_id}"],
+                    )
                 )
-
-            delete_mutation = gql(
-                mutation_delete_group_role.replace(
-                    "{{schema_name}}", self.get_schema_name()
+                continue
+            elif isinstance(record, UserRolesRecord):
+                rows, values = users, record.users
+            else:
+                rows, values = groups, record.groups
+            values, inserted, deleted = rows.replace(record.role_id, values)
+            results.append(
+                RoleMappingRecordResult(
+                    type=record.type,
+                    role_id=record.role_id,
+                    status=200,
+                    inserted=inserted,
+                    deleted=deleted,
+                    unchanged=len(values) - inserted,
                 )
             )
-            delete_params = {
-                "groups": role.groups,
-                "role_id": role.role_id,
-            }
-            await session.execute(delete_mutation, variable_values=delete_params)
 
-            return GroupRoleMappings(role_id=role.role_id, groups=groups)
+        if not new_roles and not any(
+            rows.changed() for rows in (root_field_names, users, groups)
+        ):
+            return results, None
+        last_update = datetime.now(timezone.utc).isoformat()
+        return results, {
+            "roles": new_roles,
+            "root_field_names": root_field_names.inserted_objects(),
+            "deleted_root_field_names": root_field_names.deleted_condition(),
+            "users": users.inserted_objects(last_update=last_update),
+            "deleted_users": users.deleted_condition(),
+            "groups": groups.inserted_objects(last_update=last_update),
+            "deleted_groups": groups.deleted_condition(),
+        }
 
     async def get_roles_by_user_and_groups(
         self, user: str, groups: list[str]
     ) -> list[str]:
-        async with Client(
-            transport=self._get_transport(),
-            fetch_schema_from_transport=True,
-        ) as session:
-            query = gql(
-                query_get_roles_by_user_and_groups.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
-            )
-            params = {"user": user, "groups": groups}
-            result = await session.execute(query, variable_values=params)
-            roles: list[str] = []
-            if len(result[f"{self.get_schema_name()}user_roles"]) > 0:
-                roles.extend(
-                    [
-                        r["role_id"]
-                        for r in result[f"{self.get_schema_name()}user_roles"]
-                    ]
-                )
-            if len(result[f"{self.get_schema_name()}group_roles"]) > 0:
-                roles.extend(
-                    [
-                        r["role_id"]
-                        for r in result[f"{self.get_schema_name()}group_roles"]
-                    ]
-                )
-            return list(dict.fromkeys(roles))
+        session = await self._get_session()
+        params = {"user": user, "groups": groups}
+        result = await session.execute(
+            self.operations.query_get_roles_by_user_and_groups, variable_values=params
+        )
+        roles: list[str] = []
+        if len(result[self.operations.user_roles]) > 0:
+            roles.extend([r["role_id"] for r in result[self.operations.user_roles]])
+        if len(result[self.operations.group_roles]) > 0:
+            roles.extend([r["role_id"] for r in result[self.operations.group_roles]])
+        return list(dict.fromkeys(roles))
+
+    async def get_roles_by_groups(self, groups: list[str]) -> list[str]:
+        session = await self._get_session()
+        result = await session.execute(
+            self.operations.query_get_roles_by_groups,
+            variable_values={"groups": groups},
+        )
+        return [r["role_id"] for r in result[self.operations.group_roles]]
 
     async def get_role_graphql_root_field_names(
         self, graphql_root_field_names: list[str]
     ) -> list[RoleGraphqlRootFieldName]:
-        async with Client(
-            transport=self._get_transport(),
-            fetch_schema_from_transport=True,
-        ) as session:
-            query = gql(
-                query_get_role_graphql_root_field_names.replace(
-                    "{{schema_name}}", self.get_schema_name()
-                )
+        session = await self._get_session()
+        params = {
+            "graphql_root_field_names": graphql_root_field_names,
+        }
+        result = await session.execute(
+            self.operations.query_get_role_graphql_root_field_names,
+            variable_values=params,
+        )
+        roles: list[RoleGraphqlRootFieldName] = []
+        if len(result[self.operations.role_graphql_root_field_names]) > 0:
+            roles.extend(
+                [
+                    RoleGraphqlRootFieldName.parse_obj(r)
+                    for r in result[self.operations.role_graphql_root_field_names]
+                ]
             )
-            params = {
-                "graphql_root_field_names": graphql_root_field_names,
-            }
-            result = await session.execute(query, variable_values=params)
-            roles: list[RoleGraphqlRootFieldName] = []
-            if (
-                len(result[f"{self.get_schema_name()}role_graphql_root_field_names"])
-                > 0
-            ):
-                roles.extend(
-                    [
-                        RoleGraphqlRootFieldName.parse_obj(r)
-                        for r in result[
-                            f"{self.get_schema_name()}role_graphql_root_field_names"
-                        ]
-                    ]
+        return roles
+
+    async def get_authorization_data(
+        self, user: str, groups: list[str], graphql_root_field_names: list[str]
+    ) -> AuthorizationData:
+        session = await self._get_session()
+        params = {
+            "user": user,
+            "groups": groups,
+            "graphql_root_field_names": graphql_root_field_names,
+        }
+        result = await session.execute(
+            self.operations.query_get_authorization_data, variable_values=params
+        )
+        roles = [r["role_id"] for r in result[self.operations.user_roles]]
+        roles.extend([r["role_id"] for r in result[self.operations.group_roles]])
+        return AuthorizationData(
+            roles=list(dict.fromkeys(roles)),
+            role_graphql_root_field_names=[
+                RoleGraphqlRootFieldName.parse_obj(r)
+                for r in result[self.operations.role_graphql_root_field_names]
+            ],
+        )
+
+    async def get_graphql_root_field_names_by_role_id(self, role_id: str) -> list[str]:
+        session = await self._get_session()
+        result = await session.execute(
+            self.operations.query_get_graphql_root_field_names_by_role_id,
+            variable_values={"role_id": role_id},
+        )
+        return [
+            r["graphql_root_field_name"]
+            for r in result[self.operations.role_graphql_root_field_names]
+        ]
+
+    async def has_role(self, role_id: str, user: str, groups: list[str]) -> bool:
+        session = await self._get_session()
+        params = {"role_id": role_id, "user": user, "groups": groups}
+        result = await session.execute(
+            self.operations.query_has_role, variable_values=params
+        )
+        return (
+            len(result[self.operations.user_roles]) > 0
+            or len(result[self.operations.group_roles]) > 0
+        )
+
+    async def list_roles(
+        self,
+        after: str | None,
+        limit: int,
+        component_id_prefix: str | None = None,
+        graphql_root_field_name: str | None = None,
+    ) -> list[Role]:
+        session = await self._get_session()
+        role_id_condition: dict[str, Any] = {}
+        if after is not None:
+            role_id_condition["_gt"] = after
+        if graphql_root_field_name is not None:
+            # few roles grant a root field, they are matched by role_id
+            result = await session.execute(
+                self.operations.query_get_role_graphql_root_field_names,
+                variable_values={"graphql_root_field_names": [graphql_root_field_name]},
+            )
+            role_id_condition["_in"] = [
+                r["role_id"]
+                for r in result[self.operations.role_graphql_root_field_names]
+            ]
+        where: dict[str, Any] = {}
+        if role_id_condition:
+            where["role_id"] = role_id_condition
+        if component_id_prefix is not None:
+            where["component_id"] = {"_like": _escape_like(component_id_prefix) + "%"}
+        result = await session.execute(
+            self.operations.query_list_roles,
+            variable_values={"where": where, "limit": limit},
+        )
+        return [Role.parse_obj(r) for r in result[self.operations.roles]]
+
+    async def get_roles(
+        self, role_ids: list[str], component_ids: list[str]
+    ) -> list[Role]:
+        if not role_ids and not component_ids:
+            return []
+        session = await self._get_session()
+        result = await session.execute(
+            self.operations.query_get_roles_by_ids,
+            variable_values={"role_ids": role_ids, "component_ids": component_ids},
+        )
+        return [Role.parse_obj(r) for r in result[self.operations.roles]]
+
+    async def get_role_mappings(self, role_ids: list[str]) -> list[RoleMappings]:
+        session = await self._get_session()
+        result = await session.execute(
+            self.operations.query_get_role_mappings_by_role_ids,
+            variable_values={"role_ids": role_ids},
+        )
+        mappings = {
+            r["role_id"]: RoleMappings(
+                role_id=r["role_id"],
+                component_id=r["component_id"],
+                graphql_root_field_names=[],
+                users=[],
+                groups=[],
+            )
+            for r in result[self.operations.roles]
+        }
+        for r in result[self.operations.role_graphql_root_field_names]:
+            if r["role_id"] in mappings:
+                mappings[r["role_id"]].graphql_root_field_names.append(
+                    r["graphql_root_field_name"]
                 )
-            return roles
+        for r in result[self.operations.user_roles]:
+            if r["role_id"] in mappings:
+                mappings[r["role_id"]].users.append(r["user"])
+        for r in result[self.operations.group_roles]:
+            if r["role_id"] in mappings:
+                mappings[r["role_id"]].groups.append(r["group"])
+        return list(mappings.values())
+
+    async def get_role_mapping_snapshot(self) -> RoleMappingSnapshot:
+        """Loads the whole content of the role mapping tables
+
+        Returns:
+            The in-memory indexes of the role mapping tables
+        """
+        session = await self._get_session()
+        result = await session.execute(self.operations.query_get_role_mappings)
+        return RoleMappingSnapshot.from_rows(
+            roles=result[self.operations.roles],
+            role_graphql_root_field_names=result[
+                self.operations.role_graphql_root_field_names
+            ],
+            user_roles=result[self.operations.user_roles],
+            group_roles=result[self.operations.group_roles],
+        )
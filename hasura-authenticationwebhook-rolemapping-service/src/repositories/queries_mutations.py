@@ -27,9 +27,12 @@ mutation_upsert_role = """
                 }
             """
 
-mutation_upsert_root_field_name_role = """
-                mutation UpdateRootFieldNameRole($graphql_root_field_name: String = "", $role_id: String = "") {
-                  insert_{{schema_name}}role_graphql_root_field_names(objects: {graphql_root_field_name: $graphql_root_field_name, role_id: $role_id}, on_conflict: {constraint: role_graphql_root_field_names_pkey, update_columns: [graphql_root_field_name], where: {graphql_root_field_name: {_eq: $graphql_root_field_name}}}) {
+mutation_replace_root_field_name_roles = """
+                mutation ReplaceRootFieldNameRoles($objects: [{{schema_name}}role_graphql_root_field_names_insert_input!]!, $graphql_root_field_names: [String!], $role_id: String!) {
+                  delete_{{schema_name}}role_graphql_root_field_names(where: {role_id: {_eq: $role_id}, _and: {graphql_root_field_name: {_nin: $graphql_root_field_names}}}) {
+                    affected_rows
+                  }
+                  insert_{{schema_name}}role_graphql_root_field_names(objects: $objects, on_conflict: {constraint: role_graphql_root_field_names_pkey, update_columns: [graphql_root_field_name]}) {
                     returning {
                       graphql_root_field_name
                     }
@@ -37,47 +40,49 @@ mutation_upsert_root_field_name_role = """
                 }
             """
 
-mutation_delete_root_field_name_role = """
-                mutation DeleteRootFieldNameRole($graphql_root_field_names: [String!], $role_id: String!) {
-                  delete_{{schema_name}}role_graphql_root_field_names(where: {role_id: {_eq: $role_id}, _and: {graphql_root_field_name: {_nin: $graphql_root_field_names}}}) {
-                    affected_rows
+query_get_user_role_mappings = """
+                query GetUserRoleMappings($role_id: String!) {
+                  {{schema_name}}roles(where: {role_id: {_eq: $role_id}}) {
+                      component_id
+                      role_id
                   }
-                }
-            """
-
-mutation_upsert_user_role = """
-                mutation UpdateUserRole($user: String = "", $role_id: String = "", $last_update: timestamptz = now) {
-                  insert_{{schema_name}}user_roles(objects: {last_update: $last_update, role_id: $role_id, user: $user}, on_conflict: {constraint: user_roles_pkey, update_columns: last_update, where: {}}) {
-                    returning {
-                      user
-                    }
+                  {{schema_name}}user_roles(where: {role_id: {_eq: $role_id}}) {
+                    user
                   }
                 }
             """
 
-mutation_delete_user_role = """
-                mutation DeleteUserRole($users: [String!], $role_id: String!) {
+mutation_update_user_roles = """
+                mutation UpdateUserRoles($objects: [{{schema_name}}user_roles_insert_input!]!, $users: [String!], $role_id: String!) {
                   delete_{{schema_name}}user_roles(where: {role_id: {_eq: $role_id}, _and: {user: {_nin: $users}}}) {
                     affected_rows
                   }
+                  insert_{{schema_name}}user_roles(objects: $objects, on_conflict: {constraint: user_roles_pkey, update_columns: []}) {
+                    affected_rows
+                  }
                 }
             """
 
-mutation_upsert_group_role = """
-                mutation UpdateGroupRole($group: String = "", $role_id: String = "", $last_update: timestamptz = now) {
-                  insert_{{schema_name}}group_roles(objects: {last_update: $last_update, role_id: $role_id, group: $group}, on_conflict: {constraint: group_roles_pkey, update_columns: last_update, where: {}}) {
-                    returning {
-                      group
-                    }
+query_get_group_role_mappings = """
+                query GetGroupRoleMappings($role_id: String!) {
+                  {{schema_name}}roles(where: {role_id: {_eq: $role_id}}) {
+                      component_id
+                      role_id
+                  }
+                  {{schema_name}}group_roles(where: {role_id: {_eq: $role_id}}) {
+                    group
                   }
                 }
             """
 
-mutation_delete_group_role = """
-                mutation DeleteGroupRole($groups: [String!], $role_id: String!) {
+mutation_update_group_roles = """
+                mutation UpdateGroupRoles($objects: [{{schema_name}}group_roles_insert_input!]!, $groups: [String!], $role_id: String!) {
                   delete_{{schema_name}}group_roles(where: {role_id: {_eq: $role_id}, _and: {group: {_nin: $groups}}}) {
                     affected_rows
                   }
+                  insert_{{schema_name}}group_roles(objects: $objects, on_conflict: {constraint: group_roles_pkey, update_columns: []}) {
+                    affected_rows
+                  }
                 }
             """
 
@@ -92,6 +97,50 @@ query_get_roles_by_user_and_groups = """
                 }
             """
 
+query_get_roles_by_groups = """
+                query GetRolesByGroups($groups: [String!]) {
+                  {{schema_name}}group_roles(where: {group: {_in: $groups}}, distinct_on: role_id) {
+                    role_id
+                  }
+                }
+            """
+
+query_get_authorization_data = """
+                query GetAuthorizationData($user: String!, $groups: [String!], $graphql_root_field_names: [String!]) {
+                  {{schema_name}}user_roles(where: {user: {_eq: $user}}, distinct_on: role_id) {
+                    role_id
+                  }
+                  {{schema_name}}group_roles(where: {group: {_in: $groups}}, distinct_on: role_id) {
+                    role_id
+                  }
+                  {{schema_name}}role_graphql_root_field_names(where: {graphql_root_field_name: {_in: $graphql_root_field_names}}) {
+                    graphql_root_field_name
+                    role_id
+                  }
+                }
+            """
+
+query_get_role_mappings = """
+                query GetRoleMappings {
+                  {{schema_name}}roles {
+                    component_id
+                    role_id
+                  }
+                  {{schema_name}}role_graphql_root_field_names {
+                    graphql_root_field_name
+                    role_id
+                  }
+                  {{schema_name}}user_roles {
+                    user
+                    role_id
+                  }
+                  {{schema_name}}group_roles {
+                    group
+                    role_id
+                  }
+                }
+            """
+
 query_get_role_graphql_root_field_names = """
                 query GetRoleGraphqlRootFieldNames($graphql_root_field_names: [String!]) {
                   {{schema_name}}role_graphql_root_field_names(where: {graphql_root_field_name: {_in: $graphql_root_field_names}}) {
@@ -100,3 +149,140 @@ query_get_role_graphql_root_field_names = """
                   }
                 }
             """
+
+query_get_graphql_root_field_names_by_role_id = """
+                query GetGraphqlRootFieldNamesByRoleId($role_id: String!) {
+                  {{schema_name}}role_graphql_root_field_names(where: {role_id: {_eq: $role_id}}) {
+                    graphql_root_field_name
+                  }
+                }
+            """
+
+query_has_role = """
+                query HasRole($role_id: String!, $user: String!, $groups: [String!]) {
+                  {{schema_name}}user_roles(where: {role_id: {_eq: $role_id}, user: {_eq: $user}}, limit: 1) {
+                    role_id
+                  }
+                  {{schema_name}}group_roles(where: {role_id: {_eq: $role_id}, group: {_in: $groups}}, limit: 1) {
+                    role_id
+                  }
+                }
+            """
+
+query_get_role_mapping_rows = """
+                query GetRoleMappingRows($role_ids: [String!], $component_ids: [String!], $root_field_name_role_ids: [String!], $user_role_ids: [String!], $group_role_ids: [String!]) {
+                  {{schema_name}}roles(where: {_or: [{role_id: {_in: $role_ids}}, {component_id: {_in: $component_ids}}]}) {
+                    component_id
+                    role_id
+                  }
+                  {{schema_name}}role_graphql_root_field_names(where: {role_id: {_in: $root_field_name_role_ids}}) {
+                    graphql_root_field_name
+                    role_id
+                  }
+                  {{schema_name}}user_roles(where: {role_id: {_in: $user_role_ids}}) {
+                    user
+                    role_id
+                  }
+                  {{schema_name}}group_roles(where: {role_id: {_in: $group_role_ids}}) {
+                    group
+                    role_id
+                  }
+                }
+            """
+
+mutation_update_role_mappings = """
+                mutation UpdateRoleMappings($roles: [{{schema_name}}roles_insert_input!]!, $root_field_names: [{{schema_name}}role_graphql_root_field_names_insert_input!]!, $deleted_root_field_names: {{schema_name}}role_graphql_root_field_names_bool_exp!, $users: [{{schema_name}}user_roles_insert_input!]!, $deleted_users: {{schema_name}}user_roles_bool_exp!, $groups: [{{schema_name}}group_roles_insert_input!]!, $deleted_groups: {{schema_name}}group_roles_bool_exp!) {
+                  insert_{{schema_name}}roles(objects: $roles, on_conflict: {constraint: roles_pkey, update_columns: []}) {
+                    affected_rows
+                  }
+                  delete_{{schema_name}}role_graphql_root_field_names(where: $deleted_root_field_names) {
+                    affected_rows
+                  }
+                  insert_{{schema_name}}role_graphql_root_field_names(objects: $root_field_names, on_conflict: {constraint: role_graphql_root_field_names_pkey, update_columns: []}) {
+                    affected_rows
+                  }
+                  delete_{{schema_name}}user_roles(where: $deleted_users) {
+                    affected_rows
+                  }
+                  insert_{{schema_name}}user_roles(objects: $users, on_conflict: {constraint: user_roles_pkey, update_columns: []}) {
+                    affected_rows
+                  }
+                  delete_{{schema_name}}group_roles(where: $deleted_groups) {
+                    affected_rows
+                  }
+                  insert_{{schema_name}}group_roles(objects: $groups, on_conflict: {constraint: group_roles_pkey, update_columns: []}) {
+                    affected_rows
+                  }
+                }
+            """
+
+mutation_replace_role_access = """
+                mutation ReplaceRoleAccess($roles: [{{schema_name}}roles_insert_input!]!, $role_id: String!, $root_field_name_objects: [{{schema_name}}role_graphql_root_field_names_insert_input!]!, $graphql_root_field_names: [String!], $user_objects: [{{schema_name}}user_roles_insert_input!]!, $users: [String!], $group_objects: [{{schema_name}}group_roles_insert_input!]!, $groups: [String!]) {
+                  insert_{{schema_name}}roles(objects: $roles, on_conflict: {constraint: roles_pkey, update_columns: []}) {
+                    affected_rows
+                  }
+                  delete_{{schema_name}}role_graphql_root_field_names(where: {role_id: {_eq: $role_id}, _and: {graphql_root_field_name: {_nin: $graphql_root_field_names}}}) {
+                    affected_rows
+                  }
+                  insert_{{schema_name}}role_graphql_root_field_names(objects: $root_field_name_objects, on_conflict: {constraint: role_graphql_root_field_names_pkey, update_columns: [graphql_root_field_name]}) {
+                    returning {
+                      graphql_root_field_name
+                    }
+                  }
+                  delete_{{schema_name}}user_roles(where: {role_id: {_eq: $role_id}, _and: {user: {_nin: $users}}}) {
+                    affected_rows
+                  }
+                  insert_{{schema_name}}user_roles(objects: $user_objects, on_conflict: {constraint: user_roles_pkey, update_columns: [user]}) {
+                    returning {
+                      user
+                    }
+                  }
+                  delete_{{schema_name}}group_roles(where: {role_id: {_eq: $role_id}, _and: {group: {_nin: $groups}}}) {
+                    affected_rows
+                  }
+                  insert_{{schema_name}}group_roles(objects: $group_objects, on_conflict: {constraint: group_roles_pkey, update_columns: [group]}) {
+                    returning {
+                      group
+                    }
+                  }
+                }
+            """
+
+query_list_roles = """
+                query ListRoles($where: {{schema_name}}roles_bool_exp!, $limit: Int!) {
+                  {{schema_name}}roles(where: $where, order_by: {role_id: asc}, limit: $limit) {
+                    component_id
+                    role_id
+                  }
+                }
+            """
+
+query_get_roles_by_ids = """
+                query GetRolesByIds($role_ids: [String!], $component_ids: [String!]) {
+                  {{schema_name}}roles(where: {_or: [{role_id: {_in: $role_ids}}, {component_id: {_in: $component_ids}}]}, order_by: {role_id: asc}) {
+                    component_id
+                    role_id
+                  }
+                }
+            """
+
+query_get_role_mappings_by_role_ids = """
+                query GetRoleMappingsByRoleIds($role_ids: [String!]) {
+                  {{schema_name}}roles(where: {role_id: {_in: $role_ids}}, order_by: {role_id: asc}) {
+                    component_id
+                    role_id
+                  }
+                  {{schema_name}}role_graphql_root_field_names(where: {role_id: {_in: $role_ids}}, order_by: {graphql_root_field_name: asc}) {
+                    graphql_root_field_name
+                    role_id
+                  }
+                  {{schema_name}}user_roles(where: {role_id: {_in: $role_ids}}, order_by: {user: asc}) {
+                    user
+                    role_id
+                  }
+                  {{schema_name}}group_roles(where: {role_id: {_in: $role_ids}}, order_by: {group: asc}) {
+                    group
+                    role_id
+                  }
+                }
+            """
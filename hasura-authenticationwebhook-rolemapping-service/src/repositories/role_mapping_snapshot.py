@@ -0,0 +1,103 @@
+import sys
+import time
+from typing import Any, Iterable
+
+from src.models import RoleGraphqlRootFieldName
+
+
+def _index(rows: Iterable[dict[str, Any]], key: str) -> dict[str, tuple[str, ...]]:
+    index: dict[str, dict[str, None]] = {}
+    for row in rows:
+        index.setdefault(sys.intern(row[key]), {})[sys.intern(row["role_id"])] = None
+    return {k: tuple(v) for k, v in index.items()}
+
+
+class RoleMappingSnapshot:
+    """In-memory indexes of the role mapping tables, never modified once built
+
+    Args:
+        roles: role_id -> component_id
+        user_roles: user -> role ids
+        group_roles: group -> role ids
+        root_field_name_roles: root field name -> role ids
+    """
+
+    def __init__(
+        self,
+        roles: dict[str, str],
+        user_roles: dict[str, tuple[str, ...]],
+        group_roles: dict[str, tuple[str, ...]],
+        root_field_name_roles: dict[str, tuple[str, ...]],
+    ):
+        self.roles = roles
+        self.user_roles = user_roles
+        self.group_roles = group_roles
+        self.root_field_name_roles = root_field_name_roles
+        role_root_field_names: dict[str, list[str]] = {}
+        for root_field_name, role_ids in root_field_name_roles.items():
+            for role_id in role_ids:
+                role_root_field_names.setdefault(role_id, []).append(root_field_name)
+        self.role_root_field_names = {
+            k: tuple(v) for k, v in role_root_field_names.items()
+        }
+        self.size = (
+            len(roles)
+            + sum(len(v) for v in user_roles.values())
+            + sum(len(v) for v in group_roles.values())
+            + sum(len(v) for v in root_field_name_roles.values())
+        )
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_rows(
+        cls,
+        roles: Iterable[dict[str, Any]],
+        role_graphql_root_field_names: Iterable[dict[str, Any]],
+        user_roles: Iterable[dict[str, Any]],
+        group_roles: Iterable[dict[str, Any]],
+    ) -> "RoleMappingSnapshot":
+        """Builds the snapshot from the rows of the role mapping tables"""
+        return cls(
+            roles={sys.intern(r["role_id"]): r["component_id"] for r in roles},
+            user_roles=_index(user_roles, "user"),
+            group_roles=_index(group_roles, "group"),
+            root_field_name_roles=_index(
+                role_graphql_root_field_names, "graphql_root_field_name"
+            ),
+        )
+
+    def age(self) -> float:
+        """Returns the seconds elapsed since the snapshot was built"""
+        return time.monotonic() - self.loaded_at
+
+    def get_roles_by_user_and_groups(self, user: str, groups: list[str]) -> list[str]:
+        roles: dict[str, None] = dict.fromkeys(self.user_roles.get(user, ()))
+        for group in groups:
+            roles.update(dict.fromkeys(self.group_roles.get(group, ())))
+        return list(roles)
+
+    def get_roles_by_groups(self, groups: list[str]) -> list[str]:
+        roles: dict[str, None] = {}
+        for group in groups:
+            roles.update(dict.fromkeys(self.group_roles.get(group, ())))
+        return list(roles)
+
+    def get_role_graphql_root_field_names(
+        self, graphql_root_field_names: list[str]
+    ) -> list[RoleGraphqlRootFieldName]:
+        return [
+            # construct skips validation, the snapshot content is already trusted
+            RoleGraphqlRootFieldName.construct(
+                role_id=role_id, graphql_root_field_name=root_field_name
+            )
+            for root_field_name in dict.fromkeys(graphql_root_field_names)
+            for role_id in self.root_field_name_roles.get(root_field_name, ())
+        ]
+
+    def get_graphql_root_field_names_by_role_id(self, role_id: str) -> list[str]:
+        return list(self.role_root_field_names.get(role_id, ()))
+
+    def has_role(self, role_id: str, user: str, groups: list[str]) -> bool:
+        return role_id in self.user_roles.get(user, ()) or any(
+            role_id in self.group_roles.get(group, ()) for group in groups
+        )
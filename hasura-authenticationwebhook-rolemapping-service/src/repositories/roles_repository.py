@@ -1,15 +1,29 @@
 from abc import ABC, abstractmethod
 
 from src.models import (
+    AuthorizationData,
     GraphqlRootFieldNameRoleMappings,
     GroupRoleMappings,
+    GroupRoleMappingsResult,
     Role,
     RoleGraphqlRootFieldName,
+    RoleMappingRecord,
+    RoleMappingRecordResult,
+    RoleMappings,
     UserRoleMappings,
+    UserRoleMappingsResult,
 )
 
 
 class RoleRepository(ABC):
+    async def start(self) -> None:
+        """Acquires the resources held for the lifetime of the repository"""
+        pass
+
+    async def close(self) -> None:
+        """Releases the resources acquired by start"""
+        pass
+
     @abstractmethod
     async def get_role_by_role_id(self, role_id: str) -> Role:
         """Return the role identified by role_id
@@ -59,14 +73,17 @@ class RoleRepository(ABC):
         pass
 
     @abstractmethod
-    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappings:
+    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappingsResult:
         """Upsert a user role
 
+        Only the mappings that differ from the current ones are written.
+
         Args:
             role: The user role to upsert
 
         Returns:
-            The uperted user role
+            The uperted user role, with the number of mappings inserted,
+            deleted and unchanged
 
         Raises:
             RoleNotFoundException: if the corresponding role doesn't exist
@@ -74,20 +91,112 @@ class RoleRepository(ABC):
         pass
 
     @abstractmethod
-    async def upsert_group_roles(self, role: GroupRoleMappings) -> GroupRoleMappings:
+    async def upsert_group_roles(
+        self, role: GroupRoleMappings
+    ) -> GroupRoleMappingsResult:
         """Upsert a group role
 
+        Only the mappings that differ from the current ones are written.
+
         Args:
             role: The group role to upsert
 
         Returns:
-            The uperted group role
+            The uperted group role, with the number of mappings inserted,
+            deleted and unchanged
 
         Raises:
             RoleNotFoundException: if the corresponding role doesn't exist
         """
         pass
 
+    @abstractmethod
+    async def upsert_role_mappings(
+        self, records: list[RoleMappingRecord]
+    ) -> list[RoleMappingRecordResult]:
+        """Upsert roles, user roles and group roles in bulk
+
+        Each record replaces the root field names, users or groups of its
+        role, as the single upserts do; the records are applied in order, so a
+        record can map a role created by a previous one. Invalid records are
+        skipped and don't prevent the others from being applied.
+
+        Args:
+            records: The records to apply
+
+        Returns:
+            The result of each record, in the same order
+        """
+        pass
+
+    @abstractmethod
+    async def upsert_role_access(self, mappings: RoleMappings) -> RoleMappings:
+        """Upserts a role and replaces its root field names, users and groups,
+        in a single transaction
+
+        Args:
+            mappings: The role with its root field names, users and groups
+
+        Returns:
+            The role with its root field names, users and groups after the
+            write, sorted
+
+        Raises:
+            RoleUpsertNotAllowedException: if the role_id or the component_id
+                belong to another role
+        """
+        pass
+
+    @abstractmethod
+    async def list_roles(
+        self,
+        after: str | None,
+        limit: int,
+        component_id_prefix: str | None = None,
+        graphql_root_field_name: str | None = None,
+    ) -> list[Role]:
+        """Returns a page of roles, ordered by role_id
+
+        Args:
+            after: The role_id the page starts after, None for the first page
+            limit: The max number of roles of the page
+            component_id_prefix: If set, only the roles whose component_id
+                starts with it are returned
+            graphql_root_field_name: If set, only the roles granting this
+                root field name are returned
+
+        Returns:
+            The roles of the page
+        """
+        pass
+
+    @abstractmethod
+    async def get_roles(
+        self, role_ids: list[str], component_ids: list[str]
+    ) -> list[Role]:
+        """Returns the roles identified by role_ids or by component_ids
+
+        Args:
+            role_ids: The role ids
+            component_ids: The component ids
+
+        Returns:
+            The roles found, ordered by role_id
+        """
+        pass
+
+    @abstractmethod
+    async def get_role_mappings(self, role_ids: list[str]) -> list[RoleMappings]:
+        """Returns the roles with their root field names, users and groups
+
+        Args:
+            role_ids: The role ids
+
+        Returns:
+            The roles found, ordered by role_id, with their mappings sorted
+        """
+        pass
+
     @abstractmethod
     async def get_roles_by_user_and_groups(
         self, user: str, groups: list[str]
@@ -103,6 +212,18 @@ class RoleRepository(ABC):
         """
         pass
 
+    @abstractmethod
+    async def get_roles_by_groups(self, groups: list[str]) -> list[str]:
+        """Returns the roles of the groups
+
+        Args:
+            groups: The groups, as defined in Witboost
+
+        Returns:
+            The roles of the groups
+        """
+        pass
+
     @abstractmethod
     async def get_role_graphql_root_field_names(
         self, graphql_root_field_names: list[str]
@@ -116,3 +237,46 @@ class RoleRepository(ABC):
             The role and the root field name list
         """
         pass
+
+    @abstractmethod
+    async def get_authorization_data(
+        self, user: str, groups: list[str], graphql_root_field_names: list[str]
+    ) -> AuthorizationData:
+        """Returns, in a single round trip, the role set of the user and the roles
+        mapped to the root field names
+
+        Args:
+            user: The user, as defined in Witboost
+            groups: The user's groups
+            graphql_root_field_names: The root field names to use as filter
+
+        Returns:
+            The role set of the user and the role and root field name list
+        """
+        pass
+
+    @abstractmethod
+    async def get_graphql_root_field_names_by_role_id(self, role_id: str) -> list[str]:
+        """Returns the root field names the role has access to
+
+        Args:
+            role_id: The role identifier
+
+        Returns:
+            The root field names mapped to the role
+        """
+        pass
+
+    @abstractmethod
+    async def has_role(self, role_id: str, user: str, groups: list[str]) -> bool:
+        """Returns whether the role is in the role set of the user
+
+        Args:
+            role_id: The role identifier
+            user: The user, as defined in Witboost
+            groups: The user's groups
+
+        Returns:
+            True if the role is mapped to the user or to one of their groups
+        """
+        pass
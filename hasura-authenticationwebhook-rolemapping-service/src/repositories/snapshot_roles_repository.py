@@ -0,0 +1,236 @@
+import asyncio
+import logging
+
+from pydantic import BaseSettings
+
+from src.models import (
+    AuthorizationData,
+    GraphqlRootFieldNameRoleMappings,
+    GroupRoleMappings,
+    GroupRoleMappingsResult,
+    Role,
+    RoleGraphqlRootFieldName,
+    RoleMappingRecord,
+    RoleMappingRecordResult,
+    RoleMappings,
+    UserRoleMappings,
+    UserRoleMappingsResult,
+)
+from src.repositories.graphql_roles_repository import GraphqlRoleRepository
+from src.repositories.role_mapping_snapshot import RoleMappingSnapshot
+from src.repositories.roles_repository import RoleRepository
+
+
+class SnapshotConfig(BaseSettings):
+    rolemapping_snapshot_enabled: bool = False
+    rolemapping_snapshot_refresh_interval: float = 30.0
+    rolemapping_snapshot_max_age: float = 120.0
+
+
+class SnapshotRoleRepository(RoleRepository):
+    """Serves the authorization lookups from an in-memory snapshot of the role
+    mapping tables, refreshed in background; everything else, and the lookups
+    issued while the snapshot is older than the configured max age, goes to
+    the wrapped repository
+
+    A write through this repository drops the snapshot, so that the lookups
+    see it at once, going to the wrapped repository until the next refresh.
+    """
+
+    def __init__(self, config: SnapshotConfig, role_repository: GraphqlRoleRepository):
+        self.config = config
+        self.role_repository = role_repository
+        self.logger = logging.getLogger(__name__)
+        self._snapshot: RoleMappingSnapshot | None = None
+        # bumped by every write, a snapshot loaded across a write is stale
+        self._generation = 0
+        # whether the staleness of the snapshot has been logged
+        self._stale = False
+        self._refresh_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await self.role_repository.start()
+        try:
+            await self.refresh()
+        except Exception:
+            self.logger.exception("Initial role mapping snapshot load failed")
+        self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        await self.role_repository.close()
+
+    async def refresh(self) -> None:
+        """Loads a new snapshot and swaps it with the current one"""
+        generation = self._generation
+        snapshot = await self.role_repository.get_role_mapping_snapshot()
+        if generation != self._generation:
+            self.logger.info("Role mapping snapshot discarded, written while loading")
+            return
+        self._snapshot = snapshot
+        self.logger.info(f"Role mapping snapshot refreshed, size: {snapshot.size}")
+        if self._stale:
+            self._stale = False
+            self.logger.warning(
+                "Role mapping snapshot fresh again, leaving live queries"
+            )
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.rolemapping_snapshot_refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                self.logger.exception(
+                    f"Role mapping snapshot refresh failed, age: {self.snapshot_age()}"
+                )
+
+    def snapshot_age(self) -> float | None:
+        """Returns the seconds elapsed since the current snapshot was loaded,
+        None if no snapshot has been loaded yet"""
+        return self._snapshot.age() if self._snapshot is not None else None
+
+    def snapshot_size(self) -> int:
+        """Returns the number of rows held by the current snapshot"""
+        return self._snapshot.size if self._snapshot is not None else 0
+
+    def _invalidate(self) -> None:
+        """Drops the snapshot after a write, which it may not reflect"""
+        self._generation += 1
+        self._snapshot = None
+
+    def _get_fresh_snapshot(self) -> RoleMappingSnapshot | None:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        if snapshot.age() > self.config.rolemapping_snapshot_max_age:
+            # logged once, until a refresh succeeds
+            if not self._stale:
+                self._stale = True
+                self.logger.warning(
+                    f"Role mapping snapshot too old ({snapshot.age():.0f}s), "
+                    "falling back to live queries"
+                )
+            return None
+        return snapshot
+
+    async def get_role_by_role_id(self, role_id: str) -> Role:
+        return await self.role_repository.get_role_by_role_id(role_id)
+
+    async def get_role_by_component_id(self, component_id: str) -> Role:
+        return await self.role_repository.get_role_by_component_id(component_id)
+
+    async def upsert_role(
+        self, role: GraphqlRootFieldNameRoleMappings
+    ) -> GraphqlRootFieldNameRoleMappings:
+        # a failed write may still have been partly applied
+        try:
+            return await self.role_repository.upsert_role(role)
+        finally:
+            self._invalidate()
+
+    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappingsResult:
+        try:
+            return await self.role_repository.upsert_user_roles(role)
+        finally:
+            self._invalidate()
+
+    async def upsert_group_roles(
+        self, role: GroupRoleMappings
+    ) -> GroupRoleMappingsResult:
+        try:
+            return await self.role_repository.upsert_group_roles(role)
+        finally:
+            self._invalidate()
+
+    async def upsert_role_mappings(
+        self, records: list[RoleMappingRecord]
+    ) -> list[RoleMappingRecordResult]:
+        try:
+            return await self.role_repository.upsert_role_mappings(records)
+        finally:
+            self._invalidate()
+
+    async def upsert_role_access(self, mappings: RoleMappings) -> RoleMappings:
+        try:
+            return await self.role_repository.upsert_role_access(mappings)
+        finally:
+            self._invalidate()
+
+    async def list_roles(
+        self,
+        after: str | None,
+        limit: int,
+        component_id_prefix: str | None = None,
+        graphql_root_field_name: str | None = None,
+    ) -> list[Role]:
+        return await self.role_repository.list_roles(
+            after, limit, component_id_prefix, graphql_root_field_name
+        )
+
+    async def get_roles(
+        self, role_ids: list[str], component_ids: list[str]
+    ) -> list[Role]:
+        return await self.role_repository.get_roles(role_ids, component_ids)
+
+    async def get_role_mappings(self, role_ids: list[str]) -> list[RoleMappings]:
+        return await self.role_repository.get_role_mappings(role_ids)
+
+    async def get_roles_by_user_and_groups(
+        self, user: str, groups: list[str]
+    ) -> list[str]:
+        snapshot = self._get_fresh_snapshot()
+        if snapshot is None:
+            return await self.role_repository.get_roles_by_user_and_groups(user, groups)
+        return snapshot.get_roles_by_user_and_groups(user, groups)
+
+    async def get_roles_by_groups(self, groups: list[str]) -> list[str]:
+        snapshot = self._get_fresh_snapshot()
+        if snapshot is None:
+            return await self.role_repository.get_roles_by_groups(groups)
+        return snapshot.get_roles_by_groups(groups)
+
+    async def get_role_graphql_root_field_names(
+        self, graphql_root_field_names: list[str]
+    ) -> list[RoleGraphqlRootFieldName]:
+        snapshot = self._get_fresh_snapshot()
+        if snapshot is None:
+            return await self.role_repository.get_role_graphql_root_field_names(
+                graphql_root_field_names
+            )
+        return snapshot.get_role_graphql_root_field_names(graphql_root_field_names)
+
+    async def get_authorization_data(
+        self, user: str, groups: list[str], graphql_root_field_names: list[str]
+    ) -> AuthorizationData:
+        snapshot = self._get_fresh_snapshot()
+        if snapshot is None:
+            return await self.role_repository.get_authorization_data(
+                user, groups, graphql_root_field_names
+            )
+        return AuthorizationData.construct(
+            roles=snapshot.get_roles_by_user_and_groups(user, groups),
+            role_graphql_root_field_names=snapshot.get_role_graphql_root_field_names(
+                graphql_root_field_names
+            ),
+        )
+
+    async def get_graphql_root_field_names_by_role_id(self, role_id: str) -> list[str]:
+        snapshot = self._get_fresh_snapshot()
+        if snapshot is None:
+            return await self.role_repository.get_graphql_root_field_names_by_role_id(
+                role_id
+            )
+        return snapshot.get_graphql_root_field_names_by_role_id(role_id)
+
+    async def has_role(self, role_id: str, user: str, groups: list[str]) -> bool:
+        snapshot = self._get_fresh_snapshot()
+        if snapshot is None:
+            return await self.role_repository.has_role(role_id, user, groups)
+        return snapshot.has_role(role_id, user, groups)
@@ -3,6 +3,8 @@ import os
 from logging.config import dictConfig
 
 import yaml  # type: ignore
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
 
 
 def setup_logging(
@@ -19,3 +21,18 @@ def setup_logging(
         dictConfig(logging_config)
     else:
         logging.basicConfig(level=logging.INFO)
+
+
+class RequestBodyStreamingResponse(StreamingResponse):
+    """Streaming response whose content is produced while the request body is
+    still being read
+
+    StreamingResponse listens for the client disconnect while streaming, and
+    that listener would take the body messages away from request.stream(). A
+    disconnect is still noticed, as request.stream() raises ClientDisconnect.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,181 @@
+import asyncio
+import json
+
+import pytest
+
+from src.handlers.bulk_import_handler import BulkImportConfig, BulkImportHandler
+from src.models import (
+    GraphqlRootFieldNameRoleMappings,
+    GroupRoleMappings,
+    Role,
+    RoleMappingRecord,
+    RoleMappingRecordResult,
+    UserRoleMappings,
+)
+from tests.repositories.fake_roles_repository import FakeRoleRoleRepository
+
+
+class RecordingRoleRepository(FakeRoleRoleRepository):
+    """Records the chunks of records it applies; the chunks holding a role of
+    failing_role_ids fail, the ones holding a role of slow_role_ids are slow"""
+
+    def __init__(self, failing_role_ids=(), slow_role_ids=()):
+        super().__init__(
+            role=Role(role_id="role_id", component_id="component_id"),
+            user_role=UserRoleMappings(role_id="role_id", users=[]),
+            group_role=GroupRoleMappings(role_id="role_id", groups=[]),
+            root_field_name_role=GraphqlRootFieldNameRoleMappings(
+                role_id="role_id",
+                component_id="component_id",
+                graphql_root_field_names=[],
+            ),
+            roles_by_user_and_groups=[],
+            role_graphql_root_field_names=[],
+        )
+        self.failing_role_ids = set(failing_role_ids)
+        self.slow_role_ids = set(slow_role_ids)
+        self.chunks: list[list[str]] = []
+
+    async def upsert_role_mappings(
+        self, records: list[RoleMappingRecord]
+    ) -> list[RoleMappingRecordResult]:
+        role_ids = [r.role_id for r in records]
+        if self.slow_role_ids.intersection(role_ids):
+            await asyncio.sleep(0.05)
+        self.chunks.append(role_ids)
+        if self.failing_role_ids.intersection(role_ids):
+            raise Exception("error")
+        return await super().upsert_role_mappings(records)
+
+
+def user_roles_line(role_id: str) -> bytes:
+    return json.dumps({"type": "user_roles", "role_id": role_id, "users": []}).encode()
+
+
+async def body(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def import_records(handler: BulkImportHandler, *parts: bytes):
+    return [result async for result in handler.import_records(body(*parts))]
+
+
+class TestBulkImportHandler:
+    @pytest.mark.asyncio
+    async def test_import_records_in_order(self):
+        repository = RecordingRoleRepository()
+        handler = BulkImportHandler(BulkImportConfig(), repository)
+        role = {
+            "type": "role",
+            "role_id": "role_id1",
+            "component_id": "component_id1",
+            "graphql_root_field_names": ["field1"],
+        }
+        content = b"\n".join(
+            [
+                json.dumps(role).encode(),
+                b"",
+                user_roles_line("role_id1"),
+                json.dumps(
+                    {"type": "group_roles", "role_id": "role_id1", "groups": []}
+                ).encode(),
+            ]
+        )
+
+        # the lines are split across the chunks of the body
+        results = await import_records(
+            handler, content[:30], content[30:70], content[70:]
+        )
+
+        assert [(r.line, r.type, r.role_id, r.status) for r in results] == [
+            (1, "role", "role_id1", 200),
+            (3, "user_roles", "role_id1", 200),
+            (4, "group_roles", "role_id1", 200),
+        ]
+        assert repository.chunks == [["role_id1", "role_id1", "role_id1"]]
+
+    @pytest.mark.asyncio
+    async def test_import_invalid_records(self):
+        repository = RecordingRoleRepository()
+        handler = BulkImportHandler(BulkImportConfig(), repository)
+
+        results = await import_records(
+            handler,
+            b'{"type": "role", "role_id": "role_id1"}\n',
+            b'{"type": "other"}\n',
+            b"not json\n",
+            user_roles_line("role_id2"),
+        )
+
+        assert [(r.line, r.status) for r in results] == [
+            (1, 400),
+            (2, 400),
+            (3, 400),
+            (4, 200),
+        ]
+        assert results[0].errors == [
+            "component_id: field required",
+            "graphql_root_field_names: field required",
+        ]
+        assert "discriminator" in results[1].errors[0]
+        assert results[2].errors[0].startswith("Invalid JSON")
+        # only the valid records reach the repository
+        assert repository.chunks == [["role_id2"]]
+
+    @pytest.mark.asyncio
+    async def test_import_line_too_long(self):
+        repository = RecordingRoleRepository()
+        handler = BulkImportHandler(
+            BulkImportConfig(bulk_import_max_line_bytes=64), repository
+        )
+        long_line = b'{"type": "user_roles", "role_id": "role_id1", "users": ["'
+        long_line += b"u" * 100 + b'"]}\n'
+
+        results = await import_records(
+            handler, long_line[:50], long_line[50:], user_roles_line("role_id2")
+        )
+
+        assert [(r.line, r.status) for r in results] == [(1, 400), (2, 200)]
+        assert results[0].errors == ["Line longer than 64 bytes"]
+
+    @pytest.mark.asyncio
+    async def test_import_records_in_chunks(self):
+        repository = RecordingRoleRepository(failing_role_ids=["role_id2"])
+        handler = BulkImportHandler(
+            BulkImportConfig(bulk_import_chunk_size=2, bulk_import_concurrency=2),
+            repository,
+        )
+        lines = [user_roles_line(f"role_id{i}") for i in range(5)]
+
+        results = await import_records(handler, b"\n".join(lines))
+
+        assert sorted(repository.chunks) == [
+            ["role_id0", "role_id1"],
+            ["role_id2", "role_id3"],
+            ["role_id4"],
+        ]
+        # a failing chunk doesn't prevent the others from being applied
+        assert [(r.line, r.role_id, r.status) for r in results] == [
+            (1, "role_id0", 200),
+            (2, "role_id1", 200),
+            (3, "role_id2", 500),
+            (4, "role_id3", 500),
+            (5, "role_id4", 200),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_import_chunks_sharing_a_role_in_order(self):
+        repository = RecordingRoleRepository(slow_role_ids=["role_id0"])
+        handler = BulkImportHandler(
+            BulkImportConfig(bulk_import_chunk_size=1, bulk_import_concurrency=3),
+            repository,
+        )
+        lines = [user_roles_line(r) for r in ("role_id0", "role_id1", "role_id0")]
+
+        results = await import_records(handler, b"\n".join(lines))
+
+        assert [r.line for r in results] == [1, 2, 3]
+        # the chunks are applied concurrently, but the second update of
+        # role_id0 waits for the first one
+        assert repository.chunks == [["role_id1"], ["role_id0"], ["role_id0"]]
@@ -0,0 +1,87 @@
+import pytest
+
+from src.handlers.export_handler import ExportConfig, ExportHandler
+from src.models import Role, RoleMappings
+from tests.repositories.fake_roles_repository import (
+    FakeRoleRoleRepositoryRaisingHandledError,
+)
+
+
+class PagedRoleRepository(FakeRoleRoleRepositoryRaisingHandledError):
+    """Serves a fixed set of roles, recording the pages requested"""
+
+    def __init__(self, role_ids: list[str]):
+        self.role_ids = sorted(role_ids)
+        self.pages: list[tuple[str | None, int]] = []
+
+    async def list_roles(
+        self,
+        after: str | None,
+        limit: int,
+        component_id_prefix: str | None = None,
+        graphql_root_field_name: str | None = None,
+    ) -> list[Role]:
+        self.pages.append((after, limit))
+        role_ids = [r for r in self.role_ids if after is None or r > after]
+        return [
+            Role(role_id=r, component_id=f"component:{r}") for r in role_ids[:limit]
+        ]
+
+    async def get_role_mappings(self, role_ids: list[str]) -> list[RoleMappings]:
+        return [
+            RoleMappings(
+                role_id=r,
+                component_id=f"component:{r}",
+                graphql_root_field_names=[f"{r}_select"],
+                users=[f"user:{r}"],
+                groups=[],
+            )
+            for r in role_ids
+        ]
+
+
+async def export(handler: ExportHandler):
+    return [record async for record in handler.export_records()]
+
+
+class TestExportHandler:
+    @pytest.mark.asyncio
+    async def test_export_records_by_page(self):
+        repository = PagedRoleRepository(["role_c", "role_a", "role_b"])
+        handler = ExportHandler(ExportConfig(export_page_size=2), repository)
+
+        records = await export(handler)
+
+        assert repository.pages == [(None, 2), ("role_b", 2)]
+        assert [(r.type, r.role_id) for r in records] == [
+            (t, r)
+            for r in ("role_a", "role_b", "role_c")
+            for t in ("role", "user_roles", "group_roles")
+        ]
+        assert records[0].dict() == {
+            "type": "role",
+            "role_id": "role_a",
+            "component_id": "component:role_a",
+            "graphql_root_field_names": ["role_a_select"],
+        }
+        assert records[1].users == ["user:role_a"]
+        assert records[2].groups == []
+
+    @pytest.mark.asyncio
+    async def test_export_last_page_full(self):
+        repository = PagedRoleRepository(["role_a", "role_b"])
+        handler = ExportHandler(ExportConfig(export_page_size=2), repository)
+
+        records = await export(handler)
+
+        # a full page may not be the last one
+        assert repository.pages == [(None, 2), ("role_b", 2)]
+        assert len(records) == 6
+
+    @pytest.mark.asyncio
+    async def test_export_no_roles(self):
+        repository = PagedRoleRepository([])
+        handler = ExportHandler(ExportConfig(), repository)
+
+        assert await export(handler) == []
+        assert repository.pages == [(None, 500)]
@@ -0,0 +1,124 @@
+import pytest
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    InlineFragmentNode,
+    OperationType,
+    SelectionSetNode,
+    get_operation_ast,
+    parse,
+)
+
+from src.handlers.query_signature import QuerySignature, parse_query_signature
+
+
+def reference_signature(query: str, operation_name: str | None) -> QuerySignature:
+    """Same signature, computed from the full graphql-core AST"""
+    document = parse(query)
+    fragments = {
+        d.name.value: d
+        for d in document.definitions
+        if isinstance(d, FragmentDefinitionNode)
+    }
+    operation = get_operation_ast(document, operation_name)
+    assert operation is not None
+
+    def expand(selection_set: SelectionSetNode, root_field_names: list[str]):
+        for s in selection_set.selections:
+            if isinstance(s, FieldNode):
+                if s.name.value not in root_field_names:
+                    root_field_names.append(s.name.value)
+            elif isinstance(s, InlineFragmentNode):
+                expand(s.selection_set, root_field_names)
+            elif isinstance(s, FragmentSpreadNode):
+                expand(fragments[s.name.value].selection_set, root_field_names)
+
+    root_field_names: list[str] = []
+    expand(operation.selection_set, root_field_names)
+    return QuerySignature((operation.operation,), tuple(root_field_names))
+
+
+conformance_corpus = [
+    "{ products { id } }",
+    "query { products { id } }",
+    "query ProductById($id: uuid!) { products_by_pk(id: $id) { id name } }",
+    'query Q($where: products_bool_exp = {name: {_eq: "}"}}, $l: [Int!] = [1, 2]) '
+    "{ products(where: $where, limit: 10) { id } }",
+    "query { p: products { id } o: orders(order_by: {id: asc}) { id } }",
+    "query { products @include(if: true) { id } __typename }",
+    "query Q @cached(ttl: 60) { products { id nested { deep { deeper { id } } } } }",
+    '{ products(where: {name: {_like: "{%"}}) { id } }',
+    '{ products(where: {name: {_eq: """ { } block "string" """}}) { id } }',
+    "# comment { orders }\n{ products { id } # { orders }\n }",
+    '{ products(where: {name: {_eq: """a \\""" } ( b"""}}) { id } }',
+    '{ products { id # } ) "\n name(arg: "\\" }") } orders { id } }',
+    "query { ...F } fragment F on query_root { products { id } orders { id } }",
+    "query { ... on query_root { products { id } } orders { id } }",
+    "query($x: Boolean!) { ... @include(if: $x) { products { id } } }",
+    "query { ...A } fragment A on query_root { ...B products { id } } "
+    "fragment B on query_root { ... on query_root { orders { id } } }",
+    "{ products { ...P } } fragment P on products { id name }",
+    "mutation { insert_products(objects: []) { affected_rows } }",
+    "subscription { products { id } }",
+    "{ products { id } products(limit: 1) { name } p: products { id } }",
+    "query { ...F products { id } } fragment F on query_root { products { id } }",
+    "query\n{\n  products\n  (\n    limit: 1\n  )\n  {\n    id\n  }\n}",
+]
+
+invalid_corpus = [
+    "query_invalid ProductById($id: uuid!) { products(id: $id) { id name }}",
+    "",
+    "{ }",
+    "{ products { id }",
+    "{ products(limit: 1 { id } }",
+    "query { products { id } } }",
+    '{ products(where: {name: {_eq: "unterminated}) { id } }',
+    '{ products(where: {name: {_eq: """unterminated}) { id } }',
+    "fragment on on query_root { products }",
+    "query { ...Missing }",
+    "query { ...A } fragment A on query_root { ...A }",
+    "type Query { products: [Product] }",
+]
+
+
+multiple_operations = (
+    "query A { products { id } ...F } query B { orders { id } } "
+    "mutation C { delete_orders { affected_rows } } "
+    "fragment F on query_root { customers { id } }"
+)
+
+
+@pytest.mark.parametrize("query", conformance_corpus)
+def test_parse_query_signature_agrees_with_full_parser(query: str):
+    assert parse_query_signature(query) == reference_signature(query, None)
+
+
+@pytest.mark.parametrize("operation_name", ["A", "B", "C"])
+def test_parse_query_signature_operation_name(operation_name: str):
+    assert parse_query_signature(
+        multiple_operations, operation_name
+    ) == reference_signature(multiple_operations, operation_name)
+
+
+@pytest.mark.parametrize("query", invalid_corpus)
+def test_parse_query_signature_invalid(query: str):
+    with pytest.raises(GraphQLError):
+        parse_query_signature(query)
+
+
+def test_parse_query_signature_selected_operation_only():
+    query_signature = parse_query_signature(multiple_operations, "A")
+    mutation_signature = parse_query_signature(multiple_operations, "C")
+
+    assert query_signature.operation_types == (OperationType.QUERY,)
+    assert query_signature.root_field_names == ("products", "customers")
+    assert mutation_signature.operation_types == (OperationType.MUTATION,)
+    assert mutation_signature.root_field_names == ("delete_orders",)
+
+
+@pytest.mark.parametrize("operation_name", [None, "D"])
+def test_parse_query_signature_unknown_operation(operation_name: str | None):
+    with pytest.raises(GraphQLError):
+        parse_query_signature(multiple_operations, operation_name)
@@ -0,0 +1,166 @@
+import pytest
+
+from src.handlers.role_coverage import RoleCoverage
+from src.models import RoleGraphqlRootFieldName
+
+
+def role_root(role_id: str, root_field_name: str) -> RoleGraphqlRootFieldName:
+    return RoleGraphqlRootFieldName(
+        role_id=role_id, graphql_root_field_name=root_field_name
+    )
+
+
+roles = [
+    role_root("role_b", "products"),
+    role_root("role_b", "orders"),
+    role_root("role_a", "products"),
+    role_root("role_a", "orders"),
+    role_root("role_c", "products"),
+    role_root("role_c", "customers"),
+]
+
+covers_all_data = [
+    pytest.param(
+        "role_id1",
+        [
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name",
+            )
+        ],
+        ["graphql_root_field_name"],
+        True,
+        id="role_id1 has access to graphql_root_field_name",
+    ),
+    pytest.param(
+        "role_id1",
+        [
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name_1",
+            ),
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name_2",
+            ),
+        ],
+        ["graphql_root_field_name_1", "graphql_root_field_name_2"],
+        True,
+        id="role_id1 has access to both graphql_root_field_name_1 & graphql_root_field_name_2",  # noqa: E501
+    ),
+    pytest.param(
+        "role_id2",
+        [
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name_1",
+            ),
+            RoleGraphqlRootFieldName(
+                role_id="role_id2",
+                graphql_root_field_name="graphql_root_field_name_2",
+            ),
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name_2",
+            ),
+            RoleGraphqlRootFieldName(
+                role_id="role_id2",
+                graphql_root_field_name="graphql_root_field_name_3",
+            ),
+        ],
+        ["graphql_root_field_name_2", "graphql_root_field_name_3"],
+        True,
+        id="Results with multiple roles ids. role_id2 has access to both graphql_root_field_name_2 & graphql_root_field_name_3",  # noqa: E501
+    ),
+    pytest.param(
+        "role_id1",
+        [
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name",
+            )
+        ],
+        ["graphql_root_field_name_error"],
+        False,
+        id="role_id1 has no access to graphql_root_field_name_error",
+    ),
+    pytest.param(
+        "role_id1",
+        [
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name_1",
+            ),
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name_2",
+            ),
+        ],
+        ["graphql_root_field_name_1", "graphql_root_field_name_error"],
+        False,
+        id="role_id1 has access to graphql_root_field_name_1 but not to graphql_root_field_name_error",  # noqa: E501
+    ),
+    pytest.param(
+        "role_id1",
+        [
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name_1",
+            ),
+            RoleGraphqlRootFieldName(
+                role_id="role_id1",
+                graphql_root_field_name="graphql_root_field_name_2",
+            ),
+            RoleGraphqlRootFieldName(
+                role_id="role_id2",
+                graphql_root_field_name="graphql_root_field_name_1",
+            ),
+            RoleGraphqlRootFieldName(
+                role_id="role_id2",
+                graphql_root_field_name="graphql_root_field_name_error",
+            ),
+        ],
+        ["graphql_root_field_name_1", "graphql_root_field_name_error"],
+        False,
+        id="Results with multiple roles ids. role_id1 has access to graphql_root_field_name_1 but not to graphql_root_field_name_error, role_id2 has access to both",  # noqa: E501
+    ),
+]
+
+
+class TestRoleCoverage:
+    @pytest.mark.parametrize(
+        "root_field_names,expected",
+        [
+            (["products"], {"role_a", "role_b", "role_c"}),
+            (["products", "orders"], {"role_a", "role_b"}),
+            (["products", "orders", "products"], {"role_a", "role_b"}),
+            (["products", "customers"], {"role_c"}),
+            (["orders", "customers"], set()),
+            (["unmapped"], set()),
+        ],
+    )
+    def test_covering_roles(self, root_field_names, expected):
+        coverage = RoleCoverage(roles, root_field_names)
+
+        assert coverage.covering_roles == expected
+
+    def test_covers_all(self):
+        coverage = RoleCoverage(roles, ["products", "orders"])
+
+        assert coverage.covers_all("role_a")
+        assert not coverage.covers_all("role_c")
+        assert not coverage.covers_all("unknown")
+
+    @pytest.mark.parametrize("role_id,roles,root_field_names,expected", covers_all_data)
+    def test_covers_all_root_field_names(
+        self, role_id, roles, root_field_names, expected
+    ):
+        assert RoleCoverage(roles, root_field_names).covers_all(role_id) == expected
+
+    def test_preferred_role_is_deterministic(self):
+        coverage = RoleCoverage(roles, ["products", "orders"])
+
+        assert coverage.preferred_role(["role_c", "role_b", "role_a"]) == "role_a"
+        assert coverage.preferred_role(["role_b", "role_c"]) == "role_b"
+        assert coverage.preferred_role(["role_c"]) is None
+        assert coverage.preferred_role([]) is None
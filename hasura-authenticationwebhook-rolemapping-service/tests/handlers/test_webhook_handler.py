@@ -1,3 +1,6 @@
+import asyncio
+from typing import Any
+
 import pytest
 
 from src.handlers.webhook_handler import (
@@ -8,8 +11,10 @@ from src.handlers.webhook_handler import (
 )
 from src.jwt.azure_claims_service import AzureClaimsService
 from src.jwt.claims_service import ClaimsService
+from src.jwt.jwt_service import JWTService
 from src.models import (
     AuthenticationRequest,
+    AuthorizationData,
     GraphqlRootFieldNameRoleMappings,
     GroupRoleMappings,
     Request,
@@ -17,6 +22,7 @@ from src.models import (
     RoleGraphqlRootFieldName,
     UserRoleMappings,
 )
+from src.repositories.roles_repository import RoleRepository
 from tests.jwt.fake_jwt_service import FakeJWTService
 from tests.jwt.fake_membership_service import FakeMembershipService
 from tests.repositories.fake_roles_repository import FakeRoleRoleRepository
@@ -58,113 +64,6 @@ class TestWebhookHandler:
         ),
     )
 
-    has_access_to_all_root_field_names_data = [
-        pytest.param(
-            "role_id1",
-            [
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name",
-                )
-            ],
-            ["graphql_root_field_name"],
-            True,
-            id="role_id1 has access to graphql_root_field_name",
-        ),
-        pytest.param(
-            "role_id1",
-            [
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name_1",
-                ),
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name_2",
-                ),
-            ],
-            ["graphql_root_field_name_1", "graphql_root_field_name_2"],
-            True,
-            id="role_id1 has access to both graphql_root_field_name_1 & graphql_root_field_name_2",  # noqa: E501
-        ),
-        pytest.param(
-            "role_id2",
-            [
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name_1",
-                ),
-                RoleGraphqlRootFieldName(
-                    role_id="role_id2",
-                    graphql_root_field_name="graphql_root_field_name_2",
-                ),
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name_2",
-                ),
-                RoleGraphqlRootFieldName(
-                    role_id="role_id2",
-                    graphql_root_field_name="graphql_root_field_name_3",
-                ),
-            ],
-            ["graphql_root_field_name_2", "graphql_root_field_name_3"],
-            True,
-            id="Results with multiple roles ids. role_id2 has access to both graphql_root_field_name_2 & graphql_root_field_name_3",  # noqa: E501
-        ),
-        pytest.param(
-            "role_id1",
-            [
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name",
-                )
-            ],
-            ["graphql_root_field_name_error"],
-            False,
-            id="role_id1 has no access to graphql_root_field_name_error",
-        ),
-        pytest.param(
-            "role_id1",
-            [
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name_1",
-                ),
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name_2",
-                ),
-            ],
-            ["graphql_root_field_name_1", "graphql_root_field_name_error"],
-            False,
-            id="role_id1 has access to graphql_root_field_name_1 but not to graphql_root_field_name_error",  # noqa: E501
-        ),
-        pytest.param(
-            "role_id1",
-            [
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name_1",
-                ),
-                RoleGraphqlRootFieldName(
-                    role_id="role_id1",
-                    graphql_root_field_name="graphql_root_field_name_2",
-                ),
-                RoleGraphqlRootFieldName(
-                    role_id="role_id2",
-                    graphql_root_field_name="graphql_root_field_name_1",
-                ),
-                RoleGraphqlRootFieldName(
-                    role_id="role_id2",
-                    graphql_root_field_name="graphql_root_field_name_error",
-                ),
-            ],
-            ["graphql_root_field_name_1", "graphql_root_field_name_error"],
-            False,
-            id="Results with multiple roles ids. role_id1 has access to graphql_root_field_name_1 but not to graphql_root_field_name_error, role_id2 has access to both",  # noqa: E501
-        ),
-    ]
-
     def test_get_token_fail_on_invalid_header(self):
         with pytest.raises(ValueError):
             self.webhook_handler.get_token({"authorization": "Invalid token"})
@@ -247,16 +146,518 @@ class TestWebhookHandler:
 
         assert mapped_user == "group:popeye"
 
-    @pytest.mark.parametrize(
-        "role_id,roles,root_field_names,expected",
-        has_access_to_all_root_field_names_data,
+
+class CountingMembershipService(FakeMembershipService):
+    def __init__(self, groups: list[str]):
+        super().__init__(groups)
+        self.calls = 0
+
+    async def get_memberships(self, user_id: str) -> list[str]:
+        self.calls += 1
+        return self.groups
+
+
+class UserAndGroupRoleRepository(FakeRoleRoleRepository):
+    def __init__(self, user_roles: list[str], group_roles: list[str], **kwargs):
+        super().__init__(roles_by_user_and_groups=[], **kwargs)
+        self.user_roles = user_roles
+        self.group_roles = group_roles
+        self.lookups: list[str] = []
+
+    async def get_roles_by_user_and_groups(
+        self, user: str, groups: list[str]
+    ) -> list[str]:
+        self.lookups.append("user_and_group_roles" if groups else "user_roles")
+        return self.user_roles + (self.group_roles if groups else [])
+
+    async def get_roles_by_groups(self, groups: list[str]) -> list[str]:
+        self.lookups.append("group_roles")
+        return self.group_roles
+
+    async def get_authorization_data(
+        self, user: str, groups: list[str], graphql_root_field_names: list[str]
+    ) -> AuthorizationData:
+        self.lookups.append("authorization_data")
+        return AuthorizationData(
+            roles=self.user_roles + (self.group_roles if groups else []),
+            role_graphql_root_field_names=self.role_graphql_root_field_names,
+        )
+
+
+class CountingPointLookupsRepository(UserAndGroupRoleRepository):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.root_field_names_lookups = 0
+        self.has_role_lookups = 0
+
+    async def get_graphql_root_field_names_by_role_id(self, role_id: str) -> list[str]:
+        self.root_field_names_lookups += 1
+        return await super().get_graphql_root_field_names_by_role_id(role_id)
+
+    async def has_role(self, role_id: str, user: str, groups: list[str]) -> bool:
+        self.has_role_lookups += 1
+        return role_id in self.user_roles + (self.group_roles if groups else [])
+
+
+def get_role_repository(
+    user_roles: list[str],
+    group_roles: list[str],
+    root_field_names: tuple[str, ...] = ("graphql_root_field_name1",),
+    repository_class: type[UserAndGroupRoleRepository] = UserAndGroupRoleRepository,
+) -> UserAndGroupRoleRepository:
+    """Returns a repository where the roles user_role and group_role both have
+    access to root_field_names"""
+    return repository_class(
+        user_roles=user_roles,
+        group_roles=group_roles,
+        role=TestWebhookHandler.role,
+        user_role=TestWebhookHandler.user_role,
+        group_role=TestWebhookHandler.group_role,
+        root_field_name_role=TestWebhookHandler.root_field_name_role,
+        role_graphql_root_field_names=[
+            RoleGraphqlRootFieldName(role_id=role_id, graphql_root_field_name=name)
+            for role_id in ("user_role", "group_role")
+            for name in root_field_names
+        ],
+    )
+
+
+def get_handler(
+    role_repository: RoleRepository = TestWebhookHandler.role_repository,
+    membership_service: FakeMembershipService | None = None,
+    jwt_service: JWTService | None = None,
+    **webhook_config: Any,
+) -> WebhookHandler:
+    """Returns a handler on the given fakes, the ones of TestWebhookHandler
+    by default"""
+    return WebhookHandler(
+        claims_service=AzureClaimsService(
+            membership_service or CountingMembershipService(["dev"])
+        ),
+        jwt_service=jwt_service or TestWebhookHandler.jwt_service,
+        role_repository=role_repository,
+        webhook_config=WebhookConfig(
+            **{
+                "authorization_header_field_names": ["Authorization", "authorization"],
+                **webhook_config,
+            }
+        ),
     )
-    def test_has_access_to_all_root_field_names(
-        self, role_id, roles, root_field_names, expected
-    ):
-        assert (
-            self.webhook_handler.has_access_to_all_root_field_names(
-                role_id, roles, root_field_names
+
+
+def get_request(query: str, requested_role: str | None = None) -> AuthenticationRequest:
+    headers = {"authorization": TestWebhookHandler.authorization_header}
+    if requested_role is not None:
+        headers["x-hasura-role"] = requested_role
+    return AuthenticationRequest(headers=headers, request=Request(query=query))
+
+
+class TestWebhookHandlerCostOrder:
+    query = "query ProductById($id: uuid!) { graphql_root_field_name1(id: $id) { id }}"
+
+    @pytest.mark.asyncio
+    async def test_user_roles_grant_without_groups(self):
+        membership_service = CountingMembershipService(["dev"])
+        handler = get_handler(
+            get_role_repository(["user_role"], []), membership_service
+        )
+
+        res = await handler.authenticate_request(get_request(self.query))
+
+        assert res.X_Hasura_Role == "user_role"
+        assert membership_service.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_group_roles_grant(self):
+        membership_service = CountingMembershipService(["dev"])
+        role_repository = get_role_repository([], ["group_role"])
+        handler = get_handler(role_repository, membership_service)
+
+        res = await handler.authenticate_request(get_request(self.query))
+
+        assert res.X_Hasura_Role == "group_role"
+        assert membership_service.calls == 1
+        # one lookup for the roles of the root fields and of the user, and the
+        # roles of the user are not looked up twice
+        assert role_repository.lookups == ["authorization_data", "group_roles"]
+
+    @pytest.mark.asyncio
+    async def test_membership_failure_denies_only_when_groups_are_needed(self):
+        class FailingMembershipService(CountingMembershipService):
+            async def get_memberships(self, user_id: str) -> list[str]:
+                await super().get_memberships(user_id)
+                raise Exception("membership lookup failed")
+
+        granted = get_handler(
+            get_role_repository(["user_role"], []), FailingMembershipService([])
+        )
+        denied = get_handler(
+            get_role_repository([], ["group_role"]), FailingMembershipService([])
+        )
+
+        res = await granted.authenticate_request(get_request(self.query))
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await denied.authenticate_request(get_request(self.query))
+
+        assert res.X_Hasura_Role == "user_role"
+
+    @pytest.mark.asyncio
+    async def test_unmapped_root_field_denied_without_groups(self):
+        membership_service = CountingMembershipService(["dev"])
+        handler = get_handler(
+            get_role_repository([], ["group_role"], ()), membership_service
+        )
+
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await handler.authenticate_request(get_request(self.query))
+
+        assert membership_service.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_mutation_denied_without_token_validation(self):
+        class FailingJWTService(FakeJWTService):
+            async def validate_and_decode(self, token: str):
+                raise AssertionError("the token must not be validated")
+
+        membership_service = CountingMembershipService(["dev"])
+        handler = get_handler(
+            get_role_repository(["user_role"], []),
+            membership_service,
+            jwt_service=FailingJWTService(data={}),
+        )
+
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await handler.authenticate_request(
+                get_request("mutation { graphql_root_field_name1 }")
             )
-            == expected
+
+        assert membership_service.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_only_the_named_operation_is_checked(self):
+        handler = get_handler(get_role_repository(["user_role"], []))
+        request = get_request(
+            "query A { graphql_root_field_name1 { id } } "
+            "mutation B { graphql_root_field_name1 { id } }"
         )
+        request.request.operationName = "A"
+
+        res = await handler.authenticate_request(request)
+
+        assert res.X_Hasura_Role == "user_role"
+
+    @pytest.mark.asyncio
+    async def test_invalid_token_wins_over_invalid_query(self):
+        class FailingJWTService(FakeJWTService):
+            async def validate_and_decode(self, token: str):
+                raise Exception("invalid token")
+
+        handler = get_handler(
+            get_role_repository(["user_role"], []),
+            jwt_service=FailingJWTService(data={}),
+        )
+
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await handler.authenticate_request(get_request("query_invalid { a }"))
+
+
+class BlockingMembershipService(FakeMembershipService):
+    def __init__(self, groups: list[str]):
+        super().__init__(groups)
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.cancelled = False
+
+    async def get_memberships(self, user_id: str) -> list[str]:
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.groups
+
+
+class BlockingRoleRepository(UserAndGroupRoleRepository):
+    """Looks up the roles while the membership lookup is running, and lets
+    it finish only when release_membership is set"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.membership_service = BlockingMembershipService(["dev"])
+        self.release_membership = False
+        self.overlapped = False
+
+    async def get_authorization_data(
+        self, user: str, groups: list[str], graphql_root_field_names: list[str]
+    ) -> AuthorizationData:
+        await self.membership_service.started.wait()
+        # the membership lookup is still running
+        self.overlapped = not self.membership_service.release.is_set()
+        if self.release_membership:
+            self.membership_service.release.set()
+        return await super().get_authorization_data(
+            user, groups, graphql_root_field_names
+        )
+
+
+class TestWebhookHandlerPipeline:
+    query = "query ProductById($id: uuid!) { graphql_root_field_name1(id: $id) { id }}"
+
+    def get_handler(
+        self,
+        user_roles: list[str],
+        group_roles: list[str],
+        root_field_names: tuple[str, ...] = ("graphql_root_field_name1",),
+        release_membership: bool = False,
+    ) -> tuple[WebhookHandler, BlockingRoleRepository]:
+        role_repository = get_role_repository(
+            user_roles,
+            group_roles,
+            root_field_names,
+            repository_class=BlockingRoleRepository,
+        )
+        assert isinstance(role_repository, BlockingRoleRepository)
+        role_repository.release_membership = release_membership
+        return (
+            get_handler(role_repository, role_repository.membership_service),
+            role_repository,
+        )
+
+    @pytest.mark.asyncio
+    async def test_roles_looked_up_during_membership_lookup(self):
+        handler, role_repository = self.get_handler(
+            [], ["group_role"], release_membership=True
+        )
+
+        res = await handler.authenticate_request(get_request(self.query))
+
+        assert res.X_Hasura_Role == "group_role"
+        assert role_repository.overlapped
+        assert role_repository.lookups == ["authorization_data", "group_roles"]
+
+    @pytest.mark.asyncio
+    async def test_deny_cancels_membership_lookup(self):
+        handler, role_repository = self.get_handler([], ["group_role"], ())
+
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await handler.authenticate_request(get_request(self.query))
+        await asyncio.sleep(0)
+
+        assert role_repository.membership_service.cancelled
+
+    @pytest.mark.asyncio
+    async def test_user_roles_grant_cancels_membership_lookup(self):
+        handler, role_repository = self.get_handler(["user_role"], [])
+
+        res = await handler.authenticate_request(get_request(self.query))
+        await asyncio.sleep(0)
+
+        assert res.X_Hasura_Role == "user_role"
+        assert role_repository.membership_service.cancelled
+
+    @pytest.mark.asyncio
+    async def test_mutation_does_not_start_membership_lookup(self):
+        handler, role_repository = self.get_handler(["user_role"], [])
+
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await handler.authenticate_request(
+                get_request("mutation { graphql_root_field_name1 }")
+            )
+
+        assert not role_repository.membership_service.started.is_set()
+        assert role_repository.lookups == []
+
+    @pytest.mark.asyncio
+    async def test_invalid_token_wins_over_invalid_query(self):
+        class SlowFailingJWTService(FakeJWTService):
+            async def validate_and_decode(self, token: str):
+                await asyncio.sleep(0.01)
+                raise Exception("invalid token")
+
+        handler = get_handler(
+            get_role_repository(["user_role"], []),
+            jwt_service=SlowFailingJWTService(data={}),
+        )
+
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await handler.authenticate_request(get_request("query_invalid { a }"))
+
+
+class TestQuerySignatureCache:
+    query = "query ProductById($id: uuid!) { graphql_root_field_name1(id: $id) { id }}"
+
+    def test_repeated_query_is_parsed_once(self, monkeypatch):
+        import src.handlers.webhook_handler as webhook_handler_module
+
+        parsed = []
+        parse_query_signature = webhook_handler_module.parse_query_signature
+
+        def counting_parse_query_signature(query: str, operation_name: str | None):
+            parsed.append(query)
+            return parse_query_signature(query, operation_name)
+
+        monkeypatch.setattr(
+            webhook_handler_module,
+            "parse_query_signature",
+            counting_parse_query_signature,
+        )
+        handler = get_handler(query_signature_cache_max_entries=10)
+
+        for _ in range(3):
+            root_field_names = handler.get_root_field_names(self.query, "ProductById")
+        handler.get_root_field_names(self.query, None)
+
+        assert root_field_names == ["graphql_root_field_name1"]
+        assert len(parsed) == 2
+        assert handler.query_signature_cache_stats()["hits"] == 2
+        assert handler.query_signature_cache_stats()["hit_rate"] == 0.5
+
+    def test_cached_mutation_is_denied(self):
+        handler = get_handler(query_signature_cache_max_entries=10)
+
+        for _ in range(2):
+            with pytest.raises(WebhookHandlerUnauthorizedException):
+                handler.get_root_field_names("mutation { graphql_root_field_name1 }")
+
+    def test_invalid_query_is_not_cached(self):
+        handler = get_handler(query_signature_cache_max_entries=10)
+
+        for _ in range(2):
+            with pytest.raises(WebhookHandlerInvalidQueryException):
+                handler.get_root_field_names("query_invalid { a }")
+
+        assert len(handler.query_signature_cache) == 0
+
+
+class TestWebhookHandlerRequestedRole:
+    query = "query { graphql_root_field_name1 { id } }"
+
+    @pytest.mark.asyncio
+    async def test_requested_user_role(self):
+        membership_service = CountingMembershipService(["dev"])
+        role_repository = get_role_repository(
+            ["user_role"], [], repository_class=CountingPointLookupsRepository
+        )
+        handler = get_handler(
+            role_repository,
+            membership_service,
+            requested_role_header_field_names=["x-hasura-role"],
+        )
+
+        res = await handler.authenticate_request(get_request(self.query, "user_role"))
+
+        assert res.X_Hasura_Role == "user_role"
+        assert membership_service.calls == 0
+        # the full role set is not computed
+        assert role_repository.lookups == []
+
+    @pytest.mark.asyncio
+    async def test_requested_group_role(self):
+        membership_service = CountingMembershipService(["dev"])
+        handler = get_handler(
+            get_role_repository(
+                [], ["group_role"], repository_class=CountingPointLookupsRepository
+            ),
+            membership_service,
+            requested_role_header_field_names=["x-hasura-role"],
+        )
+
+        res = await handler.authenticate_request(get_request(self.query, "group_role"))
+
+        assert res.X_Hasura_Role == "group_role"
+        assert membership_service.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_requested_role_not_granted_falls_back_to_user_roles(self):
+        role_repository = get_role_repository(
+            ["user_role"], [], repository_class=CountingPointLookupsRepository
+        )
+        handler = get_handler(
+            role_repository, requested_role_header_field_names=["x-hasura-role"]
+        )
+
+        res = await handler.authenticate_request(get_request(self.query, "group_role"))
+
+        assert res.X_Hasura_Role == "user_role"
+        assert role_repository.has_role_lookups == 2
+        assert role_repository.lookups == ["authorization_data"]
+
+    @pytest.mark.asyncio
+    async def test_requested_role_not_granted_falls_back_to_group_roles(self):
+        membership_service = CountingMembershipService(["dev"])
+        role_repository = get_role_repository(
+            [], ["group_role"], repository_class=CountingPointLookupsRepository
+        )
+        handler = get_handler(
+            role_repository,
+            membership_service,
+            requested_role_header_field_names=["x-hasura-role"],
+        )
+
+        res = await handler.authenticate_request(get_request(self.query, "user_role"))
+
+        assert res.X_Hasura_Role == "group_role"
+        assert role_repository.has_role_lookups == 2
+        assert role_repository.lookups == ["authorization_data", "group_roles"]
+        # the groups resolved for the requested role are reused by the fallback
+        assert membership_service.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_requested_role_and_user_roles_not_granted(self):
+        handler = get_handler(
+            get_role_repository(
+                [], [], repository_class=CountingPointLookupsRepository
+            ),
+            requested_role_header_field_names=["x-hasura-role"],
+        )
+
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await handler.authenticate_request(get_request(self.query, "group_role"))
+
+    @pytest.mark.asyncio
+    async def test_requested_role_header_ignored_by_default(self):
+        role_repository = get_role_repository(
+            ["user_role"], [], repository_class=CountingPointLookupsRepository
+        )
+        handler = get_handler(role_repository)
+
+        res = await handler.authenticate_request(get_request(self.query, "group_role"))
+
+        assert res.X_Hasura_Role == "user_role"
+        assert role_repository.has_role_lookups == 0
+
+    @pytest.mark.asyncio
+    async def test_requested_role_not_covering_root_fields(self):
+        membership_service = CountingMembershipService(["dev"])
+        handler = get_handler(
+            get_role_repository(
+                ["user_role"], [], repository_class=CountingPointLookupsRepository
+            ),
+            membership_service,
+            requested_role_header_field_names=["x-hasura-role"],
+        )
+
+        with pytest.raises(WebhookHandlerUnauthorizedException):
+            await handler.authenticate_request(
+                get_request(
+                    "query { graphql_root_field_name1 { id } other }", "user_role"
+                )
+            )
+
+        assert membership_service.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_requested_role_lookups_are_cached(self):
+        role_repository = get_role_repository(
+            ["user_role"], [], repository_class=CountingPointLookupsRepository
+        )
+        handler = get_handler(
+            role_repository, requested_role_header_field_names=["x-hasura-role"]
+        )
+
+        for _ in range(3):
+            await handler.authenticate_request(get_request(self.query, "user_role"))
+
+        assert role_repository.root_field_names_lookups == 1
+        assert role_repository.has_role_lookups == 1
@@ -7,8 +7,11 @@ class FakeJWTService(JWTService):
     def __init__(self, data: dict[str, Any]):
         self.data = data
 
-    def validate(self, token: str) -> None:
+    async def validate(self, token: str) -> None:
         pass
 
-    def get_payload(self, token: str) -> dict[str, Any]:
+    async def get_payload(self, token: str) -> dict[str, Any]:
+        return self.data
+
+    async def validate_and_decode(self, token: str) -> dict[str, Any]:
         return self.data
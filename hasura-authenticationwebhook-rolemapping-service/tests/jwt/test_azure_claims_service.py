@@ -19,3 +19,52 @@ class TestAzureClaimsService:
 
         assert len(groups) == 1
         assert groups[0] == "dev"
+
+
+class TestAzureClaimsServiceGroupsClaims:
+    claims_service = AzureClaimsService(
+        FakeMembershipService(["from-graph"]), groups_claims=["groups", "roles"]
+    )
+
+    @pytest.mark.asyncio
+    async def test_get_groups_from_token(self):
+        groups = await self.claims_service.get_groups(
+            {"oid": "unused", "groups": ["dev", "ops"], "roles": ["ops", "admin"]}
+        )
+
+        assert groups == ["dev", "ops", "admin"]
+
+    @pytest.mark.asyncio
+    async def test_get_groups_empty_claim(self):
+        groups = await self.claims_service.get_groups({"oid": "unused", "groups": []})
+
+        assert groups == []
+
+    @pytest.mark.asyncio
+    async def test_get_groups_missing_claim(self):
+        groups = await self.claims_service.get_groups({"oid": "unused"})
+
+        assert groups == ["from-graph"]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "overage",
+        [
+            {"hasgroups": True},
+            {"_claim_names": {"groups": "src1"}, "_claim_sources": {"src1": {}}},
+        ],
+    )
+    async def test_get_groups_overage(self, overage):
+        groups = await self.claims_service.get_groups(
+            {"oid": "unused", "groups": ["dev"], **overage}
+        )
+
+        assert groups == ["from-graph"]
+
+    @pytest.mark.asyncio
+    async def test_get_groups_claims_disabled(self):
+        claims_service = AzureClaimsService(FakeMembershipService(["from-graph"]))
+
+        groups = await claims_service.get_groups({"oid": "unused", "groups": ["dev"]})
+
+        assert groups == ["from-graph"]
@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from msgraph.generated.users.item.transitive_member_of.graph_group.graph_group_request_builder import (  # type: ignore # noqa: E501
+    GraphGroupRequestBuilder,
+)
+
+from src.jwt.azure_membership_service import AzureConfig, AzureMembershipService
+
+
+class FakeGroupsRequestBuilder:
+    def __init__(self, pages: dict[str | None, Any]):
+        self.pages = pages
+        self.url: str | None = None
+        self.requests: list[tuple[str | None, Any]] = []
+
+    def with_url(self, raw_url: str) -> "FakeGroupsRequestBuilder":
+        builder = FakeGroupsRequestBuilder(self.pages)
+        builder.url = raw_url
+        builder.requests = self.requests
+        return builder
+
+    async def get(self, request_configuration=None):
+        self.requests.append((self.url, request_configuration))
+        return self.pages[self.url]
+
+
+def page(names: list[str], next_link: str | None = None):
+    return SimpleNamespace(
+        value=[SimpleNamespace(display_name=name) for name in names],
+        odata_next_link=next_link,
+    )
+
+
+class TestAzureMembershipService:
+    def get_service(self, monkeypatch, builder: FakeGroupsRequestBuilder | None):
+        service = AzureMembershipService(
+            AzureConfig(
+                azure_tenant_id="tenant",
+                azure_client_id="client",
+                azure_client_secret="secret",
+                azure_scopes=["https://graph.microsoft.com/.default"],
+            )
+        )
+        if builder is None:
+            return service
+        monkeypatch.setattr(
+            service, "_get_groups_request_builder", lambda user_id: builder
+        )
+        return service
+
+    @pytest.mark.asyncio
+    async def test_get_memberships_single_page(self, monkeypatch):
+        builder = FakeGroupsRequestBuilder({None: page(["dev", "ops"])})
+        service = self.get_service(monkeypatch, builder)
+
+        groups = await service.get_memberships("oid")
+
+        assert groups == ["dev", "ops"]
+        assert len(builder.requests) == 1
+        query_parameters = builder.requests[0][1].query_parameters
+        assert query_parameters.select == ["displayName"]
+        assert query_parameters.top == 999
+        assert builder.requests[0][1].headers.get("ConsistencyLevel") == {"eventual"}
+
+    @pytest.mark.asyncio
+    async def test_get_memberships_follows_next_links(self, monkeypatch):
+        builder = FakeGroupsRequestBuilder(
+            {
+                None: page(["dev"], "https://graph/page2"),
+                "https://graph/page2": page(["ops"], "https://graph/page3"),
+                "https://graph/page3": page(["admin"]),
+            }
+        )
+        service = self.get_service(monkeypatch, builder)
+
+        groups = await service.get_memberships("oid")
+
+        assert groups == ["dev", "ops", "admin"]
+        assert [url for url, _ in builder.requests] == [
+            None,
+            "https://graph/page2",
+            "https://graph/page3",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_memberships_no_response(self, monkeypatch):
+        builder = FakeGroupsRequestBuilder({None: None})
+        service = self.get_service(monkeypatch, builder)
+
+        assert await service.get_memberships("oid") == []
+
+    @pytest.mark.asyncio
+    async def test_get_memberships_request_information(self, monkeypatch):
+        requests = []
+
+        async def get(self, request_configuration=None):
+            # the request as the Graph client sends it
+            requests.append(self.to_get_request_information(request_configuration))
+            return page(["dev"], None if len(requests) > 1 else "https://graph/page2")
+
+        monkeypatch.setattr(GraphGroupRequestBuilder, "get", get)
+        service = self.get_service(monkeypatch, None)
+
+        assert await service.get_memberships("oid") == ["dev", "dev"]
+
+        first_page, next_page = requests
+        assert first_page.headers.get("ConsistencyLevel") == {"eventual"}
+        assert first_page.query_parameters == {
+            "%24select": ["displayName"],
+            "%24top": 999,
+            "%24count": True,
+        }
+        assert next_page.headers.get("ConsistencyLevel") == {"eventual"}
+        assert next_page.url == "https://graph/page2"
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from src.jwt.caching_membership_service import (
+    CachingMembershipService,
+    MembershipCacheConfig,
+)
+from src.jwt.membership_service import MembershipService
+
+
+class CountingMembershipService(MembershipService):
+    def __init__(self, groups: list[str]):
+        self.groups = groups
+        self.calls = 0
+
+    async def get_memberships(self, user_id: str) -> list[str]:
+        self.calls += 1
+        await asyncio.sleep(0)
+        return list(self.groups)
+
+
+class TestCachingMembershipService:
+    def get_service(
+        self, membership_service: MembershipService, ttl: float = 60, stale_ttl=60
+    ) -> CachingMembershipService:
+        return CachingMembershipService(
+            MembershipCacheConfig(
+                membership_cache_ttl=ttl,
+                membership_cache_stale_ttl=stale_ttl,
+                membership_cache_max_entries=10,
+            ),
+            membership_service,
+        )
+
+    @pytest.mark.asyncio
+    async def test_memberships_are_cached(self):
+        membership_service = CountingMembershipService(["dev"])
+        service = self.get_service(membership_service)
+
+        first = await service.get_memberships("oid")
+        second = await service.get_memberships("oid")
+
+        assert first == second == ["dev"]
+        assert membership_service.calls == 1
+        assert service.stats()["hits"] == 1
+        assert service.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_call(self):
+        membership_service = CountingMembershipService(["dev"])
+        service = self.get_service(membership_service)
+
+        results = await asyncio.gather(
+            *[service.get_memberships("oid") for _ in range(10)]
+        )
+
+        assert all(r == ["dev"] for r in results)
+        assert membership_service.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_is_served_and_refreshed(self):
+        membership_service = CountingMembershipService(["dev"])
+        service = self.get_service(membership_service, ttl=0)
+        await service.get_memberships("oid")
+        membership_service.groups = ["ops"]
+
+        stale = await service.get_memberships("oid")
+        await asyncio.sleep(0.01)
+        refreshed = await service.get_memberships("oid")
+
+        assert stale == ["dev"]
+        assert refreshed == ["ops"]
+
+    @pytest.mark.asyncio
+    async def test_invalidate(self):
+        membership_service = CountingMembershipService(["dev"])
+        service = self.get_service(membership_service)
+        await service.get_memberships("oid1")
+        await service.get_memberships("oid2")
+
+        service.invalidate("oid1")
+        await service.get_memberships("oid1")
+        await service.get_memberships("oid2")
+        service.invalidate()
+        await service.get_memberships("oid2")
+
+        assert membership_service.calls == 4
+
+    @pytest.mark.asyncio
+    async def test_invalidate_discards_only_the_lookups_of_the_user(self):
+        class BlockingMembershipService(CountingMembershipService):
+            def __init__(self, groups: list[str]):
+                super().__init__(groups)
+                self.release = asyncio.Event()
+
+            async def get_memberships(self, user_id: str) -> list[str]:
+                self.calls += 1
+                await self.release.wait()
+                return list(self.groups)
+
+        membership_service = BlockingMembershipService(["dev"])
+        service = self.get_service(membership_service)
+        lookups = asyncio.gather(
+            service.get_memberships("oid1"), service.get_memberships("oid2")
+        )
+        await asyncio.sleep(0)
+
+        service.invalidate("oid1")
+        membership_service.release.set()
+
+        # the lookup in flight still answers the requests waiting for it
+        assert await lookups == [["dev"], ["dev"]]
+        await service.get_memberships("oid1")
+        await service.get_memberships("oid2")
+        assert membership_service.calls == 3
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self):
+        class FailingMembershipService(CountingMembershipService):
+            async def get_memberships(self, user_id: str) -> list[str]:
+                self.calls += 1
+                raise Exception("error")
+
+        membership_service = FailingMembershipService([])
+        service = self.get_service(membership_service)
+
+        for _ in range(2):
+            with pytest.raises(Exception):
+                await service.get_memberships("oid")
+
+        assert membership_service.calls == 2
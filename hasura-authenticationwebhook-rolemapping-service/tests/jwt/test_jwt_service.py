@@ -1,13 +1,20 @@
+import asyncio
 import base64
-from unittest.mock import patch
+import time
+from unittest.mock import AsyncMock, patch
 
 import jwt
 import pytest
 from cryptography.hazmat.backends import default_backend as crypto_default_backend
 from cryptography.hazmat.primitives.asymmetric import rsa
-from jwt import PyJWTError
+from jwt import PyJWKClientError, PyJWTError
 
-from src.jwt.concrete_jwt_service import ConcreteJWTService, JWTConfig
+from src.jwt.concrete_jwt_service import (
+    ConcreteJWTService,
+    JWTConfig,
+    JWTVerificationOverloadedException,
+)
+from src.jwt.jwks_provider import JWKSProvider
 
 
 class TestJWTService:
@@ -112,27 +119,178 @@ class TestJWTService:
         },
     )
 
-    @patch('jwt.jwks_client.PyJWKClient.fetch_data')
-    def test_validate_fail_on_wrong_aud(self, mock_fetch_data):
-        mock_fetch_data.return_value = self.jwks
+    @pytest.fixture
+    def mock_fetch_jwks(self, monkeypatch):
+        fetch_jwks = AsyncMock(return_value=self.jwks)
+        monkeypatch.setattr(JWKSProvider, "_fetch_jwks", fetch_jwks)
+        return fetch_jwks
+
+    @pytest.mark.asyncio
+    async def test_validate_fail_on_wrong_aud(self, mock_fetch_jwks):
         jwt_service = ConcreteJWTService(self.jwt_config_verify_wrong_aud)
 
         with pytest.raises(PyJWTError):
-            jwt_service.validate(self.token)
+            await jwt_service.validate(self.token)
 
-    @patch('jwt.jwks_client.PyJWKClient.fetch_data')
-    def test_validate_ok(self, mock_fetch_data):
-        mock_fetch_data.return_value = self.jwks
+    @pytest.mark.asyncio
+    async def test_validate_ok(self, mock_fetch_jwks):
         jwt_service = ConcreteJWTService(self.jwt_config_verify_exp_disabled)
 
-        jwt_service.validate(self.token)
+        await jwt_service.validate(self.token)
 
-    @patch('jwt.jwks_client.PyJWKClient.fetch_data')
-    def test_get_payload_ok(self, mock_fetch_data):
-        mock_fetch_data.return_value = self.jwks
+    @pytest.mark.asyncio
+    async def test_get_payload_ok(self, mock_fetch_jwks):
         jwt_service = ConcreteJWTService(self.jwt_config_verify_exp_disabled)
 
-        data = jwt_service.get_payload(self.token)
+        data = await jwt_service.get_payload(self.token)
 
         assert len(data) > 0
 
+    @pytest.mark.asyncio
+    async def test_validate_and_decode_verifies_once(self, mock_fetch_jwks):
+        jwt_service = ConcreteJWTService(self.jwt_config_verify_exp_disabled)
+        token = jwt.encode(
+            payload={**self.payload, "exp": int(time.time()) + 3600},
+            algorithm="RS256",
+            key=self.private_key,
+            headers=self.headers,
+        )
+
+        with patch('jwt.decode', wraps=jwt.decode) as mock_decode:
+            first = await jwt_service.validate_and_decode(token)
+            second = await jwt_service.validate_and_decode(token)
+
+        assert first == second
+        assert mock_decode.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_validate_and_decode_does_not_cache_past_exp(self, mock_fetch_jwks):
+        jwt_service = ConcreteJWTService(self.jwt_config_verify_exp_disabled)
+
+        with patch('jwt.decode', wraps=jwt.decode) as mock_decode:
+            await jwt_service.validate_and_decode(self.token)
+            await jwt_service.validate_and_decode(self.token)
+
+        assert mock_decode.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_validate_and_decode_does_not_cache_failures(self, mock_fetch_jwks):
+        jwt_service = ConcreteJWTService(self.jwt_config_verify_wrong_aud)
+
+        with pytest.raises(PyJWTError):
+            await jwt_service.validate_and_decode(self.token)
+
+        assert len(jwt_service.cache) == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["thread", "process"])
+    async def test_validate_and_decode_in_executor(self, mock_fetch_jwks, mode):
+        jwt_service = ConcreteJWTService(
+            self.jwt_config_verify_exp_disabled.copy(
+                update={"jwt_verification_mode": mode, "jwt_verification_workers": 1}
+            )
+        )
+
+        data = await jwt_service.validate_and_decode(self.token)
+        stats = jwt_service.verification_stats()
+        await jwt_service.close()
+
+        assert data["oid"] == self.payload["oid"]
+        assert stats["verifications"] == 1
+        assert stats["queue_wait_max"] >= 0
+
+    @pytest.mark.asyncio
+    async def test_validate_and_decode_in_executor_fail_on_wrong_aud(
+        self, mock_fetch_jwks
+    ):
+        jwt_service = ConcreteJWTService(
+            self.jwt_config_verify_wrong_aud.copy(
+                update={"jwt_verification_mode": "thread"}
+            )
+        )
+
+        with pytest.raises(PyJWTError):
+            await jwt_service.validate_and_decode(self.token)
+        await jwt_service.close()
+
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("max_wait", [0, 0.01])
+    async def test_validate_and_decode_rejected_when_queue_is_full(
+        self, mock_fetch_jwks, max_wait
+    ):
+        jwt_service = ConcreteJWTService(
+            self.jwt_config_verify_exp_disabled.copy(
+                update={
+                    "jwt_verification_mode": "thread",
+                    "jwt_verification_max_pending": 1,
+                    "jwt_verification_max_wait": max_wait,
+                }
+            )
+        )
+        # a verification holds the only slot of the queue
+        await jwt_service._pending.acquire()
+
+        with pytest.raises(JWTVerificationOverloadedException):
+            await jwt_service.validate_and_decode(self.token)
+        jwt_service._pending.release()
+        data = await jwt_service.validate_and_decode(self.token)
+        stats = jwt_service.verification_stats()
+        await jwt_service.close()
+
+        assert data["oid"] == self.payload["oid"]
+        assert stats["verifications_rejected"] == 1
+        assert stats["verifications"] == 1
+
+
+class TestJWKSProvider:
+    jwks = TestJWTService.jwks
+    kid = "-KI3Q9nNR7bRofxmeZoXqbHZGew"
+
+    @pytest.fixture
+    def mock_fetch_jwks(self, monkeypatch):
+        fetch_jwks = AsyncMock(return_value=self.jwks)
+        monkeypatch.setattr(JWKSProvider, "_fetch_jwks", fetch_jwks)
+        return fetch_jwks
+
+    def get_provider(self) -> JWKSProvider:
+        return JWKSProvider(
+            jwks_url="https://unused",
+            refresh_interval=3600,
+            min_refetch_interval=3600,
+            timeout=1,
+        )
+
+    @pytest.mark.asyncio
+    async def test_start_prefetches_keys(self, mock_fetch_jwks):
+        provider = self.get_provider()
+
+        await provider.start()
+        key = await provider.get_signing_key(self.kid)
+        await provider.close()
+
+        assert key.key_id == self.kid
+        assert mock_fetch_jwks.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_kid_refetch_is_rate_limited(self, mock_fetch_jwks):
+        provider = self.get_provider()
+
+        await provider.get_signing_key(self.kid)
+        with pytest.raises(PyJWKClientError):
+            await provider.get_signing_key("unknown")
+        with pytest.raises(PyJWKClientError):
+            await provider.get_signing_key("unknown")
+
+        assert mock_fetch_jwks.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_fetches_are_coalesced(self, mock_fetch_jwks):
+        provider = self.get_provider()
+
+        keys = await asyncio.gather(
+            *[provider.get_signing_key(self.kid) for _ in range(10)]
+        )
+
+        assert all(k.key_id == self.kid for k in keys)
+        assert mock_fetch_jwks.await_count == 1
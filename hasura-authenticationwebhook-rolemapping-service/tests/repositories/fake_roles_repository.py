@@ -1,9 +1,15 @@
 from src.models import (
+    AuthorizationData,
     GraphqlRootFieldNameRoleMappings,
     GroupRoleMappings,
+    GroupRoleMappingsResult,
     Role,
     RoleGraphqlRootFieldName,
+    RoleMappingRecord,
+    RoleMappingRecordResult,
+    RoleMappings,
     UserRoleMappings,
+    UserRoleMappingsResult,
 )
 from src.repositories.graphql_roles_repository import (
     RoleNotFoundException,
@@ -40,22 +46,119 @@ class FakeRoleRoleRepository(RoleRepository):
     ) -> GraphqlRootFieldNameRoleMappings:
         return self.root_field_name_role
 
-    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappings:
-        return self.user_role
+    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappingsResult:
+        return UserRoleMappingsResult(
+            **self.user_role.dict(),
+            inserted=len(self.user_role.users),
+            deleted=0,
+            unchanged=0,
+        )
 
-    async def upsert_group_roles(self, role: GroupRoleMappings) -> GroupRoleMappings:
-        return self.group_role
+    async def upsert_group_roles(
+        self, role: GroupRoleMappings
+    ) -> GroupRoleMappingsResult:
+        return GroupRoleMappingsResult(
+            **self.group_role.dict(),
+            inserted=len(self.group_role.groups),
+            deleted=0,
+            unchanged=0,
+        )
+
+    async def upsert_role_mappings(
+        self, records: list[RoleMappingRecord]
+    ) -> list[RoleMappingRecordResult]:
+        return [
+            RoleMappingRecordResult(
+                type=r.type, role_id=r.role_id, status=200, inserted=0, deleted=0
+            )
+            for r in records
+        ]
+
+    async def upsert_role_access(self, mappings: RoleMappings) -> RoleMappings:
+        return RoleMappings(
+            role_id=mappings.role_id,
+            component_id=mappings.component_id,
+            graphql_root_field_names=sorted(set(mappings.graphql_root_field_names)),
+            users=sorted(set(mappings.users)),
+            groups=sorted(set(mappings.groups)),
+        )
+
+    async def list_roles(
+        self,
+        after: str | None,
+        limit: int,
+        component_id_prefix: str | None = None,
+        graphql_root_field_name: str | None = None,
+    ) -> list[Role]:
+        roles = [
+            role
+            for role in [self.role]
+            if (after is None or role.role_id > after)
+            and role.component_id.startswith(component_id_prefix or "")
+            and (
+                graphql_root_field_name is None
+                or graphql_root_field_name
+                in self.root_field_name_role.graphql_root_field_names
+            )
+        ]
+        return roles[:limit]
+
+    async def get_roles(
+        self, role_ids: list[str], component_ids: list[str]
+    ) -> list[Role]:
+        if (
+            self.role.role_id not in role_ids
+            and self.role.component_id not in component_ids
+        ):
+            return []
+        return [self.role]
+
+    async def get_role_mappings(self, role_ids: list[str]) -> list[RoleMappings]:
+        if self.role.role_id not in role_ids:
+            return []
+        return [
+            RoleMappings(
+                role_id=self.role.role_id,
+                component_id=self.role.component_id,
+                graphql_root_field_names=sorted(
+                    self.root_field_name_role.graphql_root_field_names
+                ),
+                users=sorted(self.user_role.users),
+                groups=sorted(self.group_role.groups),
+            )
+        ]
 
     async def get_roles_by_user_and_groups(
         self, user: str, groups: list[str]
     ) -> list[str]:
         return self.roles_by_user_and_groups
 
+    async def get_roles_by_groups(self, groups: list[str]) -> list[str]:
+        return self.roles_by_user_and_groups
+
     async def get_role_graphql_root_field_names(
         self, graphql_root_field_names: list[str]
     ) -> list[RoleGraphqlRootFieldName]:
         return self.role_graphql_root_field_names
 
+    async def get_authorization_data(
+        self, user: str, groups: list[str], graphql_root_field_names: list[str]
+    ) -> AuthorizationData:
+        return AuthorizationData(
+            roles=self.roles_by_user_and_groups,
+            role_graphql_root_field_names=self.role_graphql_root_field_names,
+        )
+
+    async def get_graphql_root_field_names_by_role_id(self, role_id: str) -> list[str]:
+        return [
+            r.graphql_root_field_name
+            for r in self.role_graphql_root_field_names
+            if r.role_id == role_id
+        ]
+
+    async def has_role(self, role_id: str, user: str, groups: list[str]) -> bool:
+        return role_id in self.roles_by_user_and_groups
+
 
 class FakeRoleRoleRepositoryRaisingHandledError(RoleRepository):
     async def get_role_by_role_id(self, role_id: str) -> Role:
@@ -69,22 +172,68 @@ class FakeRoleRoleRepositoryRaisingHandledError(RoleRepository):
     ) -> GraphqlRootFieldNameRoleMappings:
         raise RoleUpsertNotAllowedException("error")
 
-    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappings:
+    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappingsResult:
         raise RoleNotFoundException("error")
 
-    async def upsert_group_roles(self, role: GroupRoleMappings) -> GroupRoleMappings:
+    async def upsert_group_roles(
+        self, role: GroupRoleMappings
+    ) -> GroupRoleMappingsResult:
         raise RoleNotFoundException("error")
 
+    async def upsert_role_mappings(
+        self, records: list[RoleMappingRecord]
+    ) -> list[RoleMappingRecordResult]:
+        return [
+            RoleMappingRecordResult(
+                type=r.type, role_id=r.role_id, status=400, errors=["error"]
+            )
+            for r in records
+        ]
+
+    async def upsert_role_access(self, mappings: RoleMappings) -> RoleMappings:
+        raise RoleUpsertNotAllowedException("error")
+
+    async def list_roles(
+        self,
+        after: str | None,
+        limit: int,
+        component_id_prefix: str | None = None,
+        graphql_root_field_name: str | None = None,
+    ) -> list[Role]:
+        return []
+
+    async def get_roles(
+        self, role_ids: list[str], component_ids: list[str]
+    ) -> list[Role]:
+        return []
+
+    async def get_role_mappings(self, role_ids: list[str]) -> list[RoleMappings]:
+        return []
+
     async def get_roles_by_user_and_groups(
         self, user: str, groups: list[str]
     ) -> list[str]:
         return []
 
+    async def get_roles_by_groups(self, groups: list[str]) -> list[str]:
+        return []
+
     async def get_role_graphql_root_field_names(
         self, graphql_root_field_names: list[str]
     ) -> list[RoleGraphqlRootFieldName]:
         return []
 
+    async def get_authorization_data(
+        self, user: str, groups: list[str], graphql_root_field_names: list[str]
+    ) -> AuthorizationData:
+        return AuthorizationData(roles=[], role_graphql_root_field_names=[])
+
+    async def get_graphql_root_field_names_by_role_id(self, role_id: str) -> list[str]:
+        return []
+
+    async def has_role(self, role_id: str, user: str, groups: list[str]) -> bool:
+        return False
+
 
 class FakeRoleRoleRepositoryRaisingGenericError(RoleRepository):
     async def get_role_by_role_id(self, role_id: str) -> Role:
@@ -98,10 +247,37 @@ class FakeRoleRoleRepositoryRaisingGenericError(RoleRepository):
     ) -> GraphqlRootFieldNameRoleMappings:
         raise Exception("error")
 
-    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappings:
+    async def upsert_user_roles(self, role: UserRoleMappings) -> UserRoleMappingsResult:
+        raise Exception("error")
+
+    async def upsert_group_roles(
+        self, role: GroupRoleMappings
+    ) -> GroupRoleMappingsResult:
         raise Exception("error")
 
-    async def upsert_group_roles(self, role: GroupRoleMappings) -> GroupRoleMappings:
+    async def upsert_role_mappings(
+        self, records: list[RoleMappingRecord]
+    ) -> list[RoleMappingRecordResult]:
+        raise Exception("error")
+
+    async def upsert_role_access(self, mappings: RoleMappings) -> RoleMappings:
+        raise Exception("error")
+
+    async def list_roles(
+        self,
+        after: str | None,
+        limit: int,
+        component_id_prefix: str | None = None,
+        graphql_root_field_name: str | None = None,
+    ) -> list[Role]:
+        raise Exception("error")
+
+    async def get_roles(
+        self, role_ids: list[str], component_ids: list[str]
+    ) -> list[Role]:
+        raise Exception("error")
+
+    async def get_role_mappings(self, role_ids: list[str]) -> list[RoleMappings]:
         raise Exception("error")
 
     async def get_roles_by_user_and_groups(
@@ -109,7 +285,21 @@ class FakeRoleRoleRepositoryRaisingGenericError(RoleRepository):
     ) -> list[str]:
         raise Exception("error")
 
+    async def get_roles_by_groups(self, groups: list[str]) -> list[str]:
+        raise Exception("error")
+
     async def get_role_graphql_root_field_names(
         self, graphql_root_field_names: list[str]
     ) -> list[RoleGraphqlRootFieldName]:
         raise Exception("error")
+
+    async def get_authorization_data(
+        self, user: str, groups: list[str], graphql_root_field_names: list[str]
+    ) -> AuthorizationData:
+        raise Exception("error")
+
+    async def get_graphql_root_field_names_by_role_id(self, role_id: str) -> list[str]:
+        raise Exception("error")
+
+    async def has_role(self, role_id: str, user: str, groups: list[str]) -> bool:
+        raise Exception("error")
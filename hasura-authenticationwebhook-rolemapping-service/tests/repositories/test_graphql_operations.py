@@ -0,0 +1,86 @@
+import os
+
+from graphql import DocumentNode, OperationDefinitionNode, build_schema, validate
+
+from src.repositories.graphql_operations import GraphqlOperations
+
+
+class TestGraphqlOperations:
+    operations = GraphqlOperations("rolemapping_")
+
+    def test_result_keys_use_schema_name(self):
+        assert self.operations.roles == "rolemapping_roles"
+        assert self.operations.user_roles == "rolemapping_user_roles"
+        assert self.operations.insert_roles_one == "insert_rolemapping_roles_one"
+
+    def test_result_keys_public_schema(self):
+        operations = GraphqlOperations("")
+
+        assert operations.roles == "roles"
+        assert operations.insert_group_roles == "insert_group_roles"
+
+    def test_documents_are_parsed_with_schema_name(self):
+        document = self.operations.query_get_role_by_role_id
+        definition = document.definitions[0]
+
+        assert isinstance(document, DocumentNode)
+        assert isinstance(definition, OperationDefinitionNode)
+        assert definition.selection_set.selections[0].name.value == "rolemapping_roles"
+
+    def test_documents_are_built_once(self):
+        documents = self.operations.documents()
+
+        assert len(documents) == 21
+        assert all(d is e for d, e in zip(documents, self.operations.documents()))
+
+    def test_insert_chunks_are_aliased(self):
+        document = self.operations.with_insert_chunks(
+            self.operations.mutation_update_user_roles, 3
+        )
+        definition = document.definitions[0]
+
+        assert isinstance(definition, OperationDefinitionNode)
+        assert [v.variable.name.value for v in definition.variable_definitions] == [
+            "objects",
+            "users",
+            "role_id",
+            "objects_1",
+            "objects_2",
+        ]
+        assert [
+            (f.alias and f.alias.value, f.name.value)
+            for f in definition.selection_set.selections
+        ] == [
+            (None, "delete_rolemapping_user_roles"),
+            (None, "insert_rolemapping_user_roles"),
+            ("insert_rolemapping_user_roles_1", "insert_rolemapping_user_roles"),
+            ("insert_rolemapping_user_roles_2", "insert_rolemapping_user_roles"),
+        ]
+        # the registry documents are left untouched, and the chunked ones are
+        # built once
+        assert (
+            len(
+                self.operations.mutation_update_user_roles.definitions[
+                    0
+                ].variable_definitions
+            )
+            == 3
+        )
+        assert document is self.operations.with_insert_chunks(
+            self.operations.mutation_update_user_roles, 3
+        )
+
+    def test_insert_chunks_are_valid(self):
+        with open(
+            os.path.join(os.path.dirname(__file__), "hasura_schema.graphql"), "rt"
+        ) as f:
+            schema = build_schema(f.read())
+
+        for document in (
+            self.operations.mutation_replace_root_field_name_roles,
+            self.operations.mutation_update_user_roles,
+            self.operations.mutation_update_group_roles,
+        ):
+            assert (
+                validate(schema, self.operations.with_insert_chunks(document, 3)) == []
+            )
@@ -1,16 +1,23 @@
+import asyncio
+import os
+
 import pytest
-from gql.client import Client
 from gql.transport.aiohttp import AIOHTTPTransport
-from graphql import ExecutionResult
+from graphql import ExecutionResult, build_schema, introspection_from_schema
 
 from src.models import (
     GraphqlRootFieldNameRoleMappings,
     GroupRoleMappings,
+    GroupRolesRecord,
     Role,
+    RoleMappings,
+    RoleRecord,
     UserRoleMappings,
+    UserRolesRecord,
 )
 from src.repositories.graphql_roles_repository import (
     GraphqlConfig,
+    GraphqlOperationValidationException,
     GraphqlRoleRepository,
     RoleNotFoundException,
     RoleUpsertNotAllowedException,
@@ -20,15 +27,19 @@ from src.repositories.graphql_roles_repository import (
 @pytest.fixture
 def monkeypatch_base(monkeypatch):
     monkeypatch.setattr(AIOHTTPTransport, "connect", mock_connect)
-    monkeypatch.setattr(Client, "_build_schema_from_introspection", mock_build_schema)
 
 
 async def mock_connect(*args, **kwargs):
     pass
 
 
-def mock_build_schema(*args, **kwargs):
-    return None
+hasura_schema_path = os.path.join(os.path.dirname(__file__), "hasura_schema.graphql")
+
+
+async def introspection_mock_execute(*args, **kwargs):
+    with open(hasura_schema_path, "rt") as f:
+        schema = build_schema(f.read())
+    return ExecutionResult(data=introspection_from_schema(schema))
 
 
 async def role_mock_execute_no_data(*args, **kwargs):
@@ -75,74 +86,121 @@ async def upsert_role_mock_execute_data(*args, **kwargs):
     )
 
 
-async def upsert_user_role_mock_execute_data(*args, **kwargs):
+def role_mappings_mock_execute(roles, result_key, rows, executed):
+    """Returns a mock execute answering the role mapping queries with the roles
+    and the rows, and applying the role mapping mutations to the rows like
+    Hasura would, recording the executed operations and their variables"""
+    column = result_key.split("_")[0]
+
+    async def execute(self, document, variable_values=None, **kwargs):
+        definition = document.definitions[0]
+        executed.append((definition.name.value, variable_values))
+        if definition.operation.value == "query":
+            return ExecutionResult(
+                data={
+                    "rolemapping_roles": roles,
+                    f"rolemapping_{result_key}": [dict(r) for r in rows],
+                }
+            )
+        values = variable_values[f"{column}s"]
+        deleted = [r for r in rows if r[column] not in values]
+        rows[:] = [r for r in rows if r[column] in values]
+        data = {f"delete_rolemapping_{result_key}": {"affected_rows": len(deleted)}}
+        for key, objects in variable_values.items():
+            if key.startswith("objects"):
+                existing = {r[column] for r in rows}
+                new_rows = [{column: o[column]} for o in objects]
+                rows.extend(r for r in new_rows if r[column] not in existing)
+                alias = f"insert_rolemapping_{result_key}{key[len('objects'):]}"
+                data[alias] = {
+                    "affected_rows": sum(r[column] not in existing for r in new_rows)
+                }
+        return ExecutionResult(data=data)
+
+    return execute
+
+
+async def roles_by_user_and_groups_mock_execute(*args, **kwargs):
     return ExecutionResult(
         data={
-            "insert_rolemapping_user_roles": {"returning": [{"user": "user:user1"}]},
-            "rolemapping_roles": [
+            "rolemapping_user_roles": [
+                {
+                    "role_id": "role_id",
+                }
+            ],
+            "rolemapping_group_roles": [
                 {
                     "role_id": "role_id",
-                    "component_id": "component_id",
-                    "graphql_root_field_name": "graphql_root_field_name",
                 }
             ],
         }
     )
 
 
-async def upsert_group_role_mock_execute_data(*args, **kwargs):
+async def role_graphql_root_field_names_mock_execute(*args, **kwargs):
     return ExecutionResult(
         data={
-            "insert_rolemapping_group_roles": {
-                "returning": [{"group": "group:group1"}]
-            },
-            "rolemapping_roles": [
+            "rolemapping_role_graphql_root_field_names": [
                 {
                     "role_id": "role_id",
-                    "component_id": "component_id",
                     "graphql_root_field_name": "graphql_root_field_name",
                 }
-            ],
+            ]
         }
     )
 
 
-async def roles_by_user_and_groups_mock_execute(*args, **kwargs):
+async def authorization_data_mock_execute(*args, **kwargs):
     return ExecutionResult(
         data={
-            "rolemapping_user_roles": [
-                {
-                    "role_id": "role_id",
-                }
-            ],
+            "rolemapping_user_roles": [{"role_id": "role_id1"}],
             "rolemapping_group_roles": [
+                {"role_id": "role_id2"},
+                {"role_id": "role_id1"},
+            ],
+            "rolemapping_role_graphql_root_field_names": [
                 {
-                    "role_id": "role_id",
+                    "role_id": "role_id1",
+                    "graphql_root_field_name": "graphql_root_field_name",
                 }
             ],
         }
     )
 
 
-async def role_graphql_root_field_names_mock_execute(*args, **kwargs):
+async def role_root_field_names_mock_execute(*args, **kwargs):
     return ExecutionResult(
         data={
             "rolemapping_role_graphql_root_field_names": [
-                {
-                    "role_id": "role_id",
-                    "graphql_root_field_name": "graphql_root_field_name",
-                }
-            ]
+                {"graphql_root_field_name": "graphql_root_field_name1"},
+                {"graphql_root_field_name": "graphql_root_field_name2"},
+            ],
+        }
+    )
+
+
+async def has_role_mock_execute_group(*args, **kwargs):
+    return ExecutionResult(
+        data={
+            "rolemapping_user_roles": [],
+            "rolemapping_group_roles": [{"role_id": "role_id"}],
         }
     )
 
 
+async def has_role_mock_execute_none(*args, **kwargs):
+    return ExecutionResult(
+        data={"rolemapping_user_roles": [], "rolemapping_group_roles": []}
+    )
+
+
 class TestGraphqlRolesRepository:
     config = GraphqlConfig(
         graphql_url="http://unused",
         graphql_role="fake",
         graphql_admin_secret="fake",
         rolemapping_table_schema="rolemapping",
+        graphql_validate_operations=False,
     )
     repo = GraphqlRoleRepository(config)
 
@@ -213,23 +271,120 @@ class TestGraphqlRolesRepository:
             "graphql_root_field_name1",
         ]
 
+    @pytest.mark.asyncio
+    async def test_upsert_role_in_chunks(self, monkeypatch, monkeypatch_base):
+        executed = []
+
+        async def execute(self, document, variable_values=None, **kwargs):
+            executed.append((document.definitions[0].name.value, variable_values))
+            if document.definitions[0].name.value == "InsertRole":
+                return await upsert_role_mock_execute_data()
+            # each aliased insert returns the rows of its own chunk
+            return ExecutionResult(
+                data={
+                    "delete_rolemapping_role_graphql_root_field_names": {
+                        "affected_rows": 0
+                    },
+                    **{
+                        f"insert_rolemapping_role_graphql_root_field_names{suffix}": {
+                            "returning": variable_values[f"objects{suffix}"]
+                        }
+                        for suffix in ("", "_1", "_2")
+                    },
+                }
+            )
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", execute)
+        repo = GraphqlRoleRepository(
+            self.config.copy(update={"graphql_mutation_chunk_size": 2})
+        )
+        names = [f"graphql_root_field_name{i}" for i in range(5)]
+
+        role = await repo.upsert_role(
+            GraphqlRootFieldNameRoleMappings(
+                role_id="role_id",
+                component_id="component_id",
+                graphql_root_field_names=names,
+            )
+        )
+
+        assert role.graphql_root_field_names == names
+        # the delete and all the chunks are a single mutation
+        assert [name for name, _ in executed] == [
+            "InsertRole",
+            "ReplaceRootFieldNameRoles",
+        ]
+        params = executed[1][1]
+        assert params["graphql_root_field_names"] == names
+        assert [len(params[key]) for key in ("objects", "objects_1", "objects_2")] == [
+            2,
+            2,
+            1,
+        ]
+
     @pytest.mark.asyncio
     async def test_upsert_user_role_ok(self, monkeypatch, monkeypatch_base):
+        executed = []
         monkeypatch.setattr(
-            AIOHTTPTransport, "execute", upsert_user_role_mock_execute_data
+            AIOHTTPTransport,
+            "execute",
+            role_mappings_mock_execute(
+                [{"role_id": "role_id", "component_id": "component_id"}],
+                "user_roles",
+                [{"user": "user:user1"}, {"user": "user:user2"}],
+                executed,
+            ),
         )
 
         user_role = await self.repo.upsert_user_roles(
-            UserRoleMappings(role_id="role_id", users=["user:user1"])
+            UserRoleMappings(role_id="role_id", users=["user:user1", "user:user3"])
         )
 
         assert user_role.role_id == "role_id"
-        assert user_role.users == ["user:user1"]
+        assert user_role.users == ["user:user1", "user:user3"]
+        assert (user_role.inserted, user_role.deleted, user_role.unchanged) == (
+            1,
+            1,
+            1,
+        )
+        assert [name for name, _ in executed] == [
+            "GetUserRoleMappings",
+            "UpdateUserRoles",
+        ]
+        params = executed[1][1]
+        # the rows not listed are deleted and all the listed ones are inserted,
+        # whatever was read
+        assert params["users"] == ["user:user1", "user:user3"]
+        assert [o["user"] for o in params["objects"]] == ["user:user1", "user:user3"]
+        assert params["objects"][0]["role_id"] == "role_id"
+
+    @pytest.mark.asyncio
+    async def test_upsert_user_role_not_found(self, monkeypatch, monkeypatch_base):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport,
+            "execute",
+            role_mappings_mock_execute([], "user_roles", [], executed),
+        )
+
+        with pytest.raises(RoleNotFoundException):
+            await self.repo.upsert_user_roles(
+                UserRoleMappings(role_id="role_id", users=["user:user1"])
+            )
+        assert [name for name, _ in executed] == ["GetUserRoleMappings"]
 
     @pytest.mark.asyncio
     async def test_upsert_group_role_ok(self, monkeypatch, monkeypatch_base):
+        executed = []
         monkeypatch.setattr(
-            AIOHTTPTransport, "execute", upsert_group_role_mock_execute_data
+            AIOHTTPTransport,
+            "execute",
+            role_mappings_mock_execute(
+                [{"role_id": "role_id", "component_id": "component_id"}],
+                "group_roles",
+                [],
+                executed,
+            ),
         )
 
         group_role = await self.repo.upsert_group_roles(
@@ -238,6 +393,435 @@ class TestGraphqlRolesRepository:
 
         assert group_role.role_id == "role_id"
         assert group_role.groups == ["group:group1"]
+        assert (group_role.inserted, group_role.deleted, group_role.unchanged) == (
+            1,
+            0,
+            0,
+        )
+        assert [name for name, _ in executed] == [
+            "GetGroupRoleMappings",
+            "UpdateGroupRoles",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_upsert_group_role_unchanged_is_a_single_read(
+        self, monkeypatch, monkeypatch_base
+    ):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport,
+            "execute",
+            role_mappings_mock_execute(
+                [{"role_id": "role_id", "component_id": "component_id"}],
+                "group_roles",
+                [{"group": "group:group1"}, {"group": "group:group2"}],
+                executed,
+            ),
+        )
+
+        group_role = await self.repo.upsert_group_roles(
+            GroupRoleMappings(
+                role_id="role_id",
+                groups=["group:group2", "group:group1", "group:group2"],
+            )
+        )
+
+        assert group_role.groups == ["group:group2", "group:group1"]
+        assert (group_role.inserted, group_role.deleted, group_role.unchanged) == (
+            0,
+            0,
+            2,
+        )
+        assert [name for name, _ in executed] == ["GetGroupRoleMappings"]
+
+    @pytest.mark.asyncio
+    async def test_upsert_user_roles_in_chunks(self, monkeypatch, monkeypatch_base):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport,
+            "execute",
+            role_mappings_mock_execute(
+                [{"role_id": "role_id", "component_id": "component_id"}],
+                "user_roles",
+                [{"user": "user:user0"}, {"user": "user:other"}],
+                executed,
+            ),
+        )
+        repo = GraphqlRoleRepository(
+            self.config.copy(update={"graphql_mutation_chunk_size": 2})
+        )
+        users = [f"user:user{i}" for i in range(6)]
+
+        user_role = await repo.upsert_user_roles(
+            UserRoleMappings(role_id="role_id", users=users)
+        )
+
+        assert user_role.users == users
+        assert (user_role.inserted, user_role.deleted, user_role.unchanged) == (
+            5,
+            1,
+            1,
+        )
+        # the delete and all the chunks are a single mutation
+        assert [name for name, _ in executed] == [
+            "GetUserRoleMappings",
+            "UpdateUserRoles",
+        ]
+        params = executed[1][1]
+        chunks = [params["objects"], params["objects_1"], params["objects_2"]]
+        assert params["users"] == users
+        assert params["role_id"] == "role_id"
+        assert [len(chunk) for chunk in chunks] == [2, 2, 2]
+        assert [o["user"] for chunk in chunks for o in chunk] == users
+
+    @pytest.mark.asyncio
+    async def test_concurrent_upserts_leave_the_last_users(
+        self, monkeypatch, monkeypatch_base
+    ):
+        executed = []
+        rows = [{"user": "user:user0"}]
+        execute = role_mappings_mock_execute(
+            [{"role_id": "role_id", "component_id": "component_id"}],
+            "user_roles",
+            rows,
+            executed,
+        )
+        both_read = asyncio.Barrier(2)
+
+        async def interleaved_execute(self, document, variable_values=None, **kwargs):
+            result = await execute(self, document, variable_values, **kwargs)
+            if document.definitions[0].operation.value == "query":
+                # both updates read the rows before either writes
+                await both_read.wait()
+            return result
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", interleaved_execute)
+
+        first, second = await asyncio.gather(
+            self.repo.upsert_user_roles(
+                UserRoleMappings(role_id="role_id", users=["user:user1"])
+            ),
+            self.repo.upsert_user_roles(
+                UserRoleMappings(role_id="role_id", users=["user:user2"])
+            ),
+        )
+
+        assert [name for name, _ in executed] == [
+            "GetUserRoleMappings",
+            "GetUserRoleMappings",
+            "UpdateUserRoles",
+            "UpdateUserRoles",
+        ]
+        # the last update also deletes the row of the other one, which it
+        # didn't read
+        assert rows == [{"user": user} for user in executed[-1][1]["users"]]
+        assert (first.inserted, first.deleted) == (1, 1)
+        assert (second.inserted, second.deleted) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_upsert_group_roles_empty(self, monkeypatch, monkeypatch_base):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport,
+            "execute",
+            role_mappings_mock_execute(
+                [{"role_id": "role_id", "component_id": "component_id"}],
+                "group_roles",
+                [{"group": "group:group1"}],
+                executed,
+            ),
+        )
+
+        group_role = await self.repo.upsert_group_roles(
+            GroupRoleMappings(role_id="role_id", groups=[])
+        )
+
+        assert group_role.groups == []
+        assert (group_role.inserted, group_role.deleted, group_role.unchanged) == (
+            0,
+            1,
+            0,
+        )
+        # the delete is sent along with an empty insert
+        assert [name for name, _ in executed] == [
+            "GetGroupRoleMappings",
+            "UpdateGroupRoles",
+        ]
+        assert executed[1][1]["groups"] == []
+        assert executed[1][1]["objects"] == []
+
+    def role_mapping_rows_mock_execute(self, executed):
+        async def execute(self, document, variable_values=None, **kwargs):
+            definition = document.definitions[0]
+            executed.append((definition.name.value, variable_values))
+            if definition.name.value == "ReplaceRoleAccess":
+                # the upserted rows of the role, in the order of the objects
+                return ExecutionResult(
+                    data={
+                        f"insert_rolemapping_{table}": {
+                            "returning": [
+                                {column: o[column]}
+                                for o in variable_values[f"{objects}_objects"]
+                            ]
+                        }
+                        for table, column, objects in (
+                            (
+                                "role_graphql_root_field_names",
+                                "graphql_root_field_name",
+                                "root_field_name",
+                            ),
+                            ("user_roles", "user", "user"),
+                            ("group_roles", "group", "group"),
+                        )
+                    }
+                )
+            if definition.operation.value == "mutation":
+                return ExecutionResult(data={})
+            return ExecutionResult(
+                data={
+                    "rolemapping_roles": [
+                        {"role_id": "role_id1", "component_id": "component_id1"},
+                        {"role_id": "role_id2", "component_id": "component_id2"},
+                    ],
+                    "rolemapping_role_graphql_root_field_names": [
+                        {"role_id": "role_id1", "graphql_root_field_name": "field1"},
+                    ],
+                    "rolemapping_user_roles": [
+                        {"role_id": "role_id1", "user": "user:user1"},
+                        {"role_id": "role_id1", "user": "user:user2"},
+                    ],
+                    "rolemapping_group_roles": [],
+                }
+            )
+
+        return execute
+
+    @pytest.mark.asyncio
+    async def test_upsert_role_mappings(self, monkeypatch, monkeypatch_base):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport, "execute", self.role_mapping_rows_mock_execute(executed)
+        )
+        records = [
+            RoleRecord(
+                type="role",
+                role_id="role_id1",
+                component_id="component_id1",
+                graphql_root_field_names=["field1"],
+            ),
+            UserRolesRecord(
+                type="user_roles",
+                role_id="role_id1",
+                users=["user:user1", "user:user3"],
+            ),
+            RoleRecord(
+                type="role",
+                role_id="role_id3",
+                component_id="component_id3",
+                graphql_root_field_names=["field3"],
+            ),
+            GroupRolesRecord(
+                type="group_roles", role_id="role_id3", groups=["group:1"]
+            ),
+            # conflicting component_id, unknown role
+            RoleRecord(
+                type="role",
+                role_id="role_id4",
+                component_id="component_id2",
+                graphql_root_field_names=[],
+            ),
+            UserRolesRecord(
+                type="user_roles", role_id="role_id4", users=["user:user1"]
+            ),
+        ]
+
+        results = await self.repo.upsert_role_mappings(records)
+
+        assert [
+            (r.role_id, r.status, r.inserted, r.deleted, r.unchanged) for r in results
+        ] == [
+            ("role_id1", 200, 0, 0, 1),
+            ("role_id1", 200, 1, 1, 1),
+            ("role_id3", 200, 1, 0, 0),
+            ("role_id3", 200, 1, 0, 0),
+            ("role_id4", 400, None, None, None),
+            ("role_id4", 400, None, None, None),
+        ]
+        assert results[4].errors == ["Cannot upsert role with role_id role_id4"]
+        assert results[5].errors == ["Role not found for role_id role_id4"]
+        assert [name for name, _ in executed] == [
+            "GetRoleMappingRows",
+            "UpdateRoleMappings",
+        ]
+        read = executed[0][1]
+        assert read["role_ids"] == ["role_id1", "role_id3", "role_id4"]
+        assert read["component_ids"] == [
+            "component_id1",
+            "component_id3",
+            "component_id2",
+        ]
+        assert read["user_role_ids"] == ["role_id1", "role_id4"]
+        assert read["group_role_ids"] == ["role_id3"]
+        write = executed[1][1]
+        assert write["roles"] == [
+            {"role_id": "role_id3", "component_id": "component_id3"}
+        ]
+        assert write["root_field_names"] == [
+            {"graphql_root_field_name": "field3", "role_id": "role_id3"}
+        ]
+        assert write["deleted_root_field_names"] == {"role_id": {"_in": []}}
+        assert [(o["role_id"], o["user"]) for o in write["users"]] == [
+            ("role_id1", "user:user3")
+        ]
+        assert write["deleted_users"] == {
+            "_or": [{"role_id": {"_eq": "role_id1"}, "user": {"_in": ["user:user2"]}}]
+        }
+        assert [(o["role_id"], o["group"]) for o in write["groups"]] == [
+            ("role_id3", "group:1")
+        ]
+
+    @pytest.mark.asyncio
+    async def test_upsert_role_mappings_unchanged_is_a_single_read(
+        self, monkeypatch, monkeypatch_base
+    ):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport, "execute", self.role_mapping_rows_mock_execute(executed)
+        )
+        records = [
+            RoleRecord(
+                type="role",
+                role_id="role_id1",
+                component_id="component_id1",
+                graphql_root_field_names=["field1"],
+            ),
+            UserRolesRecord(
+                type="user_roles",
+                role_id="role_id1",
+                users=["user:user2", "user:user1"],
+            ),
+            GroupRolesRecord(type="group_roles", role_id="role_id2", groups=[]),
+        ]
+
+        results = await self.repo.upsert_role_mappings(records)
+
+        assert [(r.status, r.unchanged) for r in results] == [
+            (200, 1),
+            (200, 2),
+            (200, 0),
+        ]
+        assert [name for name, _ in executed] == ["GetRoleMappingRows"]
+
+    @pytest.mark.asyncio
+    async def test_upsert_role_access(self, monkeypatch, monkeypatch_base):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport, "execute", self.role_mapping_rows_mock_execute(executed)
+        )
+
+        mappings = await self.repo.upsert_role_access(
+            RoleMappings(
+                role_id="role_id1",
+                component_id="component_id1",
+                graphql_root_field_names=["field2", "field1"],
+                users=["user:user1"],
+                groups=["group:group1", "group:group1"],
+            )
+        )
+
+        assert mappings.dict() == {
+            "role_id": "role_id1",
+            "component_id": "component_id1",
+            "graphql_root_field_names": ["field1", "field2"],
+            "users": ["user:user1"],
+            "groups": ["group:group1"],
+        }
+        # one read, and all the changes in one mutation returning the rows
+        assert [name for name, _ in executed] == [
+            "GetRoleMappingRows",
+            "ReplaceRoleAccess",
+        ]
+        write = executed[1][1]
+        assert write["roles"] == []
+        assert write["role_id"] == "role_id1"
+        assert write["graphql_root_field_names"] == ["field2", "field1"]
+        assert write["users"] == ["user:user1"]
+        assert [g["group"] for g in write["group_objects"]] == ["group:group1"]
+
+    @pytest.mark.asyncio
+    async def test_upsert_role_access_returns_rows_after_write(
+        self, monkeypatch, monkeypatch_base
+    ):
+        executed = []
+        read_and_write = self.role_mapping_rows_mock_execute(executed)
+
+        async def execute(self, document, variable_values=None, **kwargs):
+            result = await read_and_write(self, document, variable_values, **kwargs)
+            if document.definitions[0].name.value == "ReplaceRoleAccess":
+                # the response holds the rows as returned by the mutation,
+                # not the input
+                result.data["insert_rolemapping_user_roles"]["returning"].append(
+                    {"user": "user:user0"}
+                )
+            return result
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", execute)
+
+        mappings = await self.repo.upsert_role_access(
+            RoleMappings(
+                role_id="role_id1",
+                component_id="component_id1",
+                graphql_root_field_names=["field1"],
+                users=["user:user1"],
+                groups=[],
+            )
+        )
+
+        assert mappings.users == ["user:user0", "user:user1"]
+
+    @pytest.mark.asyncio
+    async def test_upsert_role_access_unchanged_is_a_single_read(
+        self, monkeypatch, monkeypatch_base
+    ):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport, "execute", self.role_mapping_rows_mock_execute(executed)
+        )
+
+        mappings = await self.repo.upsert_role_access(
+            RoleMappings(
+                role_id="role_id1",
+                component_id="component_id1",
+                graphql_root_field_names=["field1"],
+                users=["user:user2", "user:user1"],
+                groups=[],
+            )
+        )
+
+        assert mappings.users == ["user:user1", "user:user2"]
+        assert [name for name, _ in executed] == ["GetRoleMappingRows"]
+
+    @pytest.mark.asyncio
+    async def test_upsert_role_access_not_allowed(self, monkeypatch, monkeypatch_base):
+        executed = []
+        monkeypatch.setattr(
+            AIOHTTPTransport, "execute", self.role_mapping_rows_mock_execute(executed)
+        )
+
+        # the component belongs to another role
+        with pytest.raises(RoleUpsertNotAllowedException):
+            await self.repo.upsert_role_access(
+                RoleMappings(
+                    role_id="role_id1",
+                    component_id="component_id2",
+                    graphql_root_field_names=[],
+                    users=["user:user3"],
+                    groups=[],
+                )
+            )
+
+        # nothing is written
+        assert [name for name, _ in executed] == ["GetRoleMappingRows"]
 
     @pytest.mark.asyncio
     async def test_get_roles_by_user_and_groups_ok(self, monkeypatch, monkeypatch_base):
@@ -250,6 +834,16 @@ class TestGraphqlRolesRepository:
         assert len(result) == 1
         assert result[0] == "role_id"
 
+    @pytest.mark.asyncio
+    async def test_get_roles_by_groups_ok(self, monkeypatch, monkeypatch_base):
+        monkeypatch.setattr(
+            AIOHTTPTransport, "execute", roles_by_user_and_groups_mock_execute
+        )
+
+        result = await self.repo.get_roles_by_groups(["group1"])
+
+        assert result == ["role_id"]
+
     @pytest.mark.asyncio
     async def test_get_role_graphql_root_field_names_ok(
         self, monkeypatch, monkeypatch_base
@@ -266,6 +860,188 @@ class TestGraphqlRolesRepository:
         assert result[0].role_id == "role_id"
         assert result[0].graphql_root_field_name == "graphql_root_field_name"
 
+    @pytest.mark.asyncio
+    async def test_get_authorization_data_ok(self, monkeypatch, monkeypatch_base):
+        monkeypatch.setattr(
+            AIOHTTPTransport, "execute", authorization_data_mock_execute
+        )
+
+        result = await self.repo.get_authorization_data(
+            "user1", ["group1"], ["graphql_root_field_name"]
+        )
+
+        assert result.roles == ["role_id1", "role_id2"]
+        assert len(result.role_graphql_root_field_names) == 1
+        assert result.role_graphql_root_field_names[0].role_id == "role_id1"
+
+    @pytest.mark.asyncio
+    async def test_get_graphql_root_field_names_by_role_id_ok(
+        self, monkeypatch, monkeypatch_base
+    ):
+        monkeypatch.setattr(
+            AIOHTTPTransport, "execute", role_root_field_names_mock_execute
+        )
+
+        result = await self.repo.get_graphql_root_field_names_by_role_id("role_id")
+
+        assert result == ["graphql_root_field_name1", "graphql_root_field_name2"]
+
+    @pytest.mark.asyncio
+    async def test_has_role(self, monkeypatch, monkeypatch_base):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", has_role_mock_execute_group)
+        assert await self.repo.has_role("role_id", "user:user1", ["group:group1"])
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", has_role_mock_execute_none)
+        assert not await self.repo.has_role("role_id", "user:user1", ["group:group1"])
+
+    @pytest.mark.asyncio
+    async def test_list_roles(self, monkeypatch, monkeypatch_base):
+        executed = []
+
+        async def execute(self, document, variable_values=None, **kwargs):
+            executed.append(variable_values)
+            return ExecutionResult(
+                data={
+                    "rolemapping_roles": [
+                        {"role_id": "role_id2", "component_id": "component_id2"}
+                    ]
+                }
+            )
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", execute)
+
+        roles = await self.repo.list_roles(None, 10)
+        await self.repo.list_roles("role_id1", 10)
+
+        assert roles == [Role(role_id="role_id2", component_id="component_id2")]
+        assert executed == [
+            {"where": {}, "limit": 10},
+            {"where": {"role_id": {"_gt": "role_id1"}}, "limit": 10},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_list_roles_filtered(self, monkeypatch, monkeypatch_base):
+        executed = []
+
+        async def execute(self, document, variable_values=None, **kwargs):
+            executed.append((document.definitions[0].name.value, variable_values))
+            return ExecutionResult(
+                data={
+                    "rolemapping_role_graphql_root_field_names": [
+                        {"role_id": "role_id1", "graphql_root_field_name": "field1"},
+                        {"role_id": "role_id3", "graphql_root_field_name": "field1"},
+                    ],
+                    "rolemapping_roles": [],
+                }
+            )
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", execute)
+
+        await self.repo.list_roles("role_id0", 5, "urn:dmb:cmp:dom_1%", "field1")
+
+        assert executed == [
+            (
+                "GetRoleGraphqlRootFieldNames",
+                {"graphql_root_field_names": ["field1"]},
+            ),
+            (
+                "ListRoles",
+                {
+                    "where": {
+                        "role_id": {"_gt": "role_id0", "_in": ["role_id1", "role_id3"]},
+                        "component_id": {"_like": "urn:dmb:cmp:dom\\_1\\%%"},
+                    },
+                    "limit": 5,
+                },
+            ),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_roles(self, monkeypatch, monkeypatch_base):
+        executed = []
+
+        async def execute(self, document, variable_values=None, **kwargs):
+            executed.append((document.definitions[0].name.value, variable_values))
+            return ExecutionResult(
+                data={
+                    "rolemapping_roles": [
+                        {"role_id": "role_id1", "component_id": "component_id1"},
+                        {"role_id": "role_id2", "component_id": "component_id2"},
+                    ]
+                }
+            )
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", execute)
+
+        roles = await self.repo.get_roles(["role_id1", "role_id3"], ["component_id2"])
+
+        assert roles == [
+            Role(role_id="role_id1", component_id="component_id1"),
+            Role(role_id="role_id2", component_id="component_id2"),
+        ]
+        assert executed == [
+            (
+                "GetRolesByIds",
+                {
+                    "role_ids": ["role_id1", "role_id3"],
+                    "component_ids": ["component_id2"],
+                },
+            )
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_roles_nothing_requested(self, monkeypatch, monkeypatch_base):
+        async def execute(self, document, variable_values=None, **kwargs):
+            raise AssertionError("no query expected")
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", execute)
+
+        assert await self.repo.get_roles([], []) == []
+
+    @pytest.mark.asyncio
+    async def test_get_role_mappings(self, monkeypatch, monkeypatch_base):
+        async def execute(self, document, variable_values=None, **kwargs):
+            return ExecutionResult(
+                data={
+                    "rolemapping_roles": [
+                        {"role_id": "role_id1", "component_id": "component_id1"},
+                        {"role_id": "role_id2", "component_id": "component_id2"},
+                    ],
+                    "rolemapping_role_graphql_root_field_names": [
+                        {"role_id": "role_id2", "graphql_root_field_name": "field1"},
+                        {"role_id": "role_id1", "graphql_root_field_name": "field2"},
+                    ],
+                    "rolemapping_user_roles": [
+                        {"role_id": "role_id1", "user": "user:user1"},
+                        {"role_id": "role_id1", "user": "user:user2"},
+                    ],
+                    "rolemapping_group_roles": [
+                        {"role_id": "role_id2", "group": "group:group1"}
+                    ],
+                }
+            )
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", execute)
+
+        mappings = await self.repo.get_role_mappings(["role_id1", "role_id2"])
+
+        assert [m.dict() for m in mappings] == [
+            {
+                "role_id": "role_id1",
+                "component_id": "component_id1",
+                "graphql_root_field_names": ["field2"],
+                "users": ["user:user1", "user:user2"],
+                "groups": [],
+            },
+            {
+                "role_id": "role_id2",
+                "component_id": "component_id2",
+                "graphql_root_field_names": ["field1"],
+                "users": [],
+                "groups": ["group:group1"],
+            },
+        ]
+
     def test_get_schema_name_public(self):
         config = GraphqlConfig(
             graphql_url="http://unused",
@@ -283,3 +1059,92 @@ class TestGraphqlRolesRepository:
         schema = self.repo.get_schema_name()
 
         assert schema == "rolemapping_"
+
+    @pytest.mark.asyncio
+    async def test_session_is_shared_between_calls(self, monkeypatch, monkeypatch_base):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mock_execute_with_data)
+        connections = []
+
+        async def counting_connect(*args, **kwargs):
+            connections.append(args)
+
+        monkeypatch.setattr(AIOHTTPTransport, "connect", counting_connect)
+        repo = GraphqlRoleRepository(self.config)
+
+        await repo.start()
+        await repo.get_role_by_role_id("role_id")
+        await repo.get_role_by_component_id("component_id")
+
+        assert len(connections) == 1
+
+    @pytest.mark.asyncio
+    async def test_close_releases_the_session(self, monkeypatch, monkeypatch_base):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mock_execute_with_data)
+        repo = GraphqlRoleRepository(self.config)
+        await repo.start()
+
+        await repo.close()
+
+        assert repo._session is None
+        assert repo._client is None
+
+    @pytest.mark.asyncio
+    async def test_start_validates_operations_against_schema_file(
+        self, monkeypatch, monkeypatch_base
+    ):
+        repo = GraphqlRoleRepository(
+            self.config.copy(
+                update={
+                    "graphql_validate_operations": True,
+                    "graphql_schema_path": hasura_schema_path,
+                }
+            )
+        )
+
+        await repo.start()
+
+        assert repo._client.schema is None
+
+    @pytest.mark.asyncio
+    async def test_start_validates_operations_against_introspected_schema(
+        self, monkeypatch, monkeypatch_base
+    ):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", introspection_mock_execute)
+        repo = GraphqlRoleRepository(
+            self.config.copy(update={"graphql_validate_operations": True})
+        )
+
+        await repo.start()
+
+        assert repo._client.schema is None
+
+    @pytest.mark.asyncio
+    async def test_start_fails_on_operations_not_valid_for_schema(
+        self, monkeypatch, monkeypatch_base, tmp_path
+    ):
+        schema_path = tmp_path / "schema.graphql"
+        schema_path.write_text("type Query { unrelated: String }")
+        repo = GraphqlRoleRepository(
+            self.config.copy(
+                update={
+                    "graphql_validate_operations": True,
+                    "graphql_schema_path": str(schema_path),
+                }
+            )
+        )
+
+        with pytest.raises(GraphqlOperationValidationException):
+            await repo.start()
+        assert repo._session is None
+
+    @pytest.mark.asyncio
+    async def test_operations_are_not_parsed_per_call(
+        self, monkeypatch, monkeypatch_base
+    ):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mock_execute_with_data)
+        monkeypatch.setattr("src.repositories.graphql_operations.gql", None)
+        monkeypatch.setattr("src.repositories.graphql_roles_repository.gql", None)
+
+        role = await self.repo.get_role_by_role_id("role_id")
+
+        assert role.role_id == "role_id"
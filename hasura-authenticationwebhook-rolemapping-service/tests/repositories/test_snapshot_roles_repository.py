@@ -0,0 +1,250 @@
+import asyncio
+
+import pytest
+from gql.transport.aiohttp import AIOHTTPTransport
+from graphql import ExecutionResult
+
+from src.models import UserRoleMappings
+from src.repositories.graphql_roles_repository import (
+    GraphqlConfig,
+    GraphqlRoleRepository,
+)
+from src.repositories.snapshot_roles_repository import (
+    SnapshotConfig,
+    SnapshotRoleRepository,
+)
+
+
+@pytest.fixture
+def monkeypatch_base(monkeypatch):
+    monkeypatch.setattr(AIOHTTPTransport, "connect", mock_connect)
+
+
+async def mock_connect(*args, **kwargs):
+    pass
+
+
+async def role_mappings_mock_execute(*args, **kwargs):
+    return ExecutionResult(
+        data={
+            "rolemapping_roles": [
+                {"role_id": "role_id1", "component_id": "component_id1"},
+                {"role_id": "role_id2", "component_id": "component_id2"},
+            ],
+            "rolemapping_role_graphql_root_field_names": [
+                {"role_id": "role_id1", "graphql_root_field_name": "field1"},
+                {"role_id": "role_id2", "graphql_root_field_name": "field1"},
+                {"role_id": "role_id2", "graphql_root_field_name": "field2"},
+            ],
+            "rolemapping_user_roles": [
+                {"role_id": "role_id1", "user": "user:user1"},
+            ],
+            "rolemapping_group_roles": [
+                {"role_id": "role_id2", "group": "group:group1"},
+                {"role_id": "role_id1", "group": "group:group1"},
+            ],
+        }
+    )
+
+
+async def live_mock_execute(*args, **kwargs):
+    return ExecutionResult(
+        data={
+            "rolemapping_user_roles": [{"role_id": "live_role_id"}],
+            "rolemapping_group_roles": [],
+        }
+    )
+
+
+class TestSnapshotRolesRepository:
+    graphql_config = GraphqlConfig(
+        graphql_url="http://unused",
+        graphql_role="fake",
+        graphql_admin_secret="fake",
+        rolemapping_table_schema="rolemapping",
+        graphql_validate_operations=False,
+    )
+
+    def get_repo(self, max_age: float = 60.0) -> SnapshotRoleRepository:
+        return SnapshotRoleRepository(
+            SnapshotConfig(
+                rolemapping_snapshot_enabled=True,
+                rolemapping_snapshot_refresh_interval=3600,
+                rolemapping_snapshot_max_age=max_age,
+            ),
+            GraphqlRoleRepository(self.graphql_config),
+        )
+
+    @pytest.mark.asyncio
+    async def test_lookups_are_served_from_snapshot(
+        self, monkeypatch, monkeypatch_base
+    ):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mappings_mock_execute)
+        repo = self.get_repo()
+        await repo.refresh()
+        monkeypatch.setattr(AIOHTTPTransport, "execute", None)
+
+        roles = await repo.get_roles_by_user_and_groups(
+            "user:user1", ["group:group1", "group:unknown"]
+        )
+        root_field_roles = await repo.get_role_graphql_root_field_names(
+            ["field2", "field1", "unknown"]
+        )
+        group_roles = await repo.get_roles_by_groups(["group:group1", "group:unknown"])
+        authorization_data = await repo.get_authorization_data(
+            "user:unknown", ["group:group1"], ["field2"]
+        )
+
+        assert roles == ["role_id1", "role_id2"]
+        assert group_roles == ["role_id2", "role_id1"]
+        assert [(r.graphql_root_field_name, r.role_id) for r in root_field_roles] == [
+            ("field2", "role_id2"),
+            ("field1", "role_id1"),
+            ("field1", "role_id2"),
+        ]
+        assert authorization_data.roles == ["role_id2", "role_id1"]
+        assert len(authorization_data.role_graphql_root_field_names) == 1
+
+    @pytest.mark.asyncio
+    async def test_point_lookups_are_served_from_snapshot(
+        self, monkeypatch, monkeypatch_base
+    ):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mappings_mock_execute)
+        repo = self.get_repo()
+        await repo.refresh()
+        monkeypatch.setattr(AIOHTTPTransport, "execute", None)
+
+        assert await repo.get_graphql_root_field_names_by_role_id("role_id2") == [
+            "field1",
+            "field2",
+        ]
+        assert await repo.get_graphql_root_field_names_by_role_id("unknown") == []
+        assert await repo.has_role("role_id1", "user:user1", [])
+        assert await repo.has_role("role_id2", "user:unknown", ["group:group1"])
+        assert not await repo.has_role("role_id2", "user:user1", ["group:unknown"])
+
+    @pytest.mark.asyncio
+    async def test_snapshot_age_and_size(self, monkeypatch, monkeypatch_base):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mappings_mock_execute)
+        repo = self.get_repo()
+
+        assert repo.snapshot_age() is None
+        assert repo.snapshot_size() == 0
+
+        await repo.refresh()
+
+        assert repo.snapshot_age() >= 0
+        assert repo.snapshot_size() == 8
+
+    @pytest.mark.asyncio
+    async def test_stale_snapshot_falls_back_to_live_queries(
+        self, monkeypatch, monkeypatch_base
+    ):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mappings_mock_execute)
+        repo = self.get_repo(max_age=-1)
+        await repo.refresh()
+        monkeypatch.setattr(AIOHTTPTransport, "execute", live_mock_execute)
+
+        roles = await repo.get_roles_by_user_and_groups("user:user1", [])
+
+        assert roles == ["live_role_id"]
+
+    @pytest.mark.asyncio
+    async def test_stale_snapshot_is_logged_once(
+        self, monkeypatch, monkeypatch_base, caplog
+    ):
+        def messages(text: str) -> list[str]:
+            return [r.message for r in caplog.records if text in r.message]
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mappings_mock_execute)
+        repo = self.get_repo(max_age=-1)
+        await repo.refresh()
+        monkeypatch.setattr(AIOHTTPTransport, "execute", live_mock_execute)
+
+        for _ in range(3):
+            await repo.get_roles_by_user_and_groups("user:user1", [])
+
+        assert len(messages("too old")) == 1
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mappings_mock_execute)
+        await repo.refresh()
+        monkeypatch.setattr(AIOHTTPTransport, "execute", live_mock_execute)
+        await repo.get_roles_by_user_and_groups("user:user1", [])
+
+        # the recovery is logged, and the snapshot going stale again as well
+        assert len(messages("fresh again")) == 1
+        assert len(messages("too old")) == 2
+
+    @pytest.mark.asyncio
+    async def test_start_loads_snapshot_and_close_stops_refresh(
+        self, monkeypatch, monkeypatch_base
+    ):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mappings_mock_execute)
+        repo = self.get_repo()
+
+        await repo.start()
+        refresh_task = repo._refresh_task
+        await repo.close()
+
+        assert repo.snapshot_size() == 8
+        assert refresh_task is not None and refresh_task.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_write_falls_back_to_live_queries(
+        self, monkeypatch, monkeypatch_base
+    ):
+        monkeypatch.setattr(AIOHTTPTransport, "execute", role_mappings_mock_execute)
+        repo = self.get_repo()
+        await repo.refresh()
+
+        async def write_mock_execute(self, document, *args, **kwargs):
+            if document.definitions[0].operation.value == "mutation":
+                return ExecutionResult(
+                    data={
+                        "delete_rolemapping_user_roles": {"affected_rows": 0},
+                        "insert_rolemapping_user_roles": {"affected_rows": 1},
+                    }
+                )
+            return ExecutionResult(
+                data={
+                    "rolemapping_roles": [
+                        {"role_id": "role_id1", "component_id": "component_id1"}
+                    ],
+                    "rolemapping_user_roles": [],
+                }
+            )
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", write_mock_execute)
+        await repo.upsert_user_roles(
+            UserRoleMappings(role_id="role_id1", users=["user:user2"])
+        )
+        monkeypatch.setattr(AIOHTTPTransport, "execute", live_mock_execute)
+
+        roles = await repo.get_roles_by_user_and_groups("user:user1", [])
+
+        assert roles == ["live_role_id"]
+        assert repo.snapshot_age() is None
+
+    @pytest.mark.asyncio
+    async def test_snapshot_loaded_across_a_write_is_discarded(
+        self, monkeypatch, monkeypatch_base
+    ):
+        loading = asyncio.Event()
+        loaded = asyncio.Event()
+
+        async def slow_execute(*args, **kwargs):
+            loading.set()
+            await loaded.wait()
+            return await role_mappings_mock_execute()
+
+        monkeypatch.setattr(AIOHTTPTransport, "execute", slow_execute)
+        repo = self.get_repo()
+        refresh = asyncio.create_task(repo.refresh())
+        await loading.wait()
+
+        # a write while the snapshot is being loaded
+        repo._invalidate()
+        loaded.set()
+        await refresh
+
+        assert repo.snapshot_age() is None
@@ -0,0 +1,80 @@
+from src.cache import TTLCache
+
+
+class TestTTLCache:
+    def test_get_missing(self):
+        cache: TTLCache[str, int] = TTLCache(10, 60)
+
+        assert cache.get("key") is None
+        assert cache.misses == 1
+
+    def test_get_hit(self):
+        cache: TTLCache[str, int] = TTLCache(10, 60)
+        cache.set("key", 1)
+
+        assert cache.get("key") == 1
+        assert cache.hits == 1
+
+    def test_least_recently_used_is_evicted(self):
+        cache: TTLCache[str, int] = TTLCache(2, 60)
+        cache.set("key1", 1)
+        cache.set("key2", 2)
+        cache.get("key1")
+
+        cache.set("key3", 3)
+
+        assert cache.get("key1") == 1
+        assert cache.get("key2") is None
+        assert cache.get("key3") == 3
+        assert cache.evictions == 1
+
+    def test_expired_entry_is_missing(self):
+        cache: TTLCache[str, int] = TTLCache(10, 60)
+        cache.set("key", 1, ttl=0.000001)
+
+        assert cache.get("key") is None
+        assert len(cache) == 0
+
+    def test_not_positive_ttl_is_not_cached(self):
+        cache: TTLCache[str, int] = TTLCache(10, 60)
+
+        cache.set("key", 1, ttl=-10)
+
+        assert len(cache) == 0
+
+    def test_no_ttl_never_expires(self):
+        cache: TTLCache[str, int] = TTLCache(10)
+
+        cache.set("key", 1)
+
+        assert cache.get("key") == 1
+
+    def test_disabled_cache(self):
+        cache: TTLCache[str, int] = TTLCache(0, 60)
+
+        cache.set("key", 1)
+
+        assert cache.get("key") is None
+
+    def test_pop_and_clear(self):
+        cache: TTLCache[str, int] = TTLCache(10, 60)
+        cache.set("key1", 1)
+        cache.set("key2", 2)
+
+        cache.pop("key1")
+        assert cache.get("key1") is None
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_stats(self):
+        cache: TTLCache[str, int] = TTLCache(10, 60)
+        cache.set("key", 1)
+        cache.get("key")
+        cache.get("missing")
+
+        stats = cache.stats()
+
+        assert stats["size"] == 1
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
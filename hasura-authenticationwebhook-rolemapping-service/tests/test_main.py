@@ -1,10 +1,21 @@
+import asyncio
+import json
+
 from fastapi.testclient import TestClient
 
+from src.handlers.bulk_import_handler import BulkImportConfig, BulkImportHandler
+from src.handlers.export_handler import ExportConfig, ExportHandler
 from src.handlers.webhook_handler import WebhookConfig, WebhookHandler
 from src.jwt.azure_claims_service import AzureClaimsService
 from src.jwt.claims_service import ClaimsService
 from src.jwt.jwt_service import JWTService
-from src.main import app, get_roles_repository, get_webhook_handler
+from src.main import (
+    app,
+    get_bulk_import_handler,
+    get_export_handler,
+    get_roles_repository,
+    get_webhook_handler,
+)
 from src.models import (
     GraphqlRootFieldNameRoleMappings,
     GroupRoleMappings,
@@ -156,6 +167,60 @@ class TestRoleMapper:
 
         assert response.status_code == 500
 
+    def test_batch_get_roles_200_ok(self):
+        app.dependency_overrides[get_roles_repository] = get_role_repository_for_test
+
+        response = client.post(
+            "/v1/roles:batchGet",
+            json={
+                "role_ids": ["role_id", "other_role_id"],
+                "component_ids": ["component_id", "other_component_id"],
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "roles": [{"role_id": "role_id", "component_id": "component_id"}],
+            "missing_role_ids": ["other_role_id"],
+            "missing_component_ids": ["other_component_id"],
+        }
+
+    def test_batch_get_roles_none_found(self):
+        app.dependency_overrides[
+            get_roles_repository
+        ] = get_role_repository_for_test_raising_handled_error
+
+        response = client.post(
+            "/v1/roles:batchGet",
+            json={"component_ids": ["component_id", "component_id"]},
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "roles": [],
+            "missing_role_ids": [],
+            "missing_component_ids": ["component_id"],
+        }
+
+    def test_batch_get_roles_too_many_ids(self):
+        app.dependency_overrides[get_roles_repository] = get_role_repository_for_test
+
+        response = client.post(
+            "/v1/roles:batchGet",
+            json={"role_ids": [f"role_id{i}" for i in range(101)]},
+        )
+
+        assert response.status_code == 422
+
+    def test_batch_get_roles_500(self):
+        app.dependency_overrides[
+            get_roles_repository
+        ] = get_role_repository_for_test_raising_generic_error
+
+        response = client.post("/v1/roles:batchGet", json={"role_ids": ["role_id"]})
+
+        assert response.status_code == 500
+
     def test_get_role_by_component_id_200_ok(self):
         app.dependency_overrides[get_roles_repository] = get_role_repository_for_test
 
@@ -245,7 +310,13 @@ class TestRoleMapper:
         )
 
         assert response.status_code == 200
-        assert response.json() == {"role_id": "role_id", "users": ["user:user1"]}
+        assert response.json() == {
+            "role_id": "role_id",
+            "users": ["user:user1"],
+            "inserted": 1,
+            "deleted": 0,
+            "unchanged": 0,
+        }
 
     def test_upsert_user_roles_400(self):
         app.dependency_overrides[
@@ -280,7 +351,13 @@ class TestRoleMapper:
         )
 
         assert response.status_code == 200
-        assert response.json() == {"role_id": "role_id", "groups": ["group:group1"]}
+        assert response.json() == {
+            "role_id": "role_id",
+            "groups": ["group:group1"],
+            "inserted": 1,
+            "deleted": 0,
+            "unchanged": 0,
+        }
 
     def test_upsert_group_roles_400(self):
         app.dependency_overrides[
@@ -305,3 +382,235 @@ class TestRoleMapper:
         )
 
         assert response.status_code == 500
+
+    def test_bulk_import_200_ok(self):
+        app.dependency_overrides[get_bulk_import_handler] = lambda: BulkImportHandler(
+            BulkImportConfig(bulk_import_chunk_size=1), get_role_repository_for_test()
+        )
+        records = [
+            {"type": "user_roles", "role_id": "role_id", "users": ["user:user1"]},
+            {"type": "group_roles", "role_id": "role_id"},
+        ]
+
+        response = client.post(
+            "/v1/bulk",
+            content="\n".join(json.dumps(r) for r in records),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert [(r["line"], r["status"]) for r in results] == [(1, 200), (2, 400)]
+        assert results[1]["errors"] == ["groups: field required"]
+
+    def test_bulk_import_500_per_record(self):
+        app.dependency_overrides[get_bulk_import_handler] = lambda: BulkImportHandler(
+            BulkImportConfig(), get_role_repository_for_test_raising_generic_error()
+        )
+
+        response = client.post(
+            "/v1/bulk",
+            content=json.dumps(
+                {"type": "user_roles", "role_id": "role_id", "users": []}
+            ),
+        )
+
+        assert response.status_code == 200
+        assert json.loads(response.text) == {
+            "line": 1,
+            "type": "user_roles",
+            "role_id": "role_id",
+            "status": 500,
+            "errors": ["System error"],
+        }
+
+    def test_bulk_import_streams_a_body_in_several_chunks(self):
+        app.dependency_overrides[get_bulk_import_handler] = lambda: BulkImportHandler(
+            BulkImportConfig(bulk_import_chunk_size=1), get_role_repository_for_test()
+        )
+        content = b"\n".join(
+            json.dumps(
+                {"type": "user_roles", "role_id": f"role_id{i}", "users": []}
+            ).encode()
+            for i in range(3)
+        )
+        # the body is sent in several messages, as a server does for a
+        # streamed request, which the test client doesn't
+        parts = [content[:40], content[40:90], content[90:]]
+        messages = [
+            {"type": "http.request", "body": part, "more_body": i < len(parts) - 1}
+            for i, part in enumerate(parts)
+        ]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            # the client stays connected until the response is complete
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "POST",
+            "path": "/v1/bulk",
+            "raw_path": b"/v1/bulk",
+            "root_path": "",
+            "scheme": "http",
+            "query_string": b"",
+            "headers": [(b"content-type", b"application/x-ndjson")],
+            "client": ("testclient", 50000),
+            "server": ("testserver", 80),
+        }
+
+        asyncio.run(asyncio.wait_for(app(scope, receive, send), timeout=5))
+
+        assert sent[0]["status"] == 200
+        body = b"".join(m.get("body", b"") for m in sent[1:])
+        results = [json.loads(line) for line in body.splitlines()]
+        assert [(r["line"], r["role_id"], r["status"]) for r in results] == [
+            (1, "role_id0", 200),
+            (2, "role_id1", 200),
+            (3, "role_id2", 200),
+        ]
+
+    def test_export_200_ok(self):
+        app.dependency_overrides[get_export_handler] = lambda: ExportHandler(
+            ExportConfig(), get_role_repository_for_test()
+        )
+
+        response = client.get("/v1/export", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.headers["content-encoding"] == "gzip"
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert records == [
+            {
+                "type": "role",
+                "role_id": "role_id",
+                "component_id": "component_id",
+                "graphql_root_field_names": ["graphql_root_field_name1"],
+            },
+            {"type": "user_roles", "role_id": "role_id", "users": ["user:user1"]},
+            {"type": "group_roles", "role_id": "role_id", "groups": ["group:group1"]},
+        ]
+
+    def test_list_roles_200_ok(self):
+        app.dependency_overrides[get_roles_repository] = get_role_repository_for_test
+
+        response = client.get("/v1/roles")
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "roles": [{"role_id": "role_id", "component_id": "component_id"}]
+        }
+
+    def test_list_roles_with_counts_and_filters(self):
+        app.dependency_overrides[get_roles_repository] = get_role_repository_for_test
+
+        response = client.get(
+            "/v1/roles",
+            params={
+                "limit": 1,
+                "component_id_prefix": "component",
+                "graphql_root_field_name": "graphql_root_field_name1",
+                "include_counts": True,
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "roles": [
+                {
+                    "role_id": "role_id",
+                    "component_id": "component_id",
+                    "graphql_root_field_names_count": 1,
+                    "users_count": 1,
+                    "groups_count": 1,
+                }
+            ],
+            "next_cursor": "role_id",
+        }
+
+        response = client.get("/v1/roles", params={"limit": 1, "cursor": "role_id"})
+
+        assert response.json() == {"roles": []}
+
+    def test_list_roles_filtered_out(self):
+        app.dependency_overrides[get_roles_repository] = get_role_repository_for_test
+
+        response = client.get("/v1/roles", params={"component_id_prefix": "other"})
+
+        assert response.status_code == 200
+        assert response.json() == {"roles": []}
+
+    def test_list_roles_500(self):
+        app.dependency_overrides[
+            get_roles_repository
+        ] = get_role_repository_for_test_raising_generic_error
+
+        response = client.get("/v1/roles")
+
+        assert response.status_code == 500
+
+    def test_upsert_component_access_200_ok(self):
+        app.dependency_overrides[get_roles_repository] = get_role_repository_for_test
+
+        response = client.put(
+            "/v1/components/component_id/access",
+            json={
+                "role_id": "role_id",
+                "graphql_root_field_names": ["field2", "field1"],
+                "users": ["user:user1", "user:user1"],
+                "groups": [],
+            },
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {
+            "role_id": "role_id",
+            "component_id": "component_id",
+            "graphql_root_field_names": ["field1", "field2"],
+            "users": ["user:user1"],
+            "groups": [],
+        }
+
+    def test_upsert_component_access_400(self):
+        app.dependency_overrides[
+            get_roles_repository
+        ] = get_role_repository_for_test_raising_handled_error
+
+        response = client.put(
+            "/v1/components/component_id/access",
+            json={
+                "role_id": "role_id",
+                "graphql_root_field_names": [],
+                "users": [],
+                "groups": [],
+            },
+        )
+
+        assert response.status_code == 400
+        assert response.json() == {"errors": ["error"]}
+
+    def test_upsert_component_access_500(self):
+        app.dependency_overrides[
+            get_roles_repository
+        ] = get_role_repository_for_test_raising_generic_error
+
+        response = client.put(
+            "/v1/components/component_id/access",
+            json={
+                "role_id": "role_id",
+                "graphql_root_field_names": [],
+                "users": [],
+                "groups": [],
+            },
+        )
+
+        assert response.status_code == 500